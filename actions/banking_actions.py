@@ -1,17 +1,40 @@
 import os
+import asyncio
+import hashlib
 import logging
 from typing import Any, Dict, List, Text
-from datetime import datetime, timedelta
-import google.generativeai as genai
+from datetime import date, timedelta
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
+from actions.banking_data import (
+    AccountNotFoundError,
+    CachedBankingData,
+    InsufficientFundsError,
+    InMemoryBankingBackend,
+    SQLiteBankingBackend,
+)
+from actions.coalescer import PRIORITY_ANALYTICS, PRIORITY_BACKGROUND
+from actions.history import HistoryBuilder
+from actions.insights import InMemoryInsightBackend, SpendingInsights, SQLiteInsightBackend
+from actions.llm import ModelRegistry, action_timeout, generate_text, start_warm_up
+from actions.resilience import CircuitOpenError
+from actions.response_cache import (
+    InMemoryCacheBackend,
+    SemanticResponseCache,
+    SQLiteCacheBackend,
+    contains_personal_data,
+)
+from actions.streaming import ChunkPublisher
+from actions.telemetry import CACHE_LOOKUPS, instrumented, start_metrics_server
+from actions.transfers import InvalidTransferError, TransferEngine, idempotency_key, transfer_event_id
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Prometheus endpoint for action, Gemini and cache metrics (ACTION_METRICS_PORT)
+start_metrics_server()
 
 # Mock banking database (replace with real API/database)
 BANKING_DB = {
@@ -32,13 +55,171 @@ BANKING_DB = {
     }
 }
 
+
+def build_banking_data() -> CachedBankingData:
+    """Create the data backend and balance cache from BANKING_DATA_* settings"""
+    if os.getenv("BANKING_DATA_BACKEND", "memory").lower() == "sqlite":
+        backend = SQLiteBankingBackend(
+            os.getenv("BANKING_DATA_PATH", "banking.sqlite3"),
+            pool_size=int(os.getenv("BANKING_DATA_POOL_SIZE", "4")),
+        )
+        # The mock data seeds an empty database
+        backend.seed(BANKING_DB)
+    else:
+        backend = InMemoryBankingBackend.from_mapping(BANKING_DB)
+    return CachedBankingData(backend, ttl=float(os.getenv("BALANCE_CACHE_TTL", "5")))
+
+
+# Accounts, transactions and spending aggregates behind a read-through balance cache
+BANKING_DATA = build_banking_data()
+
+# Atomic, idempotent transfers; locks are striped over (user, account) pairs
+TRANSFER_ENGINE = TransferEngine(BANKING_DATA, stripes=int(os.getenv("TRANSFER_LOCK_STRIPES", "256")))
+
+
+# Days of transactions listed when the ``days`` slot is missing or not a number
+DEFAULT_TRANSACTION_DAYS = 7
+MAX_TRANSACTION_DAYS = 3650
+
+
+def transaction_window(days: Any) -> int:
+    """Days of history to list for a ``days`` slot value such as ``"30"`` or ``"week"``"""
+    try:
+        value = int(str(days).strip())
+    except (TypeError, ValueError):
+        return DEFAULT_TRANSACTION_DAYS
+    return min(value, MAX_TRANSACTION_DAYS) if value > 0 else DEFAULT_TRANSACTION_DAYS
+
+
+def build_fallback_cache() -> SemanticResponseCache:
+    """Create the fallback answer cache from FALLBACK_CACHE_* settings"""
+    max_entries = int(os.getenv("FALLBACK_CACHE_SIZE", "1024"))
+    if os.getenv("FALLBACK_CACHE_BACKEND", "memory").lower() == "sqlite":
+        backend = SQLiteCacheBackend(
+            os.getenv("FALLBACK_CACHE_PATH", "fallback_cache.sqlite3"), max_entries=max_entries
+        )
+    else:
+        backend = InMemoryCacheBackend(max_entries=max_entries)
+    return SemanticResponseCache(
+        backend=backend,
+        ttl=float(os.getenv("FALLBACK_CACHE_TTL", "3600")),
+        threshold=float(os.getenv("FALLBACK_CACHE_THRESHOLD", "0.9")),
+    )
+
+
+# Shared cache of generic (non-personal) fallback answers
+FALLBACK_CACHE = build_fallback_cache()
+
+# Prompt history is capped by an approximate token budget per turn
+HISTORY = HistoryBuilder(
+    token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "400")),
+    summary_budget=int(os.getenv("HISTORY_SUMMARY_TOKENS", "120")),
+    max_topics=int(os.getenv("HISTORY_SUMMARY_TOPICS", "5")),
+)
+
+# Gemini clients are built once per model name + system instruction + config
+MODEL_REGISTRY = ModelRegistry()
+
+# Model selection; FAQ-style fallback defaults to the lighter flash model
+FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "gemini-1.5-flash")
+ANALYSIS_MODEL = os.getenv("GEMINI_ANALYSIS_MODEL", "gemini-1.5-pro")
+FALLBACK_GENERATION_CONFIG = {"max_output_tokens": int(os.getenv("GEMINI_FALLBACK_MAX_TOKENS", "512"))}
+ANALYSIS_GENERATION_CONFIG = {"max_output_tokens": int(os.getenv("GEMINI_ANALYSIS_MAX_TOKENS", "1024"))}
+
+# Static instructions go in the model's system instruction; only the
+# per-turn parts are formatted into the prompt templates below
+BANKING_SYSTEM_INSTRUCTION = """You are a professional banking assistant for a major financial institution like JPMorgan Chase.
+You help customers with:
+- Account inquiries (balance, statements, transactions)
+- Transaction history and analysis
+- Transfer requests and payments
+- Credit card information
+- General banking questions
+- Security and fraud prevention
+
+Always be professional, helpful, and security-conscious. Never share sensitive account details unless the user is authenticated.
+Keep responses concise and actionable."""
+
+FALLBACK_PROMPT = """Conversation History:
+{history}
+
+User: {message}
+
+Assistant:"""
+
+SPENDING_SYSTEM_INSTRUCTION = """You explain a customer's spending using a precomputed summary.
+The figures are already calculated; do not recompute or invent numbers.
+Cover:
+1. Spending categories breakdown
+2. Monthly spending trends
+3. Recommendations for saving money
+4. Any unusual patterns
+
+Keep the response concise and actionable."""
+
+SPENDING_PROMPT = """Spending summary:
+{summary}"""
+
+# The Gemini SDK is imported on the first call. GEMINI_WARMUP=import does that
+# (and builds the clients) on a background thread at startup instead;
+# GEMINI_WARMUP=connect also opens the connection to the API.
+start_warm_up(
+    MODEL_REGISTRY,
+    [
+        (FALLBACK_MODEL, BANKING_SYSTEM_INSTRUCTION, FALLBACK_GENERATION_CONFIG),
+        (ANALYSIS_MODEL, SPENDING_SYSTEM_INSTRUCTION, ANALYSIS_GENERATION_CONFIG),
+    ],
+    os.getenv("GEMINI_WARMUP", "off").lower(),
+)
+
+
+async def generate_spending_insight(summary: Text, publisher, background: bool) -> Text:
+    model = MODEL_REGISTRY.get(ANALYSIS_MODEL, SPENDING_SYSTEM_INSTRUCTION, ANALYSIS_GENERATION_CONFIG)
+    return await generate_text(
+        model, SPENDING_PROMPT.format(summary=summary), publisher,
+        PRIORITY_BACKGROUND if background else PRIORITY_ANALYTICS,
+    )
+
+
+def build_spending_insights() -> SpendingInsights:
+    """Create the spending insight cache and precompute worker from INSIGHT_* settings"""
+    max_entries = int(os.getenv("INSIGHT_CACHE_SIZE", "10000"))
+    if os.getenv("INSIGHT_CACHE_BACKEND", "memory").lower() == "sqlite":
+        backend = SQLiteInsightBackend(os.getenv("INSIGHT_CACHE_PATH", "insights.sqlite3"), max_entries=max_entries)
+    else:
+        backend = InMemoryInsightBackend(max_entries=max_entries)
+    # A new model, prompt or generation config makes every cached insight outdated
+    fingerprint = hashlib.blake2b(
+        repr((ANALYSIS_MODEL, SPENDING_SYSTEM_INSTRUCTION, SPENDING_PROMPT, ANALYSIS_GENERATION_CONFIG)).encode(),
+        digest_size=6,
+    ).hexdigest()
+    return SpendingInsights(
+        BANKING_DATA,
+        generate_spending_insight,
+        backend=backend,
+        fingerprint=fingerprint,
+        ttl=float(os.getenv("INSIGHT_CACHE_TTL", "86400")),
+        max_stale=float(os.getenv("INSIGHT_MAX_STALE", "0")),
+        precompute=os.getenv("INSIGHT_PRECOMPUTE", "false").lower() == "true",
+        interval=float(os.getenv("INSIGHT_PRECOMPUTE_INTERVAL", "30")),
+        active_window=float(os.getenv("INSIGHT_ACTIVE_WINDOW", "1800")),
+        concurrency=int(os.getenv("INSIGHT_PRECOMPUTE_CONCURRENCY", "2")),
+    )
+
+
+# Spending insights memoized per transaction version, optionally pre-generated
+# for users who asked for an analysis recently
+SPENDING_INSIGHTS = build_spending_insights()
+
+
 class ActionBankingGeminiFallback(Action):
     """Enhanced Gemini fallback with banking context"""
     
     def name(self) -> Text:
         return "action_banking_gemini_fallback"
     
-    def run(
+    @instrumented
+    async def run(
         self, 
         dispatcher: CollectingDispatcher, 
         tracker: Tracker, 
@@ -47,35 +228,44 @@ class ActionBankingGeminiFallback(Action):
         user_msg = tracker.latest_message.get("text", "")
         conversation_history = self._get_conversation_history(tracker)
         
-        banking_context = """You are a professional banking assistant for a major financial institution like JPMorgan Chase. 
-        You help customers with:
-        - Account inquiries (balance, statements, transactions)
-        - Transaction history and analysis
-        - Transfer requests and payments
-        - Credit card information
-        - General banking questions
-        - Security and fraud prevention
-        
-        Always be professional, helpful, and security-conscious. Never share sensitive account details unless the user is authenticated.
-        Keep responses concise and actionable."""
+        # Only generic questions asked outside a personal conversation can be
+        # answered from (or stored in) the shared cache
+        cacheable = not (contains_personal_data(user_msg) or contains_personal_data(conversation_history))
+        if cacheable:
+            # Off the event loop: the SQLite backend reads and decodes rows
+            cached = await asyncio.get_running_loop().run_in_executor(None, FALLBACK_CACHE.lookup, user_msg)
+            CACHE_LOOKUPS.labels("hit" if cached else "miss").inc()
+            if cached:
+                dispatcher.utter_message(text=cached)
+                return []
+        else:
+            CACHE_LOOKUPS.labels("skipped").inc()
         
         try:
-            model = genai.GenerativeModel("gemini-pro")
-            prompt = f"""{banking_context}
-
-Conversation History:
-{conversation_history}
-
-User: {user_msg}
-
-Assistant:"""
+            model = MODEL_REGISTRY.get(FALLBACK_MODEL, BANKING_SYSTEM_INSTRUCTION, FALLBACK_GENERATION_CONFIG)
+            prompt = FALLBACK_PROMPT.format(history=conversation_history, message=user_msg)
             
-            response = model.generate_content(prompt)
-            text = getattr(response, "text", None) or (
-                response.candidates[0].content.parts[0].text if response and response.candidates 
-                else "I'm here to help with your banking needs. How can I assist you today?"
+            text = await asyncio.wait_for(
+                generate_text(model, prompt, ChunkPublisher.for_tracker(tracker)),
+                timeout=action_timeout(self.name())
+            )
+            if text and cacheable:
+                await asyncio.get_running_loop().run_in_executor(None, FALLBACK_CACHE.store, user_msg, text)
+            dispatcher.utter_message(
+                text=text or "I'm here to help with your banking needs. How can I assist you today?"
+            )
+        except CircuitOpenError:
+            logger.warning("Gemini circuit open, answering fallback with support message")
+            dispatcher.utter_message(
+                text="I apologize, but I'm having trouble processing that request. "
+                     "Please try again or contact customer support at 1-800-XXX-XXXX."
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini fallback timed out after {action_timeout(self.name())}s")
+            dispatcher.utter_message(
+                text="I apologize, but I'm having trouble processing that request. "
+                     "Please try again or contact customer support at 1-800-XXX-XXXX."
             )
-            dispatcher.utter_message(text=text)
         except Exception as e:
             logger.error(f"Gemini fallback error: {e}")
             dispatcher.utter_message(
@@ -84,16 +274,9 @@ Assistant:"""
             )
         return []
     
-    def _get_conversation_history(self, tracker: Tracker, max_turns: int = 5) -> Text:
-        """Extract recent conversation history"""
-        events = tracker.events[-max_turns*2:]
-        history = []
-        for event in events:
-            if event.get("event") == "user":
-                history.append(f"User: {event.get('text', '')}")
-            elif event.get("event") == "bot":
-                history.append(f"Assistant: {event.get('text', '')}")
-        return "\n".join(history) if history else "No previous conversation."
+    def _get_conversation_history(self, tracker: Tracker) -> Text:
+        """Recent turns within the token budget, plus a summary of older ones"""
+        return HISTORY.build(tracker)
 
 
 class ActionCheckBalance(Action):
@@ -102,7 +285,8 @@ class ActionCheckBalance(Action):
     def name(self) -> Text:
         return "action_check_balance"
     
-    def run(
+    @instrumented
+    async def run(
         self, 
         dispatcher: CollectingDispatcher, 
         tracker: Tracker, 
@@ -134,8 +318,7 @@ class ActionCheckBalance(Action):
         
         user_id = tracker.sender_id or "user123"  # In production, get from auth
         
-        # Mock balance retrieval
-        accounts = BANKING_DB["accounts"].get(user_id, {})
+        accounts = await BANKING_DATA.accounts(user_id)
         account_data = accounts.get(account_type, {})
         
         if account_data:
@@ -167,31 +350,28 @@ class ActionGetTransactions(Action):
     def name(self) -> Text:
         return "action_get_transactions"
     
-    def run(
+    @instrumented
+    async def run(
         self, 
         dispatcher: CollectingDispatcher, 
         tracker: Tracker, 
         domain: Dict[Text, Any]
     ) -> List[Dict[Text, Any]]:
-        days = tracker.get_slot("days") or 7
+        days = transaction_window(tracker.get_slot("days"))
         user_id = tracker.sender_id or "user123"
         
-        # Mock transaction retrieval
-        transactions = BANKING_DB["transactions"].get(user_id, [])
+        # Binary search on the per-user date index, first page of 10
+        cutoff_date = date.today() - timedelta(days=days)
+        page = await BANKING_DATA.transactions(user_id, start=cutoff_date, limit=10)
         
-        cutoff_date = datetime.now() - timedelta(days=int(days))
-        recent_transactions = [
-            t for t in transactions 
-            if datetime.strptime(t["date"], "%Y-%m-%d") >= cutoff_date
-        ]
-        
-        if recent_transactions:
+        if page.transactions:
             transaction_list = "\n".join([
                 f"{t['date']}: {t['description']} - ${abs(t['amount']):,.2f} ({t['type']})"
-                for t in recent_transactions[:10]  # Limit to 10
+                for t in page.transactions
             ])
+            more = f"\n...and {page.total - len(page.transactions)} more." if page.next_offset else ""
             dispatcher.utter_message(
-                text=f"Here are your recent transactions (last {days} days):\n{transaction_list}"
+                text=f"Here are your recent transactions (last {days} days):\n{transaction_list}{more}"
             )
         else:
             dispatcher.utter_message(
@@ -207,7 +387,8 @@ class ActionTransferMoney(Action):
     def name(self) -> Text:
         return "action_transfer_money"
     
-    def run(
+    @instrumented
+    async def run(
         self,
         dispatcher: CollectingDispatcher,
         tracker: Tracker,
@@ -230,17 +411,35 @@ class ActionTransferMoney(Action):
             dispatcher.utter_message(text="Which account should I transfer to?")
             return []
         
-        # In production, validate and execute transfer
         try:
             amount_float = float(amount)
-            dispatcher.utter_message(
-                text=f"Transfer of ${amount_float:,.2f} from {from_acc} to {to_acc} has been initiated. "
-                     f"You'll receive a confirmation shortly."
-            )
         except ValueError:
             dispatcher.utter_message(text="Please provide a valid amount to transfer.")
             return [SlotSet("transfer_amount", None)]
         
+        user_id = tracker.sender_id or "user123"
+        # A retried action call carries the same message, so it replays the receipt
+        event_id = transfer_event_id(tracker)
+        key = idempotency_key(user_id, event_id) if event_id else None
+        try:
+            await TRANSFER_ENGINE.execute(user_id, from_acc.lower(), to_acc.lower(), amount_float, key)
+        except InvalidTransferError as e:
+            dispatcher.utter_message(text=f"I can't make that transfer: {e}.")
+            return [SlotSet("transfer_amount", None), SlotSet("from_account", None), SlotSet("to_account", None)]
+        except AccountNotFoundError as e:
+            dispatcher.utter_message(text=f"I couldn't find your {e.args[0]} account. Please verify your account type.")
+            return [SlotSet("from_account", None), SlotSet("to_account", None)]
+        except InsufficientFundsError:
+            dispatcher.utter_message(
+                text=f"Your {from_acc} account doesn't have enough available funds for a ${amount_float:,.2f} transfer."
+            )
+            return [SlotSet("transfer_amount", None)]
+        
+        dispatcher.utter_message(
+            text=f"Transfer of ${amount_float:,.2f} from {from_acc} to {to_acc} has been initiated. "
+                 f"You'll receive a confirmation shortly."
+        )
+        
         return [SlotSet("transfer_amount", None), SlotSet("from_account", None), SlotSet("to_account", None)]
 
 
@@ -250,43 +449,37 @@ class ActionAnalyzeSpending(Action):
     def name(self) -> Text:
         return "action_analyze_spending"
     
-    def run(
+    @instrumented
+    async def run(
         self,
         dispatcher: CollectingDispatcher,
         tracker: Tracker,
         domain: Dict[Text, Any]
     ) -> List[Dict[Text, Any]]:
         user_id = tracker.sender_id or "user123"
-        transactions = BANKING_DB["transactions"].get(user_id, [])
-        
-        # Prepare transaction summary for Gemini
-        transaction_summary = "\n".join([
-            f"{t['date']}: {t['description']} - ${abs(t['amount']):,.2f}"
-            for t in transactions[-20:]  # Last 20 transactions
-        ])
         
         try:
-            model = genai.GenerativeModel("gemini-pro")
-            prompt = f"""Analyze the following banking transactions and provide insights:
-            
-            Transactions:
-            {transaction_summary}
-            
-            Provide:
-            1. Spending categories breakdown
-            2. Monthly spending trends
-            3. Recommendations for saving money
-            4. Any unusual patterns
-            
-            Keep the response concise and actionable."""
-            
-            response = model.generate_content(prompt)
-            analysis = getattr(response, "text", None) or (
-                response.candidates[0].content.parts[0].text if response and response.candidates
-                else "Unable to analyze spending at this time."
+            # Cached per transaction version; on a miss the breakdowns, trends
+            # and anomalies are computed locally and Gemini only narrates them
+            analysis = await asyncio.wait_for(
+                SPENDING_INSIGHTS.get(user_id, ChunkPublisher.for_tracker(tracker)),
+                timeout=action_timeout(self.name())
             )
+            if analysis is None:
+                dispatcher.utter_message(text="I couldn't find any transactions to analyze yet.")
+                return []
             
-            dispatcher.utter_message(text=analysis)
+            dispatcher.utter_message(text=analysis or "Unable to analyze spending at this time.")
+        except CircuitOpenError:
+            logger.warning("Gemini circuit open, skipping spending analysis")
+            dispatcher.utter_message(
+                text="I'm having trouble analyzing your spending right now. Please try again later."
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Spending analysis timed out after {action_timeout(self.name())}s")
+            dispatcher.utter_message(
+                text="I'm having trouble analyzing your spending right now. Please try again later."
+            )
         except Exception as e:
             logger.error(f"Spending analysis error: {e}")
             dispatcher.utter_message(
@@ -0,0 +1,399 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Text, Tuple
+
+from actions.telemetry import BALANCE_CACHE_LOOKUPS
+from actions.transaction_store import TransactionPage, TransactionStore, _to_ordinal, _to_text
+
+if TYPE_CHECKING:
+    from actions.spending_analytics import SpendingAnalytics
+
+# account type -> {"balance", "account_number", optional "credit_limit"}
+Accounts = Dict[Text, Dict[Text, Any]]
+
+
+class AccountNotFoundError(LookupError):
+    """A transfer names an account the user does not have"""
+
+
+class InsufficientFundsError(Exception):
+    """The source account cannot cover the transfer"""
+
+
+class DuplicateTransferError(Exception):
+    """A transfer with this idempotency key is already in the ledger"""
+
+
+@dataclass(frozen=True)
+class TransferReceipt:
+    key: Text
+    user_id: Text
+    from_account: Text
+    to_account: Text
+    amount: float
+    created_at: float
+    replayed: bool = False
+
+
+def available_funds(account: Dict[Text, Any]) -> float:
+    """Balance plus any credit line (credit balances are negative)"""
+    return account["balance"] + (account.get("credit_limit") or 0)
+
+
+def transfer_transaction(receipt: TransferReceipt) -> Dict[Text, Any]:
+    """Transaction history row recorded for a transfer"""
+    return {
+        "date": date.fromtimestamp(receipt.created_at).isoformat(),
+        "description": f"TRANSFER TO {receipt.to_account.upper()}",
+        "amount": -receipt.amount,
+        "type": "transfer",
+    }
+
+
+class InMemoryBankingBackend:
+    """Process-local accounts plus the indexed transaction store and spending aggregates"""
+
+    def __init__(self, accounts: Dict[Text, Accounts], transactions: TransactionStore):
+        self._accounts = accounts
+        self.store = transactions
+        self._analytics: Optional["SpendingAnalytics"] = None
+        self._transfers: Dict[Text, TransferReceipt] = {}
+
+    @classmethod
+    def from_mapping(cls, data: Dict[Text, Any]) -> "InMemoryBankingBackend":
+        """Build from a ``{"accounts": ..., "transactions": ...}`` mapping like BANKING_DB"""
+        return cls(data.get("accounts", {}), TransactionStore.from_mapping(data.get("transactions", {})))
+
+    @property
+    def analytics(self) -> "SpendingAnalytics":
+        """Spending aggregates, built on first use so NumPy stays off the startup path"""
+        if self._analytics is None:
+            from actions.spending_analytics import SpendingAnalytics
+
+            self._analytics = SpendingAnalytics.from_store(self.store)
+        return self._analytics
+
+    async def accounts(self, user_id: Text) -> Accounts:
+        return self._accounts.get(user_id, {})
+
+    async def transactions(self, user_id: Text, start=None, offset: int = 0, limit: int = 10) -> TransactionPage:
+        return self.store.query(user_id, start=start, offset=offset, limit=limit)
+
+    async def transaction_version(self, user_id: Text) -> Text:
+        return self.store.version(user_id)
+
+    async def spending_summary(self, user_id: Text) -> Optional[Text]:
+        if not self.analytics.has_data(user_id):
+            return None
+        return self.analytics.summary(user_id)
+
+    async def get_transfer(self, key: Text) -> Optional[TransferReceipt]:
+        return self._transfers.get(key)
+
+    async def transfer(self, receipt: TransferReceipt) -> None:
+        """Record ``receipt`` in the ledger and move the money, all or nothing"""
+        if receipt.key in self._transfers:
+            raise DuplicateTransferError(receipt.key)
+        accounts = self._accounts.get(receipt.user_id, {})
+        for account in (receipt.from_account, receipt.to_account):
+            if account not in accounts:
+                raise AccountNotFoundError(account)
+        if available_funds(accounts[receipt.from_account]) < receipt.amount:
+            raise InsufficientFundsError(receipt.from_account)
+        # No await in between, so ledger and balances change atomically on the event loop
+        self._transfers[receipt.key] = receipt
+        accounts[receipt.from_account]["balance"] -= receipt.amount
+        accounts[receipt.to_account]["balance"] += receipt.amount
+        self.store.add(receipt.user_id, transfer_transaction(receipt))
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteBankingBackend:
+    """Banking data in a SQLite file, queried through a fixed pool of connections
+
+    Each of the ``pool_size`` executor threads owns one connection, so queries
+    never block the event loop and at most ``pool_size`` run at once. WAL mode
+    lets readers proceed while a transfer commits, also across processes.
+    """
+
+    def __init__(self, path: Text = "banking.sqlite3", pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="banking-db")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._call(self._create_schema)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, fn: Callable, *args):
+        """Run ``fn(conn, *args)`` on a pool thread and wait for it (for setup code)"""
+        return self._executor.submit(lambda: fn(self._connection(), *args)).result()
+
+    async def _run(self, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            " user_id TEXT NOT NULL, account_type TEXT NOT NULL, balance REAL NOT NULL,"
+            " account_number TEXT NOT NULL, credit_limit REAL,"
+            " PRIMARY KEY (user_id, account_type))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            " id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, date TEXT NOT NULL,"
+            " description TEXT NOT NULL, amount REAL NOT NULL, type TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS transactions_user_date ON transactions (user_id, date, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS transfers ("
+            " key TEXT PRIMARY KEY, user_id TEXT NOT NULL, from_account TEXT NOT NULL,"
+            " to_account TEXT NOT NULL, amount REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def seed(self, data: Dict[Text, Any]) -> bool:
+        """Load a BANKING_DB-style mapping into an empty database; False if it had data"""
+        return self._call(self._seed, data)
+
+    @staticmethod
+    def _seed(conn: sqlite3.Connection, data: Dict[Text, Any]) -> bool:
+        if conn.execute("SELECT 1 FROM accounts LIMIT 1").fetchone():
+            return False
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO accounts VALUES (?, ?, ?, ?, ?)",
+            (
+                (user_id, account_type, a["balance"], a.get("account_number", "****"), a.get("credit_limit"))
+                for user_id, accounts in data.get("accounts", {}).items()
+                for account_type, a in accounts.items()
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO transactions (user_id, date, description, amount, type) VALUES (?, ?, ?, ?, ?)",
+            (
+                (user_id, _to_text(t["date"]), t["description"], float(t["amount"]), t["type"])
+                for user_id, transactions in data.get("transactions", {}).items()
+                for t in transactions
+            ),
+        )
+        conn.execute("COMMIT")
+        return True
+
+    @staticmethod
+    def _accounts(conn: sqlite3.Connection, user_id: Text) -> Accounts:
+        rows = conn.execute(
+            "SELECT account_type, balance, account_number, credit_limit FROM accounts WHERE user_id = ?",
+            (user_id,),
+        ).fetchall()
+        accounts: Accounts = {}
+        for account_type, balance, account_number, credit_limit in rows:
+            account = {"balance": balance, "account_number": account_number}
+            if credit_limit is not None:
+                account["credit_limit"] = credit_limit
+            accounts[account_type] = account
+        return accounts
+
+    async def accounts(self, user_id: Text) -> Accounts:
+        return await self._run(self._accounts, user_id)
+
+    @staticmethod
+    def _transactions(conn: sqlite3.Connection, user_id: Text, start, offset: int, limit: int) -> TransactionPage:
+        since = _to_text(start) if start is not None else ""
+        total = conn.execute(
+            "SELECT COUNT(*) FROM transactions WHERE user_id = ? AND date >= ?", (user_id, since)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT date, description, amount, type FROM transactions"
+            " WHERE user_id = ? AND date >= ? ORDER BY date, id LIMIT ? OFFSET ?",
+            (user_id, since, limit, offset),
+        ).fetchall()
+        page = [{"date": d, "description": desc, "amount": amount, "type": kind} for d, desc, amount, kind in rows]
+        return TransactionPage(page, total, offset, limit)
+
+    async def transactions(self, user_id: Text, start=None, offset: int = 0, limit: int = 10) -> TransactionPage:
+        return await self._run(self._transactions, user_id, start, offset, limit)
+
+    @staticmethod
+    def _spending_summary(conn: sqlite3.Connection, user_id: Text) -> Optional[Text]:
+        rows = conn.execute(
+            "SELECT date, amount, description, type FROM transactions WHERE user_id = ? ORDER BY date, id",
+            (user_id,),
+        ).fetchall()
+        if not rows:
+            return None
+        from actions.spending_analytics import SpendingAnalytics
+
+        analytics = SpendingAnalytics()
+        analytics.rebuild(
+            user_id,
+            [_to_ordinal(r[0]) for r in rows], [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows],
+        )
+        return analytics.summary(user_id)
+
+    async def spending_summary(self, user_id: Text) -> Optional[Text]:
+        return await self._run(self._spending_summary, user_id)
+
+    @staticmethod
+    def _transaction_version(conn: sqlite3.Connection, user_id: Text) -> Text:
+        # Transactions are only ever inserted, so count and newest id change
+        # together with the set; both come from the (user_id, date, id) index
+        count, last_id = conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM transactions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return f"{count}-{last_id}"
+
+    async def transaction_version(self, user_id: Text) -> Text:
+        return await self._run(self._transaction_version, user_id)
+
+    @staticmethod
+    def _get_transfer(conn: sqlite3.Connection, key: Text) -> Optional[TransferReceipt]:
+        row = conn.execute(
+            "SELECT key, user_id, from_account, to_account, amount, created_at FROM transfers WHERE key = ?",
+            (key,),
+        ).fetchone()
+        return TransferReceipt(*row) if row else None
+
+    async def get_transfer(self, key: Text) -> Optional[TransferReceipt]:
+        return await self._run(self._get_transfer, key)
+
+    @staticmethod
+    def _transfer(conn: sqlite3.Connection, receipt: TransferReceipt) -> None:
+        # IMMEDIATE takes the write lock up front, so the funds check and both
+        # updates see no interleaved writer, also from other processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            try:
+                conn.execute(
+                    "INSERT INTO transfers VALUES (?, ?, ?, ?, ?, ?)",
+                    (receipt.key, receipt.user_id, receipt.from_account, receipt.to_account,
+                     receipt.amount, receipt.created_at),
+                )
+            except sqlite3.IntegrityError:
+                raise DuplicateTransferError(receipt.key) from None
+            accounts = SQLiteBankingBackend._accounts(conn, receipt.user_id)
+            for account in (receipt.from_account, receipt.to_account):
+                if account not in accounts:
+                    raise AccountNotFoundError(account)
+            if available_funds(accounts[receipt.from_account]) < receipt.amount:
+                raise InsufficientFundsError(receipt.from_account)
+            for account, delta in ((receipt.from_account, -receipt.amount), (receipt.to_account, receipt.amount)):
+                conn.execute(
+                    "UPDATE accounts SET balance = balance + ? WHERE user_id = ? AND account_type = ?",
+                    (delta, receipt.user_id, account),
+                )
+            row = transfer_transaction(receipt)
+            conn.execute(
+                "INSERT INTO transactions (user_id, date, description, amount, type) VALUES (?, ?, ?, ?, ?)",
+                (receipt.user_id, row["date"], row["description"], row["amount"], row["type"]),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    async def transfer(self, receipt: TransferReceipt) -> None:
+        """Record ``receipt`` in the ledger and move the money in one SQLite transaction"""
+        await self._run(self._transfer, receipt)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class CachedBankingData:
+    """Read-through balance cache in front of a banking backend
+
+    Account balances are cached per user for ``ttl`` seconds and dropped as
+    soon as a transfer through this object touches that user. Each
+    invalidation bumps a per-user generation, so a read that started before a
+    transfer cannot put the old balances back into the cache. Transactions,
+    transaction versions and spending summaries pass straight through.
+    """
+
+    def __init__(self, backend, ttl: float = 5.0, max_users: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_users = max_users
+        self.clock = clock
+        self._balances: Dict[Text, Tuple[float, Accounts]] = {}
+        self._generations: Dict[Text, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def accounts(self, user_id: Text) -> Accounts:
+        """Accounts of ``user_id``; the returned mapping is shared and must not be modified"""
+        cached = self._balances.get(user_id)
+        if cached is not None and cached[0] > self.clock():
+            self.hits += 1
+            BALANCE_CACHE_LOOKUPS.labels("hit").inc()
+            return cached[1]
+
+        self.misses += 1
+        BALANCE_CACHE_LOOKUPS.labels("miss").inc()
+        generation = self._generations.get(user_id, 0)
+        accounts = await self.backend.accounts(user_id)
+        if self.ttl > 0 and self._generations.get(user_id, 0) == generation:
+            if len(self._balances) >= self.max_users:
+                self._balances.clear()
+            self._balances[user_id] = (self.clock() + self.ttl, accounts)
+        return accounts
+
+    def invalidate(self, user_id: Text) -> None:
+        self._balances.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def transactions(self, user_id: Text, start=None, offset: int = 0, limit: int = 10) -> TransactionPage:
+        return await self.backend.transactions(user_id, start=start, offset=offset, limit=limit)
+
+    async def spending_summary(self, user_id: Text) -> Optional[Text]:
+        return await self.backend.spending_summary(user_id)
+
+    async def transaction_version(self, user_id: Text) -> Text:
+        return await self.backend.transaction_version(user_id)
+
+    async def get_transfer(self, key: Text) -> Optional[TransferReceipt]:
+        return await self.backend.get_transfer(key)
+
+    async def transfer(self, receipt: TransferReceipt) -> None:
+        try:
+            await self.backend.transfer(receipt)
+        finally:
+            self.invalidate(receipt.user_id)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    @property
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._balances),
+        }
+
@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Text
+
+from actions.resilience import LatencyHistogram
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_ANALYTICS = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_ANALYTICS: "analytics",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    factory: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    key: Optional[Hashable] = field(default=None, compare=False)
+    enqueued: float = field(default_factory=time.perf_counter, compare=False)
+    waiters: int = field(default=1, compare=False)
+    task: Optional[asyncio.Task] = field(default=None, compare=False)
+
+
+class _LoopState:
+    def __init__(self):
+        self.queue: "asyncio.PriorityQueue[_Job]" = asyncio.PriorityQueue()
+        self.pending: List[_Job] = []
+        self.inflight: Dict[Hashable, _Job] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.workers: List[asyncio.Task] = []
+
+
+class RequestCoalescer:
+    """Deduplicating, prioritised worker pool in front of one upstream
+
+    Requests arriving within ``window`` seconds of each other are queued as one
+    batch, ordered by priority and then arrival. ``workers`` tasks drain the
+    queue, so at most that many upstream calls run at once. A request whose
+    ``key`` matches one that is already queued or running shares its future
+    instead of calling the upstream again.
+    """
+
+    def __init__(self, name: Text, workers: int = 16, window: float = 0.002):
+        self.name = name
+        self.workers = workers
+        self.window = window
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.abandoned = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.wait: Dict[int, LatencyHistogram] = {}
+        self._seq = itertools.count()
+        # asyncio primitives are bound to one event loop, so keep a queue per loop
+        self._states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            for closed in [l for l in self._states if l.is_closed()]:
+                del self._states[closed]
+            state = self._states[loop] = _LoopState()
+            state.workers = [loop.create_task(self._worker(state)) for _ in range(self.workers)]
+        return state
+
+    def queue_depth(self) -> int:
+        return sum(s.queue.qsize() + len(s.pending) for s in self._states.values())
+
+    async def submit(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+        key: Optional[Hashable] = None,
+    ) -> Any:
+        """Run ``factory()`` on a worker and return its result
+
+        When the last caller waiting for a call is cancelled (e.g. by an action
+        timeout), the call is dropped from the queue or, if it already runs,
+        cancelled, which also ends any stream it is publishing. Cancelling
+        only stops the client side: Gemini may still finish and bill a
+        request it has already received.
+        """
+        state = self._state()
+        self.submitted += 1
+        job = state.inflight.get(key) if key is not None else None
+        if job is not None:
+            self.deduplicated += 1
+            job.waiters += 1
+        else:
+            job = _Job(priority, next(self._seq), factory, asyncio.get_running_loop().create_future(), key)
+            if key is not None:
+                state.inflight[key] = job
+                job.future.add_done_callback(lambda _, job=job: self._forget(state, job))
+            self._enqueue(state, job)
+
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.waiters -= 1
+            if not job.waiters and not job.future.done():
+                self.abandoned += 1
+                job.future.cancel()
+                if job.task is not None:
+                    job.task.cancel()
+            raise
+
+    def _forget(self, state: _LoopState, job: _Job) -> None:
+        if state.inflight.get(job.key) is job:
+            del state.inflight[job.key]
+
+    def _enqueue(self, state: _LoopState, job: _Job) -> None:
+        if self.window <= 0:
+            state.queue.put_nowait(job)
+            self.batches += 1
+            self.max_queue_depth = max(self.max_queue_depth, state.queue.qsize())
+            return
+        state.pending.append(job)
+        if state.flush_handle is None:
+            state.flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush, state)
+
+    def _flush(self, state: _LoopState) -> None:
+        state.flush_handle = None
+        batch, state.pending = state.pending, []
+        for job in batch:
+            state.queue.put_nowait(job)
+        self.batches += 1
+        self.max_queue_depth = max(self.max_queue_depth, state.queue.qsize())
+
+    async def _worker(self, state: _LoopState) -> None:
+        while True:
+            job = await state.queue.get()
+            if job.future.done():
+                # Every caller gave up while it was queued
+                continue
+            histogram = self.wait.get(job.priority)
+            if histogram is None:
+                histogram = self.wait[job.priority] = LatencyHistogram()
+            histogram.observe(time.perf_counter() - job.enqueued)
+            # A task of its own, so abandoning the call cancels it and not the worker
+            job.task = asyncio.get_running_loop().create_task(job.factory())
+            try:
+                await asyncio.wait({job.task})
+            except asyncio.CancelledError:
+                job.task.cancel()
+                job.future.cancel()
+                raise
+            if job.task.cancelled():
+                job.future.cancel()
+                continue
+            if not job.future.done():
+                if job.task.exception() is not None:
+                    job.future.set_exception(job.task.exception())
+                else:
+                    job.future.set_result(job.task.result())
+            self.completed += 1
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            "upstream": self.name,
+            "workers": self.workers,
+            "window_ms": self.window * 1000,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "abandoned": self.abandoned,
+            "batches": self.batches,
+            "wait": {PRIORITY_NAMES.get(p, str(p)): h.snapshot() for p, h in sorted(self.wait.items())},
+        }
@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Text
+
+from rasa_sdk import Tracker
+
+NO_HISTORY = "No previous conversation."
+# Text Rasa gives user events for intents triggered through its API or by
+# reminders ("EXTERNAL: check_balance"); they hold no words of the user
+EXTERNAL_MESSAGE_PREFIX = "EXTERNAL: "
+
+
+def estimate_tokens(text: Text) -> int:
+    """Rough token count (~4 characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _is_turn(event: Dict[Text, Any]) -> bool:
+    """Whether an event is a user or bot message worth showing the model"""
+    kind = event.get("event")
+    if kind == "user":
+        return not (event.get("text") or "").startswith(EXTERNAL_MESSAGE_PREFIX)
+    return kind == "bot"
+
+
+def _topic(text: Text, max_words: int = 8) -> Text:
+    words = text.split()
+    topic = " ".join(words[:max_words]).rstrip("?!.,;: ")
+    return topic + ("..." if len(words) > max_words else "")
+
+
+@dataclass
+class _RollingSummary:
+    # Newest event timestamp already folded into the summary
+    covered_until: float = float("-inf")
+    turns: int = 0
+    topics: Deque[Text] = field(default_factory=deque)
+
+
+class HistoryBuilder:
+    """Bounded conversation history for LLM prompts
+
+    Walks tracker events newest-first and keeps verbatim user/bot turns until
+    ``token_budget`` is reached. Turns older than that are folded into a short
+    rolling summary per sender, which is cached so each older turn is
+    summarised only once. Externally triggered intents are left out, as they
+    carry an intent name rather than the user's words.
+
+    The summary is a heuristic, not a real summarisation: it lists the
+    openings of the ``max_topics`` most recent distinct older user messages,
+    capped at ``summary_budget`` tokens.
+    """
+
+    def __init__(self, token_budget: int = 400, summary_budget: int = 120, max_topics: int = 5,
+                 max_senders: int = 10000):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_topics = max_topics
+        self.max_senders = max_senders
+        self._summaries: "OrderedDict[Text, _RollingSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _summary_for(self, sender_id: Text) -> _RollingSummary:
+        with self._lock:
+            summary = self._summaries.get(sender_id)
+            if summary is None:
+                summary = self._summaries[sender_id] = _RollingSummary()
+                while len(self._summaries) > self.max_senders:
+                    self._summaries.popitem(last=False)
+            else:
+                self._summaries.move_to_end(sender_id)
+            return summary
+
+    def _fold(self, summary: _RollingSummary, older: List[Dict[Text, Any]]) -> None:
+        """Add turns (oldest first) that fell out of the verbatim window to the summary"""
+        for event in older:
+            summary.turns += 1
+            if event.get("event") == "user" and event.get("text"):
+                topic = _topic(event["text"])
+                # A repeated question moves to the newest position instead of listing twice
+                for existing in [t for t in summary.topics if t.lower() == topic.lower()]:
+                    summary.topics.remove(existing)
+                summary.topics.append(topic)
+            timestamp = event.get("timestamp")
+            if timestamp is not None:
+                summary.covered_until = max(summary.covered_until, timestamp)
+        while len(summary.topics) > self.max_topics:
+            summary.topics.popleft()
+        total = sum(estimate_tokens(t) for t in summary.topics)
+        while summary.topics and total > self.summary_budget:
+            total -= estimate_tokens(summary.topics.popleft())
+
+    def _render_summary(self, summary: _RollingSummary) -> Optional[Text]:
+        if not summary.turns:
+            return None
+        topics = "; ".join(summary.topics) if summary.topics else "general banking questions"
+        return f"Summary of {summary.turns} earlier messages: recently the user asked about {topics}."
+
+    def build(self, tracker: Tracker) -> Text:
+        events = tracker.events
+        current = tracker.latest_message.get("text")
+        skipped_current = False
+
+        summary = self._summary_for(tracker.sender_id)
+        recent: List[Text] = []
+        used = 0
+        i = len(events) - 1
+        while i >= 0:
+            event = events[i]
+            timestamp = event.get("timestamp")
+            if timestamp is not None and timestamp <= summary.covered_until:
+                # Already part of the rolling summary
+                break
+            kind = event.get("event")
+            if _is_turn(event):
+                text = event.get("text") or ""
+                # The message being answered is added to the prompt separately
+                if kind == "user" and not skipped_current and text == current:
+                    skipped_current = True
+                    i -= 1
+                    continue
+                line = f"{'User' if kind == 'user' else 'Assistant'}: {text}"
+                cost = estimate_tokens(line)
+                if used + cost > self.token_budget:
+                    break
+                recent.append(line)
+                used += cost
+            i -= 1
+
+        # Everything from index i backwards is outside the verbatim window
+        older: List[Dict[Text, Any]] = []
+        while i >= 0:
+            event = events[i]
+            timestamp = event.get("timestamp")
+            if timestamp is not None and timestamp <= summary.covered_until:
+                break
+            if _is_turn(event):
+                older.append(event)
+            i -= 1
+        if older:
+            older.reverse()
+            self._fold(summary, older)
+
+        lines = list(reversed(recent))
+        rendered = self._render_summary(summary)
+        if rendered:
+            lines.insert(0, rendered)
+        return "\n".join(lines) if lines else NO_HISTORY
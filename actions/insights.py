@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Text, Tuple
+
+from actions.telemetry import INSIGHT_LOOKUPS, INSIGHTS_PRECOMPUTED
+
+logger = logging.getLogger(__name__)
+
+# generate(summary, publisher, background) -> insight text
+Generator = Callable[[Text, Any, bool], Awaitable[Optional[Text]]]
+
+
+@dataclass
+class Insight:
+    user_id: Text
+    version: Text
+    text: Text
+    created_at: float
+
+
+class InMemoryInsightBackend:
+    """Process-local LRU store, one insight per user"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Text, Insight]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Text) -> Optional[Insight]:
+        with self._lock:
+            insight = self._entries.get(user_id)
+            if insight is not None:
+                self._entries.move_to_end(user_id)
+            return insight
+
+    def put(self, insight: Insight) -> None:
+        with self._lock:
+            self._entries[insight.user_id] = insight
+            self._entries.move_to_end(insight.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id: Text) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteInsightBackend:
+    """LRU store in a SQLite file, shared by action server processes"""
+
+    def __init__(self, path: Text = "insights.sqlite3", max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spending_insights ("
+            " user_id TEXT PRIMARY KEY, version TEXT NOT NULL, text TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS spending_insights_lru ON spending_insights (last_access)"
+        )
+
+    def get(self, user_id: Text) -> Optional[Insight]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id, version, text, created_at FROM spending_insights WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE spending_insights SET last_access = ? WHERE user_id = ?", (time.time(), user_id)
+                )
+        return Insight(*row) if row else None
+
+    def put(self, insight: Insight) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO spending_insights VALUES (?, ?, ?, ?, ?)",
+                (insight.user_id, insight.version, insight.text, insight.created_at, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM spending_insights WHERE user_id IN ("
+                " SELECT user_id FROM spending_insights ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, user_id: Text) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM spending_insights WHERE user_id = ?", (user_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spending_insights").fetchone()[0]
+
+
+class SpendingInsights:
+    """Spending insights memoized per user and transaction version
+
+    An insight stays valid while the user's transaction version is unchanged
+    and it is younger than ``ttl`` seconds. After the transactions change, the
+    old insight may still be served for ``max_stale`` seconds from its
+    creation while a refresh runs in the background (0 never serves it).
+    Concurrent requests for the same user share one generation. A request
+    that finds only a background generation running replaces it with its own,
+    so it is not queued at background priority and can stream.
+
+    Users are active for ``active_window`` seconds after they last asked for
+    an analysis. With ``precompute`` on, every ``interval`` seconds a worker
+    regenerates the insights of active users whose transactions changed, at
+    most ``concurrency`` at a time, so their next analysis is a cache lookup.
+    """
+
+    def __init__(
+        self,
+        data,
+        generate: Generator,
+        backend=None,
+        fingerprint: Text = "",
+        ttl: float = 86400.0,
+        max_stale: float = 0.0,
+        precompute: bool = False,
+        interval: float = 30.0,
+        active_window: float = 1800.0,
+        concurrency: int = 2,
+        max_active: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.data = data
+        self.generate = generate
+        self.backend = backend if backend is not None else InMemoryInsightBackend()
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.precompute = precompute
+        self.interval = interval
+        self.active_window = active_window
+        self.concurrency = concurrency
+        self.max_active = max_active
+        self.clock = clock
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.precomputed = 0
+        self._active: "OrderedDict[Text, float]" = OrderedDict()
+        self._inflight: Dict[Tuple[Text, Text], asyncio.Task] = {}
+        # In-flight generations started by a refresh rather than a request
+        self._refreshing: Set[asyncio.Task] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def version(self, user_id: Text) -> Text:
+        """Transaction version of ``user_id`` combined with the prompt and model fingerprint"""
+        return f"{self.fingerprint}:{await self.data.transaction_version(user_id)}"
+
+    def lookup(self, user_id: Text, version: Text) -> Tuple[Optional[Insight], Text]:
+        """Cached insight and ``hit``, ``stale`` or ``miss``"""
+        insight = self.backend.get(user_id)
+        if insight is None:
+            return None, "miss"
+        age = self.clock() - insight.created_at
+        if age > self.ttl:
+            return None, "miss"
+        if insight.version == version:
+            return insight, "hit"
+        if age < self.max_stale:
+            return insight, "stale"
+        return None, "miss"
+
+    def _count(self, result: Text) -> None:
+        INSIGHT_LOOKUPS.labels(result).inc()
+        if result == "hit":
+            self.hits += 1
+        elif result == "stale":
+            self.stale += 1
+        else:
+            self.misses += 1
+
+    async def get(self, user_id: Text, publisher=None) -> Optional[Text]:
+        """Insight for ``user_id``; None when the user has no transactions"""
+        self.touch(user_id)
+        version = await self.version(user_id)
+        insight, result = self.lookup(user_id, version)
+        self._count(result)
+        if result == "hit":
+            return insight.text
+        if result == "stale":
+            self._spawn(self.refresh(user_id, version))
+            return insight.text
+        # Shielded, so a timed-out request does not cancel a generation
+        # the precompute worker or another request is waiting for
+        try:
+            return await asyncio.shield(self._generate(user_id, version, publisher))
+        except asyncio.CancelledError:
+            # The generation goes on for the cache, but its client is gone
+            if publisher is not None:
+                publisher.enabled = False
+            raise
+
+    def _generate(self, user_id: Text, version: Text, publisher=None, background: bool = False) -> asyncio.Task:
+        key = (user_id, version)
+        task = self._inflight.get(key)
+        if task is not None and not background and task in self._refreshing:
+            # A background generation waits behind every other Gemini call and
+            # does not stream, so start an interactive one instead. Cancelling
+            # drops it from the queue; one already sent may still be billed.
+            task.cancel()
+            task = None
+        # A finished task stays here until its done callback runs
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._compute(user_id, version, publisher, background))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+            if background:
+                self._refreshing.add(task)
+                task.add_done_callback(self._refreshing.discard)
+        return task
+
+    async def _compute(self, user_id: Text, version: Text, publisher, background: bool) -> Optional[Text]:
+        # The version is read before the summary: a transaction landing in
+        # between stores the newer insight under the older version, which the
+        # next lookup treats as outdated rather than the other way round
+        summary = await self.data.spending_summary(user_id)
+        if summary is None:
+            return None
+        created_at = self.clock()
+        text = await self.generate(summary, publisher, background)
+        if text:
+            self.backend.put(Insight(user_id, version, text, created_at))
+        return text
+
+    async def refresh(self, user_id: Text, version: Optional[Text] = None) -> bool:
+        """Regenerate the insight of ``user_id`` unless it is current; True if it generated one"""
+        version = version or await self.version(user_id)
+        insight = self.backend.get(user_id)
+        if insight is not None and insight.version == version and self.clock() - insight.created_at <= self.ttl:
+            return False
+        task = self._generate(user_id, version, background=True)
+        try:
+            # Shielded, so a cancelled task means a request took the generation over
+            text = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return False
+            raise
+        except Exception as e:
+            logger.warning(f"Spending insight refresh for {user_id} failed: {e}")
+            return False
+        if text:
+            self.precomputed += 1
+            INSIGHTS_PRECOMPUTED.inc()
+        return bool(text)
+
+    def touch(self, user_id: Text) -> None:
+        """Mark ``user_id`` active and make sure the precompute worker runs
+
+        Only analysis requests should call this, so routine banking traffic
+        never leads to Gemini calls.
+        """
+        self._active[user_id] = self.clock()
+        self._active.move_to_end(user_id)
+        while len(self._active) > self.max_active:
+            self._active.popitem(last=False)
+        self.start()
+
+    def active_users(self):
+        cutoff = self.clock() - self.active_window
+        while self._active and next(iter(self._active.values())) < cutoff:
+            self._active.popitem(last=False)
+        return list(self._active)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def start(self) -> None:
+        """Start the precompute worker on the running loop (no-op if disabled or running)"""
+        if not self.precompute or (self._worker is not None and not self._worker.done()):
+            return
+        try:
+            self._worker = asyncio.get_running_loop().create_task(self._precompute_loop())
+        except RuntimeError:
+            # No running loop yet; the first touch() from an action starts it
+            pass
+
+    async def precompute_once(self) -> int:
+        """Refresh every active user's insight once; the number generated"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(user_id: Text) -> bool:
+            async with semaphore:
+                return await self.refresh(user_id)
+
+        results = await asyncio.gather(*(one(u) for u in self.active_users()))
+        return sum(results)
+
+    async def _precompute_loop(self) -> None:
+        while True:
+            try:
+                await self.precompute_once()
+            except Exception as e:
+                logger.warning(f"Spending insight precompute failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._worker, *self._background, *self._inflight.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    @property
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale) / lookups if lookups else 0.0,
+            "precomputed": self.precomputed,
+            "active_users": len(self._active),
+            "size": len(self.backend),
+        }
@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Text, Tuple
+
+from actions.coalescer import PRIORITY_INTERACTIVE, RequestCoalescer
+from actions.resilience import CircuitBreaker, ResilientCaller
+from actions.telemetry import GEMINI_CIRCUIT_OPEN, GEMINI_QUEUE_DEPTH, GEMINI_SECONDS, record_usage
+
+logger = logging.getLogger(__name__)
+
+# Maximum in-flight requests per upstream service
+UPSTREAM_CONCURRENCY: Dict[Text, int] = {
+    "gemini": int(os.getenv("GEMINI_CONCURRENCY", "16")),
+}
+
+# Total time budget (queueing + generation) per action, in seconds
+ACTION_TIMEOUTS: Dict[Text, float] = {
+    "action_banking_gemini_fallback": float(os.getenv("FALLBACK_TIMEOUT", "15")),
+    "action_analyze_spending": float(os.getenv("SPENDING_ANALYSIS_TIMEOUT", "25")),
+}
+DEFAULT_ACTION_TIMEOUT = 30.0
+
+# Deadline / retry / hedging / circuit breaker settings for Gemini calls
+GEMINI_BREAKER = CircuitBreaker(
+    error_rate=float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5")),
+    min_calls=int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10")),
+    window=float(os.getenv("GEMINI_BREAKER_WINDOW", "30")),
+    cooldown=float(os.getenv("GEMINI_BREAKER_COOLDOWN", "15")),
+)
+GEMINI = ResilientCaller(
+    "gemini",
+    timeout=float(os.getenv("GEMINI_CALL_TIMEOUT", "8")),
+    retries=int(os.getenv("GEMINI_RETRIES", "2")),
+    backoff_base=float(os.getenv("GEMINI_BACKOFF_BASE", "0.2")),
+    backoff_max=float(os.getenv("GEMINI_BACKOFF_MAX", "2")),
+    hedge=os.getenv("GEMINI_HEDGE", "false").lower() == "true",
+    hedge_quantile=float(os.getenv("GEMINI_HEDGE_QUANTILE", "0.95")),
+    breaker=GEMINI_BREAKER,
+)
+# Streams cannot be retried or hedged once chunks reach the client, so only
+# opening the stream is protected; it shares the breaker with GEMINI
+GEMINI_STREAM = ResilientCaller(
+    "gemini_stream",
+    timeout=GEMINI.timeout,
+    retries=GEMINI.retries,
+    backoff_base=GEMINI.backoff_base,
+    backoff_max=GEMINI.backoff_max,
+    breaker=GEMINI_BREAKER,
+)
+
+# Worker pool in front of Gemini: bounds concurrency, shares identical in-flight
+# prompts and serves interactive turns ahead of analytics
+GEMINI_POOL = RequestCoalescer(
+    "gemini",
+    workers=UPSTREAM_CONCURRENCY["gemini"],
+    window=float(os.getenv("GEMINI_BATCH_WINDOW_MS", "2")) / 1000,
+)
+GEMINI_QUEUE_DEPTH.set_function(GEMINI_POOL.queue_depth)
+GEMINI_CIRCUIT_OPEN.set_function(lambda: GEMINI_BREAKER.state == CircuitBreaker.OPEN)
+
+
+def action_timeout(action_name: Text) -> float:
+    return ACTION_TIMEOUTS.get(action_name, DEFAULT_ACTION_TIMEOUT)
+
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def gemini_sdk():
+    """``google.generativeai``, imported and configured on first use
+
+    The SDK import takes about half a second, so it is kept off the action
+    server's startup path.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+
+class ModelRegistry:
+    """Build each Gemini client once per (model, system instruction, generation config)
+
+    ``factory`` builds a client and defaults to the SDK's ``GenerativeModel``.
+    """
+
+    def __init__(self, factory: Optional[Callable[..., Any]] = None):
+        self.factory = factory
+        self._models: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model_name: Text,
+        system_instruction: Optional[Text] = None,
+        generation_config: Optional[Dict[Text, Any]] = None,
+    ) -> Any:
+        key = (model_name, system_instruction, tuple(sorted((generation_config or {}).items())))
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    factory = self.factory or gemini_sdk().GenerativeModel
+                    model = self._models[key] = factory(
+                        model_name,
+                        system_instruction=system_instruction,
+                        generation_config=generation_config,
+                    )
+        return model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+def response_text(response: Any) -> Optional[Text]:
+    """Text of a Gemini response, falling back to the first candidate part"""
+    return getattr(response, "text", None) or (
+        response.candidates[0].content.parts[0].text if response and response.candidates
+        else None
+    )
+
+
+async def generate_text(
+    model: Any, prompt: Text, publisher=None, priority: int = PRIORITY_INTERACTIVE
+) -> Optional[Text]:
+    """Run a Gemini completion without blocking the action server's event loop
+
+    With a ``publisher`` the completion is streamed and each chunk is pushed to
+    the client as it arrives; the full text is returned either way. Streams go
+    to a single client, so only non-streamed prompts are deduplicated.
+    """
+    model_name = getattr(model, "model_name", "unknown")
+    if publisher:
+        async def stream() -> Optional[Text]:
+            chunks = await GEMINI_STREAM.call(lambda: model.generate_content_async(prompt, stream=True))
+            return await publisher.stream(_counting_usage(model_name, chunks))
+
+        with GEMINI_SECONDS.labels(model_name, "stream").time():
+            return await GEMINI_POOL.submit(stream, priority)
+
+    async def complete() -> Optional[Text]:
+        response = await GEMINI.call(lambda: model.generate_content_async(prompt))
+        record_usage(model_name, getattr(response, "usage_metadata", None))
+        return response_text(response)
+
+    # ModelRegistry hands out one client per configuration, so its identity
+    # stands in for model name, system instruction and generation config
+    with GEMINI_SECONDS.labels(model_name, "complete").time():
+        return await GEMINI_POOL.submit(complete, priority, key=(id(model), prompt))
+
+
+async def _counting_usage(model_name: Text, chunks) -> AsyncIterator[Any]:
+    """Pass stream chunks through, recording the usage reported with the last one"""
+    usage = None
+    async for chunk in chunks:
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        yield chunk
+    record_usage(model_name, usage)
+
+
+def gemini_health() -> Dict[Text, Any]:
+    """Breaker state, counters, latency histograms and queue metrics of the Gemini callers"""
+    return {
+        "gemini": GEMINI.snapshot(),
+        "gemini_stream": GEMINI_STREAM.snapshot(),
+        "gemini_pool": GEMINI_POOL.snapshot(),
+    }
+
+
+def warm_up(registry: ModelRegistry, configs: Iterable[Tuple[Text, Optional[Text], Optional[Dict]]],
+            connect: bool = False) -> None:
+    """Import the SDK and build the clients for ``configs`` before the first turn needs them
+
+    With ``connect`` each model's metadata is also fetched, which resolves
+    DNS and opens the TLS connection to the API.
+    """
+    try:
+        for model_name, system_instruction, generation_config in configs:
+            registry.get(model_name, system_instruction, generation_config)
+            if connect:
+                gemini_sdk().get_model(f"models/{model_name}")
+        logger.info("Gemini warm-up finished")
+    except Exception as e:
+        logger.warning(f"Gemini warm-up failed: {e}")
+
+
+def start_warm_up(registry: ModelRegistry, configs, mode: Text) -> Optional[threading.Thread]:
+    """Run ``warm_up`` on a daemon thread; ``mode`` is off, import or connect"""
+    if mode not in ("import", "connect"):
+        return None
+    thread = threading.Thread(
+        target=warm_up, args=(registry, list(configs), mode == "connect"), name="gemini-warmup", daemon=True,
+    )
+    thread.start()
+    return thread
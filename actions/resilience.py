@@ -0,0 +1,261 @@
+import asyncio
+import bisect
+import functools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, float("inf"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+@functools.lru_cache(maxsize=None)
+def _transient_errors() -> Tuple[type, ...]:
+    # Resolved on the first failure, keeping google.api_core out of startup
+    errors: List[type] = [asyncio.TimeoutError, ConnectionError]
+    try:
+        from google.api_core import exceptions as google_exceptions
+        errors += [
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+        ]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+class LatencyHistogram:
+    """Bucketed latency counts plus a window of recent samples for quantiles"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, window: int = 512):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        self._recent.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        if len(self._recent) < min_samples:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)},
+            "count": self.total,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5, min_samples=1),
+            "p95": self.quantile(0.95, min_samples=1),
+            "p99": self.quantile(0.99, min_samples=1),
+        }
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a rolling time window
+
+    closed -> open when at least ``min_calls`` outcomes in the last ``window``
+    seconds have an error rate >= ``error_rate``. After ``cooldown`` seconds one
+    half-open probe is let through; success closes the circuit, failure reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, error_rate: float = 0.5, min_calls: int = 10, window: float = 30.0,
+                 cooldown: float = 15.0, clock: Callable[[], float] = time.monotonic):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probe_in_flight = False
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """End a call that was allowed but produced no outcome (e.g. it was cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record(self, ok: bool) -> None:
+        now = self.clock()
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if ok:
+                logger.info("Circuit closed after successful probe")
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._trip(now)
+            return
+
+        self._outcomes.append((now, ok))
+        self._prune(now)
+        if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+            errors = sum(1 for _, success in self._outcomes if not success)
+            if errors / len(self._outcomes) >= self.error_rate:
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        logger.warning("Circuit opened: upstream error rate above threshold")
+        self.state = self.OPEN
+        self.opened_at = now
+        self._outcomes.clear()
+
+    def snapshot(self) -> Dict[Text, Any]:
+        self._prune(self.clock())
+        errors = sum(1 for _, success in self._outcomes if not success)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_errors": errors,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientCaller:
+    """Deadline, retry, hedging and circuit breaking around one upstream
+
+    ``call(factory)`` invokes ``factory()`` (which must return a fresh awaitable
+    each time) with a per-attempt ``timeout``. Transient failures are retried up
+    to ``retries`` times with full-jitter exponential backoff. With ``hedge``
+    enabled, an attempt still pending after the recent p95 latency races a
+    second request and the first success wins.
+    """
+
+    def __init__(self, name: Text, timeout: float = 8.0, retries: int = 2, backoff_base: float = 0.2,
+                 backoff_max: float = 2.0, hedge: bool = False, hedge_quantile: float = 0.95,
+                 breaker: Optional[CircuitBreaker] = None, rng: Optional[random.Random] = None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.hedged = 0
+        self._rng = rng or random.Random()
+
+    def _backoff(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _attempt(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.latency.quantile(self.hedge_quantile) if self.hedge else None
+        primary = asyncio.ensure_future(factory())
+        if delay is None or delay >= self.timeout:
+            return await asyncio.wait_for(primary, self.timeout)
+
+        tasks = {primary}
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.add(asyncio.ensure_future(factory()))
+            error: Optional[BaseException] = None
+            while tasks:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        if not self.breaker.allow():
+            self.failures += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        # The breaker gets one outcome per call, not per attempt, so the
+        # retries of a single slow request cannot open it on their own
+        ok: Optional[bool] = None
+        try:
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    result = await self._attempt(factory)
+                except _transient_errors() as e:
+                    # Other calls opened the breaker meanwhile: stop retrying
+                    if attempt >= self.retries or self.breaker.state == CircuitBreaker.OPEN:
+                        ok = False
+                        self.failures += 1
+                        raise
+                    logger.warning(f"{self.name} attempt {attempt + 1} failed ({type(e).__name__}), retrying")
+                    self.retried += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+                except Exception:
+                    ok = False
+                    self.failures += 1
+                    raise
+                ok = True
+                self.latency.observe(time.perf_counter() - started)
+                return result
+        finally:
+            if ok is None:
+                # Cancelled: no outcome, but a half-open probe must not stay claimed
+                self.breaker.release()
+            else:
+                self.breaker.record(ok)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            "upstream": self.name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retried,
+            "hedged": self.hedged,
+            "breaker": self.breaker.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
@@ -0,0 +1,306 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Text, Tuple
+
+# Sparse embedding: feature index -> weight, L2-normalised
+Embedding = Dict[int, float]
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Anything that looks like customer data makes a conversation "personal"
+# and therefore unsafe to answer from a shared cache.
+_PERSONAL_DATA = re.compile(
+    r"\$\s?\d"                      # currency amounts
+    r"|\*{2,}\d"                    # masked account numbers (****1234)
+    r"|\b\d{4,}\b"                  # card / account / phone numbers
+    r"|\b\d{4}-\d{2}-\d{2}\b"       # transaction dates
+    r"|[\w.+-]+@[\w-]+\.[\w.]+",    # email addresses
+)
+
+
+def normalize_text(text: Text) -> Text:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# Words that do not change what a question asks about
+_STOPWORDS = frozenset(
+    "a about am an and any are be can could did didn do does doesn don explain for get had has have "
+    "how i if is isn it its me mean means my of on or our please s should so tell that the there this "
+    "to was wasn we were what when where which who why will with would you your".split()
+)
+# Negations stay content, in one spelling, so "not X" never matches "X"
+_NEGATIONS = frozenset(("not", "no", "never", "cannot", "t", "nt"))
+
+
+def content_signature(text: Text) -> Text:
+    """Sorted content words of the text, negations included
+
+    Two questions can only share an answer when their signatures are equal.
+    Words are compared whole, so antonyms formed with a prefix (activate /
+    deactivate, enable / disable) stay different however similar they look.
+    """
+    words: Set[Text] = set()
+    for word in normalize_text(text).split():
+        if word in _NEGATIONS:
+            words.add("not")
+        elif word not in _STOPWORDS:
+            # Plural and singular ask the same thing
+            words.add(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word)
+    return " ".join(sorted(words))
+
+
+def contains_personal_data(text: Text) -> bool:
+    """Whether the text carries amounts, account numbers or other customer data"""
+    return bool(_PERSONAL_DATA.search(text or ""))
+
+
+def hashed_ngram_embedding(text: Text, dims: int = 1024, n: int = 3) -> Embedding:
+    """Cheap local embedding: hashed character n-gram counts, L2-normalised"""
+    padded = f" {normalize_text(text)} "
+    counts: Dict[int, float] = {}
+    for i in range(max(len(padded) - n + 1, 1)):
+        index = zlib.crc32(padded[i:i + n].encode("utf-8")) % dims
+        counts[index] = counts.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def cosine_similarity(a: Embedding, b: Embedding) -> float:
+    """Dot product of two normalised sparse embeddings"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+@dataclass
+class CacheEntry:
+    key: Text
+    signature: Text
+    embedding: Embedding
+    response: Text
+    created_at: float
+
+
+class InMemoryCacheBackend:
+    """Process-local LRU store"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Text, CacheEntry]" = OrderedDict()
+        self._by_signature: Dict[Text, Set[Text]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Text) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def _unindex(self, entry: CacheEntry) -> None:
+        keys = self._by_signature.get(entry.signature)
+        if keys is not None:
+            keys.discard(entry.key)
+            if not keys:
+                del self._by_signature[entry.signature]
+
+    def touch(self, key: Text) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def put(self, entry: CacheEntry) -> None:
+        with self._lock:
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                self._unindex(previous)
+            self._entries[entry.key] = entry
+            self._by_signature.setdefault(entry.signature, set()).add(entry.key)
+            while len(self._entries) > self.max_entries:
+                self._unindex(self._entries.popitem(last=False)[1])
+
+    def delete(self, key: Text) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._unindex(entry)
+
+    def candidates(self, signature: Text) -> Iterable[CacheEntry]:
+        """Entries whose question has this content signature"""
+        with self._lock:
+            return [self._entries[key] for key in self._by_signature.get(signature, ())]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU store in a SQLite file, shareable between action server processes"""
+
+    def __init__(self, path: Text = "fallback_cache.sqlite3", max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(fallback_cache)")]
+        if columns and "signature" not in columns:
+            # Written before content signatures; the cached answers can simply go
+            self._conn.execute("DROP TABLE fallback_cache")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fallback_cache ("
+            " key TEXT PRIMARY KEY, signature TEXT NOT NULL, embedding TEXT NOT NULL,"
+            " response TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS fallback_cache_lru ON fallback_cache (last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS fallback_cache_signature ON fallback_cache (signature)"
+        )
+
+    @staticmethod
+    def _to_entry(row) -> CacheEntry:
+        key, signature, embedding, response, created_at = row
+        return CacheEntry(
+            key=key,
+            signature=signature,
+            embedding={int(k): v for k, v in json.loads(embedding).items()},
+            response=response,
+            created_at=created_at,
+        )
+
+    def get(self, key: Text) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, signature, embedding, response, created_at FROM fallback_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return self._to_entry(row) if row else None
+
+    def touch(self, key: Text) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE fallback_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+
+    def put(self, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fallback_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.key, entry.signature, json.dumps(entry.embedding), entry.response,
+                 entry.created_at, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM fallback_cache WHERE key IN ("
+                " SELECT key FROM fallback_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: Text) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM fallback_cache WHERE key = ?", (key,))
+
+    def candidates(self, signature: Text) -> Iterable[CacheEntry]:
+        """Entries whose question has this content signature"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, signature, embedding, response, created_at FROM fallback_cache WHERE signature = ?",
+                (signature,),
+            ).fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fallback_cache").fetchone()[0]
+
+
+class SemanticResponseCache:
+    """Cache of generic fallback answers keyed by normalised, embedding-similar text
+
+    An exact match on the normalised text is tried first. Otherwise the most
+    similar unexpired cached question above ``threshold`` is returned, among
+    those with the same content signature only: character n-grams alone rate
+    "activate my card" and "deactivate my card" as near-identical. Entries
+    expire after ``ttl`` seconds and the backend evicts least recently used
+    entries. Lookups and stores block on the backend, so async callers should
+    run them in an executor.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        ttl: float = 3600.0,
+        threshold: float = 0.9,
+        embedder: Callable[[Text], Embedding] = hashed_ngram_embedding,
+    ):
+        self.backend = backend if backend is not None else InMemoryCacheBackend()
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embedder = embedder
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl
+
+    def lookup(self, text: Text) -> Optional[Text]:
+        key = normalize_text(text)
+        if not key:
+            return None
+        now = time.time()
+
+        entry = self.backend.get(key)
+        if entry is not None and self._expired(entry, now):
+            self.backend.delete(entry.key)
+            entry = None
+
+        signature = content_signature(text)
+        if entry is None and signature:
+            embedding = self.embedder(text)
+            scored: List[Tuple[float, CacheEntry]] = [
+                (cosine_similarity(embedding, candidate.embedding), candidate)
+                for candidate in self.backend.candidates(signature)
+            ]
+            scored.sort(key=lambda pair: pair[0], reverse=True)
+            for score, candidate in scored:
+                if score < self.threshold:
+                    break
+                if self._expired(candidate, now):
+                    # Fall through to the next best match
+                    self.backend.delete(candidate.key)
+                    continue
+                entry = candidate
+                break
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.backend.touch(entry.key)
+        return entry.response
+
+    def store(self, text: Text, response: Text) -> None:
+        key = normalize_text(text)
+        if not key:
+            return
+        self.backend.put(CacheEntry(
+            key=key, signature=content_signature(text), embedding=self.embedder(text),
+            response=response, created_at=time.time(),
+        ))
+
+    @property
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.backend),
+        }
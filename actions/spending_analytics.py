@@ -0,0 +1,314 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Deque, Dict, Sequence, Text
+
+import numpy as np
+
+# Merchant keyword -> spending category; first match wins
+MERCHANT_CATEGORIES = [
+    ("SALARY", "Income"),
+    ("PAYROLL", "Income"),
+    ("DEPOSIT", "Income"),
+    ("TRANSFER", "Transfers"),
+    ("AMAZON", "Shopping"),
+    ("TARGET", "Shopping"),
+    ("WALMART", "Shopping"),
+    ("WHOLE FOODS", "Groceries"),
+    ("TRADER JOE", "Groceries"),
+    ("KROGER", "Groceries"),
+    ("STARBUCKS", "Dining"),
+    ("RESTAURANT", "Dining"),
+    ("MCDONALD", "Dining"),
+    ("DOORDASH", "Dining"),
+    ("UBER", "Transport"),
+    ("LYFT", "Transport"),
+    ("SHELL", "Transport"),
+    ("NETFLIX", "Entertainment"),
+    ("SPOTIFY", "Entertainment"),
+    ("RENT", "Housing"),
+    ("MORTGAGE", "Housing"),
+    ("ELECTRIC", "Utilities"),
+    ("VERIZON", "Utilities"),
+]
+CATEGORIES = sorted({category for _, category in MERCHANT_CATEGORIES} | {"Other"})
+CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
+
+# Money moving between the customer's own accounts or coming in is not spending
+NON_SPENDING = {"Income", "Transfers"}
+_SPENDING_MASK = np.array([category not in NON_SPENDING for category in CATEGORIES])
+
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_MIN_SAMPLES = 5
+MAX_ANOMALIES = 20
+
+_EPOCH = np.datetime64("0001-01-01", "D")
+
+
+@lru_cache(maxsize=65536)
+def categorize(description: Text) -> Text:
+    upper = description.upper()
+    for keyword, category in MERCHANT_CATEGORIES:
+        if keyword in upper:
+            return category
+    return "Other"
+
+
+def _month_key(ordinal: int) -> int:
+    d = date.fromordinal(ordinal)
+    return d.year * 12 + d.month - 1
+
+
+def _month_label(key: int) -> Text:
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
+
+@dataclass
+class Anomaly:
+    date: Text
+    description: Text
+    amount: float
+    category: Text
+    z_score: float
+
+
+class _UserAggregates:
+    """Monthly category totals and per-category amount statistics for one user"""
+
+    def __init__(self):
+        self.count = 0
+        self.monthly: Dict[int, np.ndarray] = {}
+        self.income: Dict[int, float] = {}
+        # Welford running statistics of spend amounts per category
+        self.n = np.zeros(len(CATEGORIES))
+        self.mean = np.zeros(len(CATEGORIES))
+        self.m2 = np.zeros(len(CATEGORIES))
+        self.anomalies: Deque[Anomaly] = deque(maxlen=MAX_ANOMALIES)
+
+    def std(self, category: int) -> float:
+        return float(np.sqrt(self.m2[category] / self.n[category])) if self.n[category] else 0.0
+
+
+def _prior_z_scores(spend: np.ndarray, codes: np.ndarray):
+    """z-score of each amount against the earlier amounts of its category, and the anomaly flags
+
+    Matches what ``SpendingAnalytics.add`` computes one transaction at a time.
+    Amounts are shifted by their category's first amount before summing, so
+    a run of equal amounts has a variance of exactly zero, as with Welford.
+    """
+    order = np.argsort(codes, kind="stable")
+    x = spend[order]
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, sorted_codes, side="left")
+    positions = np.arange(len(x))
+    prior_n = (positions - starts).astype(np.float64)
+
+    shifted = x - x[starts]
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prior_mean = (sums[positions] - sums[starts]) / prior_n
+        prior_var = (squares[positions] - squares[starts]) / prior_n - prior_mean ** 2
+        prior_std = np.sqrt(np.maximum(prior_var, 0.0))
+        z_sorted = (shifted - prior_mean) / prior_std
+    flags_sorted = (prior_n >= ANOMALY_MIN_SAMPLES) & (prior_std > 0) & (z_sorted >= ANOMALY_Z_THRESHOLD)
+
+    z = np.empty_like(z_sorted)
+    flags = np.empty_like(flags_sorted)
+    z[order] = z_sorted
+    flags[order] = flags_sorted
+    return z, flags
+
+
+class SpendingAnalytics:
+    """Per-user spending aggregates, built vectorised and kept up to date incrementally
+
+    ``rebuild`` computes everything from a user's full history with NumPy;
+    ``add`` folds in a single new transaction in O(categories). Both flag a
+    transaction as unusual against the transactions before it only, so a
+    rebuild flags the same ones as adding the history one by one. ``summary``
+    renders the compact text that Gemini narrates.
+    """
+
+    def __init__(self):
+        self._users: Dict[Text, _UserAggregates] = {}
+
+    @classmethod
+    def from_store(cls, store) -> "SpendingAnalytics":
+        """Build aggregates for every user in a TransactionStore and follow its updates"""
+        analytics = cls()
+        for user_id in store.users():
+            analytics.rebuild(user_id, *store.columns(user_id))
+        store.subscribe(analytics.add)
+        return analytics
+
+    def rebuild(
+        self,
+        user_id: Text,
+        ordinals: Sequence[int],
+        amounts: Sequence[float],
+        descriptions: Sequence[Text],
+        types: Sequence[Text] = (),
+    ) -> None:
+        aggregates = _UserAggregates()
+        self._users[user_id] = aggregates
+        if not len(ordinals):
+            return
+
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        codes = np.fromiter(
+            (CATEGORY_INDEX[categorize(d)] for d in descriptions), dtype=np.int64, count=len(descriptions)
+        )
+        months = (_EPOCH + (ordinals - 1)).astype("datetime64[M]").astype(np.int64) + 1970 * 12
+        aggregates.count = len(ordinals)
+
+        spend_rows = _SPENDING_MASK[codes] & (amounts < 0)
+        spend = -amounts[spend_rows]
+        spend_codes = codes[spend_rows]
+        spend_months = months[spend_rows]
+
+        # Month x category totals in one bincount
+        unique_months, month_rows = np.unique(spend_months, return_inverse=True)
+        totals = np.bincount(
+            month_rows * len(CATEGORIES) + spend_codes, weights=spend,
+            minlength=len(unique_months) * len(CATEGORIES),
+        ).reshape(len(unique_months), len(CATEGORIES))
+        aggregates.monthly = {int(m): totals[i] for i, m in enumerate(unique_months)}
+
+        income_rows = amounts > 0
+        income_months, income_idx = np.unique(months[income_rows], return_inverse=True)
+        income = np.bincount(income_idx, weights=amounts[income_rows])
+        aggregates.income = {int(m): float(v) for m, v in zip(income_months, income)}
+
+        # Per-category mean / variance of spend amounts
+        n = np.bincount(spend_codes, minlength=len(CATEGORIES)).astype(np.float64)
+        mean = np.divide(
+            np.bincount(spend_codes, weights=spend, minlength=len(CATEGORIES)), n,
+            out=np.zeros(len(CATEGORIES)), where=n > 0,
+        )
+        m2 = np.bincount(spend_codes, weights=(spend - mean[spend_codes]) ** 2, minlength=len(CATEGORIES))
+        aggregates.n, aggregates.mean, aggregates.m2 = n, mean, m2
+
+        z, flags = _prior_z_scores(spend, spend_codes)
+        flagged = np.nonzero(flags)[0][-MAX_ANOMALIES:]
+        spend_index = np.nonzero(spend_rows)[0]
+        for i in flagged:
+            row = spend_index[i]
+            aggregates.anomalies.append(Anomaly(
+                date=date.fromordinal(int(ordinals[row])).isoformat(),
+                description=descriptions[row],
+                amount=float(spend[i]),
+                category=CATEGORIES[spend_codes[i]],
+                z_score=float(z[i]),
+            ))
+
+    def add(self, user_id: Text, transaction: Dict[Text, Any]) -> None:
+        aggregates = self._users.setdefault(user_id, _UserAggregates())
+        aggregates.count += 1
+        amount = float(transaction["amount"])
+        transaction_date = transaction["date"]
+        if isinstance(transaction_date, str):
+            transaction_date = date.fromisoformat(transaction_date)
+        month = _month_key(transaction_date.toordinal())
+
+        if amount > 0:
+            aggregates.income[month] = aggregates.income.get(month, 0.0) + amount
+            return
+        category = categorize(transaction["description"])
+        if category in NON_SPENDING:
+            return
+
+        code = CATEGORY_INDEX[category]
+        spend = -amount
+        if month not in aggregates.monthly:
+            aggregates.monthly[month] = np.zeros(len(CATEGORIES))
+        aggregates.monthly[month][code] += spend
+
+        # Flag against the distribution seen so far, then fold the value in
+        std = aggregates.std(code)
+        if aggregates.n[code] >= ANOMALY_MIN_SAMPLES and std > 0:
+            z = (spend - aggregates.mean[code]) / std
+            if z >= ANOMALY_Z_THRESHOLD:
+                aggregates.anomalies.append(Anomaly(
+                    date=transaction_date.isoformat(), description=transaction["description"],
+                    amount=spend, category=category, z_score=float(z),
+                ))
+        aggregates.n[code] += 1
+        delta = spend - aggregates.mean[code]
+        aggregates.mean[code] += delta / aggregates.n[code]
+        aggregates.m2[code] += delta * (spend - aggregates.mean[code])
+
+    def has_data(self, user_id: Text) -> bool:
+        aggregates = self._users.get(user_id)
+        return bool(aggregates and aggregates.count)
+
+    def report(self, user_id: Text, months: int = 6, window: int = 3) -> Dict[Text, Any]:
+        """Structured breakdown over the last ``months`` months with a ``window``-month rolling average"""
+        aggregates = self._users.get(user_id) or _UserAggregates()
+        if not aggregates.monthly:
+            return {"transactions": aggregates.count, "months": [], "categories": {}, "anomalies": []}
+        # Every calendar month since the history starts, months without spending as zero
+        recorded = aggregates.monthly.keys() | aggregates.income.keys()
+        keys = list(range(max(min(recorded), max(recorded) - months + 1), max(recorded) + 1))
+
+        empty = np.zeros(len(CATEGORIES))
+        totals = np.vstack([aggregates.monthly.get(k, empty) for k in keys])
+        monthly_spend = totals.sum(axis=1)
+        kernel = np.ones(min(window, len(keys))) / min(window, len(keys))
+        rolling = np.convolve(monthly_spend, kernel, mode="valid")
+        recent = totals[-window:].sum(axis=0)
+        recent_total = recent.sum()
+        order = np.argsort(recent)[::-1]
+
+        return {
+            "transactions": aggregates.count,
+            "months": [
+                {
+                    "month": _month_label(k),
+                    "spend": round(float(monthly_spend[i]), 2),
+                    "income": round(aggregates.income.get(k, 0.0), 2),
+                }
+                for i, k in enumerate(keys)
+            ],
+            "rolling_average": round(float(rolling[-1]), 2),
+            "latest_vs_average": (
+                round(float(monthly_spend[-1] / rolling[-1] - 1), 3) if rolling[-1] else 0.0
+            ),
+            "categories": {
+                CATEGORIES[c]: {
+                    "spend": round(float(recent[c]), 2),
+                    "share": round(float(recent[c] / recent_total), 3) if recent_total else 0.0,
+                }
+                for c in order if recent[c] > 0
+            },
+            "anomalies": [vars(a) for a in aggregates.anomalies][-5:],
+        }
+
+    def summary(self, user_id: Text, months: int = 6, window: int = 3) -> Text:
+        """Compact plain-text version of ``report`` for the LLM prompt"""
+        report = self.report(user_id, months, window)
+        if not report["months"]:
+            return f"{report['transactions']} transactions, no spending recorded."
+
+        lines = [f"Transactions analysed: {report['transactions']}"]
+        lines.append("Monthly spend / income: " + ", ".join(
+            f"{m['month']} ${m['spend']:,.2f} / ${m['income']:,.2f}" for m in report["months"]
+        ))
+        lines.append(
+            f"{window}-month rolling average spend: ${report['rolling_average']:,.2f} "
+            f"(latest month {report['latest_vs_average']:+.0%} vs average)"
+        )
+        lines.append(f"Spending by category, last {window} months: " + ", ".join(
+            f"{name} ${c['spend']:,.2f} ({c['share']:.0%})" for name, c in report["categories"].items()
+        ))
+        if report["anomalies"]:
+            lines.append("Unusual transactions: " + "; ".join(
+                f"{a['date']} {a['description']} ${a['amount']:,.2f} "
+                f"({a['category']}, {a['z_score']:.1f} std above typical)"
+                for a in report["anomalies"]
+            ))
+        else:
+            lines.append("Unusual transactions: none flagged")
+        return "\n".join(lines)
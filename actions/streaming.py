@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, AsyncIterable, Optional, Text
+from urllib.parse import quote, urlsplit
+
+from rasa_sdk import Tracker
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Gateway endpoint that relays partial output to /chat/stream clients,
+# e.g. http://localhost:8000/internal/stream. Streaming is off when unset.
+STREAM_CALLBACK_URL = os.getenv("STREAM_CALLBACK_URL")
+STREAM_CALLBACK_TIMEOUT = float(os.getenv("STREAM_CALLBACK_TIMEOUT", "1"))
+# Shared secret sent as X-Stream-Token; must match the gateway's
+STREAM_CALLBACK_TOKEN = os.getenv("STREAM_CALLBACK_TOKEN", "")
+
+# Keep-alive session reused for every chunk, created on first use inside the loop
+_session: Optional["aiohttp.ClientSession"] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_session() -> "aiohttp.ClientSession":
+    # aiohttp is only needed once a client streams, so it stays off the startup path
+    import aiohttp
+
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=STREAM_CALLBACK_TIMEOUT),
+            headers={"X-Stream-Token": STREAM_CALLBACK_TOKEN},
+        )
+        _session_loop = loop
+    return _session
+
+
+class ChunkPublisher:
+    """Push partial LLM output for one sender to the gateway's stream relay"""
+
+    def __init__(self, sender_id: Text, callback_url: Text):
+        self.url = f"{callback_url.rstrip('/')}/{quote(sender_id, safe='')}"
+        self.enabled = True
+
+    @classmethod
+    def for_tracker(cls, tracker: Tracker) -> Optional["ChunkPublisher"]:
+        """Publisher for this turn, or None if the client did not ask to stream"""
+        metadata = tracker.latest_message.get("metadata") or {}
+        if not (STREAM_CALLBACK_URL and metadata.get("stream")):
+            return None
+        # With several gateway workers the message names the worker to relay
+        # through; only hosts of the configured URL are accepted
+        callback = metadata.get("stream_callback")
+        if not (isinstance(callback, str) and urlsplit(callback).hostname == urlsplit(STREAM_CALLBACK_URL).hostname):
+            callback = STREAM_CALLBACK_URL
+        return cls(tracker.sender_id, callback)
+
+    async def publish(self, text: Text) -> None:
+        if not (self.enabled and text):
+            return
+        import aiohttp
+
+        try:
+            async with _get_session().post(self.url, json={"text": text}) as res:
+                await res.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # The full reply still goes back through Rasa, so just stop streaming
+            logger.warning(f"Stream relay unavailable, disabling for this turn: {e}")
+            self.enabled = False
+
+    async def stream(self, chunks: AsyncIterable[Any]) -> Text:
+        """Publish each chunk of a streamed Gemini response and return the full text"""
+        parts = []
+        async for chunk in chunks:
+            text = getattr(chunk, "text", None) or ""
+            parts.append(text)
+            await self.publish(text)
+        return "".join(parts)
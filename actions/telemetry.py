@@ -0,0 +1,82 @@
+import functools
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Text
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# Port of the action server's Prometheus endpoint; 0 disables it
+ACTION_METRICS_PORT = int(os.getenv("ACTION_METRICS_PORT", "0"))
+
+# Buckets sized for chat turns: sub-ms local actions up to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ACTION_SECONDS = Histogram(
+    "action_run_seconds", "Duration of custom action run() calls", ["action"], buckets=LATENCY_BUCKETS,
+)
+ACTION_ERRORS = Counter("action_errors_total", "Unhandled exceptions raised by custom actions", ["action"])
+GEMINI_SECONDS = Histogram(
+    "gemini_request_seconds", "Gemini completion time including queueing and retries",
+    ["model", "mode"], buckets=LATENCY_BUCKETS,
+)
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Tokens reported in Gemini usage metadata", ["model", "kind"])
+GEMINI_QUEUE_DEPTH = Gauge("gemini_queue_depth", "Gemini requests waiting for a worker")
+GEMINI_CIRCUIT_OPEN = Gauge("gemini_circuit_open", "1 while the Gemini circuit breaker rejects calls")
+CACHE_LOOKUPS = Counter("fallback_cache_lookups_total", "Fallback answer cache lookups", ["result"])
+BALANCE_CACHE_LOOKUPS = Counter("balance_cache_lookups_total", "Account balance cache lookups", ["result"])
+TRANSFERS = Counter("transfers_total", "Transfer requests by outcome", ["result"])
+INSIGHT_LOOKUPS = Counter("spending_insight_lookups_total", "Spending insight cache lookups", ["result"])
+INSIGHTS_PRECOMPUTED = Counter("spending_insights_precomputed_total", "Spending insights generated off the request path")
+
+# Trace ID of the gateway request that produced the current turn
+TRACE_ID: ContextVar[Text] = ContextVar("trace_id", default="-")
+
+
+def trace_id_from(tracker) -> Text:
+    metadata = tracker.latest_message.get("metadata") or {}
+    return str(metadata.get("trace_id") or "-")
+
+
+def instrumented(run):
+    """Time an action's ``run`` and log it under the gateway's trace ID"""
+
+    @functools.wraps(run)
+    async def wrapper(self, dispatcher, tracker, domain):
+        name = self.name()
+        token = TRACE_ID.set(trace_id_from(tracker))
+        start = time.perf_counter()
+        try:
+            return await run(self, dispatcher, tracker, domain)
+        except Exception:
+            ACTION_ERRORS.labels(name).inc()
+            logger.error(f"{name} failed (trace {TRACE_ID.get()})")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            ACTION_SECONDS.labels(name).observe(elapsed)
+            logger.info(f"{name} finished in {elapsed * 1000:.1f} ms (trace {TRACE_ID.get()})")
+            TRACE_ID.reset(token)
+
+    return wrapper
+
+
+def record_usage(model_name: Text, usage: Any) -> None:
+    """Count prompt and completion tokens from a Gemini ``usage_metadata``"""
+    if usage is None:
+        return
+    GEMINI_TOKENS.labels(model_name, "prompt").inc(getattr(usage, "prompt_token_count", 0) or 0)
+    GEMINI_TOKENS.labels(model_name, "completion").inc(getattr(usage, "candidates_token_count", 0) or 0)
+
+
+def start_metrics_server(port: int = ACTION_METRICS_PORT) -> None:
+    if not port:
+        return
+    try:
+        start_http_server(port)
+        logger.info(f"Action metrics served on :{port}/metrics")
+    except OSError as e:
+        logger.warning(f"Action metrics endpoint not started on port {port}: {e}")
@@ -0,0 +1,178 @@
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Text
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def _to_ordinal(value) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    # fromisoformat parses DATE_FORMAT roughly 10x faster than strptime
+    return date.fromisoformat(value).toordinal()
+
+
+def _to_text(value) -> Text:
+    return value if isinstance(value, str) else value.strftime(DATE_FORMAT)
+
+
+def _row_hash(transaction: Dict[Text, Any]) -> int:
+    row = f"{_to_text(transaction['date'])}|{transaction['description']}|{float(transaction['amount'])!r}|{transaction['type']}"
+    return int.from_bytes(hashlib.blake2b(row.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+@dataclass
+class TransactionPage:
+    transactions: List[Dict[Text, Any]]
+    total: int
+    offset: int
+    limit: int
+
+    @property
+    def next_offset(self) -> Optional[int]:
+        end = self.offset + len(self.transactions)
+        return end if end < self.total else None
+
+
+class _UserLedger:
+    """Columnar, date-sorted transactions of a single user"""
+
+    __slots__ = ("ordinals", "amounts", "dates", "descriptions", "types", "digest")
+
+    def __init__(self):
+        self.ordinals = array("i")
+        self.amounts = array("d")
+        self.dates: List[Text] = []
+        self.descriptions: List[Text] = []
+        self.types: List[Text] = []
+        # Sum of row hashes: the same for the same set of rows in any order
+        self.digest = 0
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def insert(self, transaction: Dict[Text, Any]) -> None:
+        ordinal = _to_ordinal(transaction["date"])
+        # bisect_right keeps same-day transactions in arrival order
+        i = bisect_right(self.ordinals, ordinal)
+        self.ordinals.insert(i, ordinal)
+        self.amounts.insert(i, float(transaction["amount"]))
+        self.dates.insert(i, _to_text(transaction["date"]))
+        self.descriptions.insert(i, transaction["description"])
+        self.types.insert(i, transaction["type"])
+        self.digest = (self.digest + _row_hash(transaction)) & 0xFFFFFFFFFFFFFFFF
+
+    def row(self, i: int) -> Dict[Text, Any]:
+        return {
+            "date": self.dates[i],
+            "description": self.descriptions[i],
+            "amount": self.amounts[i],
+            "type": self.types[i],
+        }
+
+    def bounds(self, start=None, end=None) -> range:
+        lo = bisect_left(self.ordinals, _to_ordinal(start)) if start is not None else 0
+        hi = bisect_right(self.ordinals, _to_ordinal(end)) if end is not None else len(self)
+        return range(lo, max(lo, hi))
+
+
+class TransactionStore:
+    """In-memory transaction repository indexed by (user, date)
+
+    Dates are parsed once on insert and kept as sorted ordinal arrays per user,
+    so date-range queries are two binary searches instead of a scan.
+    """
+
+    def __init__(self):
+        self._ledgers: Dict[Text, _UserLedger] = {}
+        self._subscribers: List[Callable[[Text, Dict[Text, Any]], None]] = []
+
+    def subscribe(self, callback: Callable[[Text, Dict[Text, Any]], None]) -> None:
+        """Call ``callback(user_id, transaction)`` for every transaction added from now on"""
+        self._subscribers.append(callback)
+
+    def _notify(self, user_id: Text, transaction: Dict[Text, Any]) -> None:
+        for callback in self._subscribers:
+            callback(user_id, transaction)
+
+    @classmethod
+    def from_mapping(cls, transactions_by_user: Dict[Text, Iterable[Dict[Text, Any]]]) -> "TransactionStore":
+        store = cls()
+        for user_id, transactions in transactions_by_user.items():
+            store.extend(user_id, transactions)
+        return store
+
+    def add(self, user_id: Text, transaction: Dict[Text, Any]) -> None:
+        self._ledgers.setdefault(user_id, _UserLedger()).insert(transaction)
+        self._notify(user_id, transaction)
+
+    def extend(self, user_id: Text, transactions: Iterable[Dict[Text, Any]]) -> None:
+        """Bulk load, sorting once instead of inserting row by row"""
+        rows = sorted(
+            ((_to_ordinal(t["date"]), t) for t in transactions), key=lambda pair: pair[0]
+        )
+        ledger = self._ledgers.get(user_id)
+        if ledger is not None and len(ledger) and rows and rows[0][0] < ledger.ordinals[-1]:
+            for _, t in rows:
+                ledger.insert(t)
+        else:
+            ledger = self._ledgers.setdefault(user_id, _UserLedger())
+            ledger.ordinals.extend(ordinal for ordinal, _ in rows)
+            ledger.amounts.extend(float(t["amount"]) for _, t in rows)
+            ledger.dates.extend(_to_text(t["date"]) for _, t in rows)
+            ledger.descriptions.extend(t["description"] for _, t in rows)
+            ledger.types.extend(t["type"] for _, t in rows)
+            ledger.digest = (ledger.digest + sum(_row_hash(t) for _, t in rows)) & 0xFFFFFFFFFFFFFFFF
+        if self._subscribers:
+            for _, t in rows:
+                self._notify(user_id, t)
+
+    def users(self) -> List[Text]:
+        return list(self._ledgers)
+
+    def columns(self, user_id: Text):
+        """Raw date-sorted columns: (ordinals, amounts, descriptions, types)"""
+        ledger = self._ledgers.get(user_id)
+        if ledger is None:
+            return array("i"), array("d"), [], []
+        return ledger.ordinals, ledger.amounts, ledger.descriptions, ledger.types
+
+    def version(self, user_id: Text) -> Text:
+        """Hash of the user's transaction set; changes whenever a transaction is added"""
+        ledger = self._ledgers.get(user_id)
+        return f"{len(ledger)}-{ledger.digest:016x}" if ledger else "0"
+
+    def count(self, user_id: Text, start=None, end=None) -> int:
+        ledger = self._ledgers.get(user_id)
+        return len(ledger.bounds(start, end)) if ledger else 0
+
+    def query(
+        self,
+        user_id: Text,
+        start=None,
+        end=None,
+        offset: int = 0,
+        limit: int = 10,
+        newest_first: bool = False,
+    ) -> TransactionPage:
+        """Transactions dated within [start, end] (inclusive), one page at a time"""
+        ledger = self._ledgers.get(user_id)
+        if ledger is None:
+            return TransactionPage([], 0, offset, limit)
+        window = ledger.bounds(start, end)
+        if newest_first:
+            window = window[::-1]
+        page = window[offset:offset + limit]
+        return TransactionPage([ledger.row(i) for i in page], len(window), offset, limit)
+
+    def latest(self, user_id: Text, n: int) -> List[Dict[Text, Any]]:
+        """The ``n`` most recent transactions in chronological order"""
+        ledger = self._ledgers.get(user_id)
+        if ledger is None:
+            return []
+        return [ledger.row(i) for i in range(max(len(ledger) - n, 0), len(ledger))]
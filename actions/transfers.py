@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Text
+
+from actions.banking_data import (
+    AccountNotFoundError,
+    DuplicateTransferError,
+    InsufficientFundsError,
+    TransferReceipt,
+)
+from actions.telemetry import TRANSFERS
+
+
+class InvalidTransferError(ValueError):
+    """Amount or accounts do not describe a transfer"""
+
+
+def idempotency_key(sender_id: Text, event_id: Any) -> Text:
+    """Stable key for the transfer requested by one user message"""
+    return hashlib.blake2b(f"{sender_id}\x00{event_id}".encode(), digest_size=16).hexdigest()
+
+
+def transfer_event_id(tracker) -> Optional[Text]:
+    """ID of the user message that asked for the transfer
+
+    Rasa re-sends the same tracker when an action call is retried, so the
+    message ID (or, failing that, the user event's timestamp) identifies a
+    retry. None when neither is available.
+    """
+    message_id = tracker.latest_message.get("message_id")
+    if message_id:
+        return str(message_id)
+    for event in reversed(tracker.events):
+        if event.get("event") == "user" and event.get("timestamp") is not None:
+            return repr(event["timestamp"])
+    return None
+
+
+class TransferEngine:
+    """Runs transfers atomically and at most once per idempotency key
+
+    Transfers touching the same (user, account) pairs are serialised by a
+    fixed set of ``stripes`` locks, taken in index order so two transfers in
+    opposite directions cannot deadlock. Unrelated transfers hash to other
+    stripes and run in parallel. Under the locks the ledger is checked for the
+    key, then the backend checks funds, records the transfer and moves the
+    money in one atomic step; its key constraint catches duplicates coming
+    from other processes.
+    """
+
+    def __init__(self, data, stripes: int = 256):
+        self.data = data
+        self.stripes = stripes
+        self.completed = 0
+        self.replayed = 0
+        # asyncio locks are bound to one event loop, so keep a stripe set per loop
+        self._locks: Dict[asyncio.AbstractEventLoop, List[asyncio.Lock]] = {}
+
+    def _stripes(self) -> List[asyncio.Lock]:
+        loop = asyncio.get_running_loop()
+        locks = self._locks.get(loop)
+        if locks is None:
+            for closed in [l for l in self._locks if l.is_closed()]:
+                del self._locks[closed]
+            locks = self._locks[loop] = [asyncio.Lock() for _ in range(self.stripes)]
+        return locks
+
+    @asynccontextmanager
+    async def _locked(self, user_id: Text, *accounts: Text):
+        locks = self._stripes()
+        indexes = sorted({hash((user_id, account)) % self.stripes for account in accounts})
+        for i in indexes:
+            await locks[i].acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(indexes):
+                locks[i].release()
+
+    async def execute(
+        self,
+        user_id: Text,
+        from_account: Text,
+        to_account: Text,
+        amount: float,
+        key: Optional[Text] = None,
+    ) -> TransferReceipt:
+        """Move ``amount`` between two of the user's accounts
+
+        A repeated ``key`` returns the original receipt with ``replayed`` set
+        instead of moving money again. Raises InvalidTransferError,
+        AccountNotFoundError or InsufficientFundsError.
+        """
+        amount = round(amount, 2) if math.isfinite(amount) else amount
+        if not math.isfinite(amount) or amount <= 0:
+            TRANSFERS.labels("invalid").inc()
+            raise InvalidTransferError(f"Invalid transfer amount: {amount}")
+        if from_account == to_account:
+            TRANSFERS.labels("invalid").inc()
+            raise InvalidTransferError("Source and destination accounts are the same")
+        key = key or uuid.uuid4().hex
+
+        async with self._locked(user_id, from_account, to_account):
+            existing = await self.data.get_transfer(key)
+            if existing is not None:
+                return self._replay(existing)
+
+            try:
+                receipt = TransferReceipt(key, user_id, from_account, to_account, amount, time.time())
+                await self.data.transfer(receipt)
+            except DuplicateTransferError:
+                return self._replay(await self.data.get_transfer(key))
+            except AccountNotFoundError:
+                TRANSFERS.labels("account_not_found").inc()
+                raise
+            except InsufficientFundsError:
+                TRANSFERS.labels("insufficient_funds").inc()
+                raise
+
+        self.completed += 1
+        TRANSFERS.labels("completed").inc()
+        return receipt
+
+    def _replay(self, receipt: TransferReceipt) -> TransferReceipt:
+        self.replayed += 1
+        TRANSFERS.labels("replayed").inc()
+        return replace(receipt, replayed=True)
@@ -0,0 +1,181 @@
+"""Local TCP load balancer with health-checked backends
+
+Each connection goes to the ready backend with the fewest open connections.
+Backends become ready once their health endpoint answers below 500 and drop out
+after ``unhealthy_after`` failed checks in a row. Connections are proxied as
+raw bytes, so HTTP keep-alive, streaming and server-sent events pass through
+unchanged.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+_UNAVAILABLE = b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+@dataclass
+class Backend:
+    host: str
+    port: int
+    health_path: str = "/health"
+    ready: bool = False
+    draining: bool = False
+    active: int = 0
+    failures: int = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class Balancer:
+    """Least-connections TCP proxy in front of one tier's worker processes
+
+    ``on_unhealthy`` is called with a backend that was ready and has failed
+    ``unhealthy_after`` checks in a row, so the supervisor can restart it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        host: str,
+        port: int,
+        backends: List[Backend],
+        health_interval: float = 2.0,
+        health_timeout: float = 5.0,
+        unhealthy_after: int = 3,
+        on_unhealthy: Optional[Callable[[Backend], None]] = None,
+    ):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.backends = backends
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.unhealthy_after = unhealthy_after
+        self.on_unhealthy = on_unhealthy
+        self.active = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"{self.name} balancer listening on {self.host}:{self.port}")
+
+    def pick(self) -> Optional[Backend]:
+        ready = [b for b in self.backends if b.ready and not b.draining]
+        return min(ready, key=lambda b: b.active) if ready else None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        backend = self.pick()
+        upstream = None
+        if backend is not None:
+            try:
+                upstream = await asyncio.open_connection(backend.host, backend.port)
+            except OSError as e:
+                logger.warning(f"{self.name}: {backend.url} refused a connection: {e}")
+                backend.ready = False
+        if upstream is None:
+            writer.write(_UNAVAILABLE)
+            await _close(writer)
+            return
+
+        up_reader, up_writer = upstream
+        backend.active += 1
+        self.active += 1
+        self._idle.clear()
+        try:
+            await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+        finally:
+            backend.active -= 1
+            self.active -= 1
+            if self.active == 0:
+                self._idle.set()
+            await asyncio.gather(_close(writer), _close(up_writer))
+
+    async def check(self, session: aiohttp.ClientSession, backend: Backend) -> bool:
+        try:
+            async with session.get(backend.url + backend.health_path) as res:
+                healthy = res.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            healthy = False
+        if healthy:
+            if not backend.ready:
+                logger.info(f"{self.name}: {backend.url} is ready")
+            backend.ready, backend.failures = True, 0
+        else:
+            backend.failures += 1
+            if backend.ready and backend.failures >= self.unhealthy_after:
+                logger.warning(f"{self.name}: {backend.url} failed {backend.failures} health checks")
+                backend.ready = False
+                if self.on_unhealthy:
+                    self.on_unhealthy(backend)
+        return healthy
+
+    async def _health_loop(self) -> None:
+        timeout = aiohttp.ClientTimeout(total=self.health_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                await asyncio.gather(*(self.check(session, b) for b in self.backends if not b.draining))
+                await asyncio.sleep(self.health_interval)
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Wait until every backend is ready; False on timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not all(b.ready for b in self.backends):
+            if loop.time() > deadline:
+                return False
+            await asyncio.sleep(0.2)
+        return True
+
+    async def stop_accepting(self) -> None:
+        # Not wait_closed(): it also waits for open keep-alive connections,
+        # which only end once the workers behind them shut down
+        if self._server is not None:
+            self._server.close()
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for proxied connections to finish; False if some were still open at ``timeout``"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name}: {self.active} connections still open after {timeout:g}s")
+            return False
+
+    async def close(self) -> None:
+        await self.stop_accepting()
+        if self._health_task is not None:
+            self._health_task.cancel()
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+async def _close(writer: asyncio.StreamWriter) -> None:
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (ConnectionError, OSError):
+        pass
@@ -0,0 +1,149 @@
+"""Deterministic fast path that routes unambiguous messages without Rasa NLU
+
+Regex templates are compiled from the training examples in ``data/nlu.yml``:
+every annotated entity span becomes an alternation of all known values (and
+synonyms) for that entity. A message that matches a template of a fast-path
+intent, and carries every entity that intent needs, is sent to Rasa as a
+pre-parsed intent in the message metadata, which the REST channel
+(channels/rest.py) uses instead of running the featurizers and DIET.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Text, Tuple
+
+import yaml
+
+# [value](entity) or [value](entity:canonical)
+_ANNOTATION = re.compile(r"\[(?P<text>[^\]]+)\]\((?P<entity>[^):]+)(?::(?P<value>[^)]+))?\)")
+_NOT_WORD = re.compile(r"[^\w\s']")
+_WHITESPACE = re.compile(r"\s+")
+
+# Message metadata key carrying a route to the REST channel:
+# {"intent": name, "entities": {entity: value}}
+FAST_PATH_METADATA_KEY = "fast_path"
+
+# Intents that may bypass NLU and the entities each one needs to be slot-complete
+DEFAULT_FAST_PATH_INTENTS: Dict[Text, Tuple[Text, ...]] = {
+    "check_balance": ("account_type",),
+    "greet": (),
+    "goodbye": (),
+}
+
+
+def normalize(text: Text) -> Text:
+    text = _NOT_WORD.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@dataclass
+class FastRoute:
+    intent: Text
+    entities: Dict[Text, Text] = field(default_factory=dict)
+
+
+class FastPathRouter:
+    def __init__(self, intents: Optional[Dict[Text, Tuple[Text, ...]]] = None):
+        self.intents = intents if intents is not None else dict(DEFAULT_FAST_PATH_INTENTS)
+        self.synonyms: Dict[Text, Text] = {}
+        self.entity_values: Dict[Text, Set[Text]] = {}
+        self._exact: Dict[Text, Tuple[Text, Dict[Text, Text]]] = {}
+        self._templates: List[Tuple[re.Pattern, Text, List[Text]]] = []
+        self._ambiguous: Set[Text] = set()
+
+    @classmethod
+    def from_nlu_file(cls, path: Text, intents: Optional[Dict[Text, Tuple[Text, ...]]] = None) -> "FastPathRouter":
+        with open(path, encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        router = cls(intents)
+        router.load(data.get("nlu", []))
+        return router
+
+    def load(self, nlu: Iterable[Dict]) -> None:
+        items = list(nlu)
+        examples_by_intent: Dict[Text, List[Text]] = {}
+
+        for item in items:
+            examples = [
+                line.strip()[2:].strip()
+                for line in (item.get("examples") or "").splitlines()
+                if line.strip().startswith("- ")
+            ]
+            if "synonym" in item:
+                for example in examples:
+                    self.synonyms[normalize(example)] = item["synonym"]
+            elif "intent" in item:
+                examples_by_intent.setdefault(item["intent"], []).extend(examples)
+
+        for examples in examples_by_intent.values():
+            for example in examples:
+                for match in _ANNOTATION.finditer(example):
+                    self.entity_values.setdefault(match.group("entity"), set()).add(normalize(match.group("text")))
+        for synonym, canonical in self.synonyms.items():
+            for values in self.entity_values.values():
+                if canonical in values or synonym in values:
+                    values.update({synonym, normalize(canonical)})
+
+        # A plain text seen under two intents is never routed
+        seen: Dict[Text, Text] = {}
+        for intent, examples in examples_by_intent.items():
+            for example in examples:
+                plain = normalize(_ANNOTATION.sub(lambda m: m.group("text"), example))
+                if seen.setdefault(plain, intent) != intent:
+                    self._ambiguous.add(plain)
+
+        for intent, examples in examples_by_intent.items():
+            if intent not in self.intents:
+                continue
+            for example in examples:
+                self._compile(intent, example)
+
+    def _compile(self, intent: Text, example: Text) -> None:
+        entities = [m.group("entity") for m in _ANNOTATION.finditer(example)]
+        if not entities:
+            self._exact[normalize(example)] = (intent, {})
+            return
+        if len(set(entities)) != len(entities):
+            return
+
+        parts, last = [], 0
+        for match in _ANNOTATION.finditer(example):
+            literal = normalize(example[last:match.start()])
+            if literal:
+                parts.append(re.escape(literal))
+            values = sorted(self.entity_values.get(match.group("entity"), ()), key=len, reverse=True)
+            parts.append(f"(?P<{match.group('entity')}>{'|'.join(re.escape(v) for v in values)})")
+            last = match.end()
+        literal = normalize(example[last:])
+        if literal:
+            parts.append(re.escape(literal))
+        self._templates.append((re.compile("^" + " ".join(parts) + "$"), intent, entities))
+
+    def _canonical(self, value: Text) -> Text:
+        return self.synonyms.get(value, value)
+
+    def match(self, text: Text) -> Optional[FastRoute]:
+        """Route for ``text`` if it is unambiguous and slot-complete, else None"""
+        key = normalize(text)
+        if not key or key in self._ambiguous:
+            return None
+
+        route = None
+        exact = self._exact.get(key)
+        if exact:
+            route = FastRoute(intent=exact[0], entities=dict(exact[1]))
+        else:
+            for pattern, intent, _ in self._templates:
+                found = pattern.match(key)
+                if found:
+                    route = FastRoute(
+                        intent=intent,
+                        entities={name: self._canonical(value) for name, value in found.groupdict().items()},
+                    )
+                    break
+
+        if route is None:
+            return None
+        if any(entity not in route.entities for entity in self.intents.get(route.intent, ())):
+            return None
+        return route
@@ -0,0 +1,281 @@
+"""Multi-process runtime: action servers, Rasa replicas and gateway workers
+
+Starts each tier as separate worker processes on private ports, behind a
+local least-connections balancer on the tier's public port (app/balancer.py).
+Tiers start back to front, and each waits until all its workers pass their
+health check. Workers that exit or keep failing health checks are restarted
+with backoff. On SIGTERM or SIGINT the launcher drains front to back: the
+gateway balancer stops accepting, workers get SIGTERM and finish in-flight
+requests, then the next tier follows.
+
+    python -m app.launcher --gateway-workers 4 --action-workers 2 --rasa-replicas 2
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.balancer import Backend, Balancer
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+GATEWAY_WORKERS = int(os.getenv("GATEWAY_WORKERS", str(CPU_COUNT)))
+ACTION_WORKERS = int(os.getenv("ACTION_WORKERS", "1"))
+RASA_REPLICAS = int(os.getenv("RASA_REPLICAS", "1"))
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "8000"))
+RASA_PORT = int(os.getenv("RASA_PORT", "5005"))
+ACTION_PORT = int(os.getenv("ACTION_PORT", "5055"))
+# Workers listen on consecutive private ports from here
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "9100"))
+# Seconds a tier may take to become ready (Rasa loads its model on start)
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "300"))
+# Seconds in-flight requests get to finish on shutdown before workers are killed
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "2"))
+RESTART_BACKOFF_MAX = float(os.getenv("RESTART_BACKOFF_MAX", "30"))
+# Seconds a worker must stay healthy before its restart backoff starts over
+RESTART_RESET_AFTER = float(os.getenv("RESTART_RESET_AFTER", "300"))
+
+
+@dataclass
+class Worker:
+    backend: Backend
+    process: Optional[subprocess.Popen] = None
+    restarts: int = 0
+    ready_since: Optional[float] = None
+    stopping: bool = False
+    restart_task: Optional[asyncio.Task] = None
+
+
+@dataclass
+class Tier:
+    """Worker processes of one service and the balancer in front of them"""
+
+    name: str
+    command: Callable[[int], List[str]]
+    workers: int
+    public_port: int
+    health_path: str
+    env: Dict[str, str] = field(default_factory=dict)
+    public_host: str = "127.0.0.1"
+    balancer: Optional[Balancer] = None
+    pool: List[Worker] = field(default_factory=list)
+
+
+def build_tiers(args, python: str = sys.executable) -> List[Tier]:
+    """Tiers in start order: actions, Rasa, gateway"""
+    ports = iter(range(args.worker_base_port, args.worker_base_port + 10000))
+    tiers = []
+
+    if args.action_workers > 0:
+        tiers.append(Tier(
+            "actions", lambda port: [python, "-m", "rasa_sdk", "--actions", "actions", "--port", str(port)],
+            args.action_workers, args.action_port, "/health",
+        ))
+    if args.rasa_replicas > 0:
+        tiers.append(Tier(
+            "rasa", lambda port: ["rasa", "run", "--enable-api", "--port", str(port)],
+            args.rasa_replicas, args.rasa_port, "/",
+        ))
+    tiers.append(Tier(
+        "gateway",
+        lambda port: [
+            python, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--timeout-graceful-shutdown", f"{args.drain_timeout:g}", "--no-access-log",
+        ],
+        args.gateway_workers, args.gateway_port, "/health", public_host=args.host,
+    ))
+
+    for tier in tiers:
+        tier.pool = [Worker(Backend("127.0.0.1", next(ports), tier.health_path)) for _ in range(tier.workers)]
+
+    actions = next((t for t in tiers if t.name == "actions"), None)
+    rasa = next((t for t in tiers if t.name == "rasa"), None)
+    gateway = tiers[-1]
+    # Authenticates chunks posted to the gateway's stream relay, which is
+    # reachable through the public balancer
+    token = os.getenv("STREAM_CALLBACK_TOKEN") or secrets.token_urlsafe(32)
+    gateway.env["STREAM_CALLBACK_TOKEN"] = token
+    if actions is not None:
+        if actions.workers > 1:
+            # Balances and the transfer ledger live in process memory with the
+            # memory backend, so retries reaching another worker would debit twice
+            backend = os.getenv("BANKING_DATA_BACKEND", "sqlite").lower()
+            if backend != "sqlite":
+                raise ValueError(
+                    f"{actions.workers} action workers need BANKING_DATA_BACKEND=sqlite, got {backend!r}"
+                )
+            actions.env["BANKING_DATA_BACKEND"] = "sqlite"
+        actions.env["STREAM_CALLBACK_TOKEN"] = token
+        # Same host as the per-worker STREAM_RELAY_URLs, which the action
+        # server only accepts when it matches this URL's host
+        actions.env["STREAM_CALLBACK_URL"] = f"http://127.0.0.1:{args.gateway_port}/internal/stream"
+    if rasa is not None:
+        # The gateway shards senders over the replicas itself (RASA_URLS), so
+        # only other clients such as Streamlit go through the Rasa balancer
+        gateway.env["RASA_URLS"] = ",".join(f"{w.backend.url}/webhooks/rest/webhook" for w in rasa.pool)
+    return tiers
+
+
+class Supervisor:
+    def __init__(self, tiers: List[Tier], ready_timeout: float = READY_TIMEOUT,
+                 drain_timeout: float = DRAIN_TIMEOUT, health_interval: float = HEALTH_INTERVAL,
+                 restart_reset_after: float = RESTART_RESET_AFTER):
+        self.tiers = tiers
+        self.ready_timeout = ready_timeout
+        self.drain_timeout = drain_timeout
+        self.health_interval = health_interval
+        self.restart_reset_after = restart_reset_after
+        self.stopping = False
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def _spawn(self, tier: Tier, worker: Worker) -> None:
+        env = {**os.environ, **tier.env}
+        if tier.name == "gateway":
+            # Streamed chunks must reach the worker holding the client's SSE stream
+            env["STREAM_RELAY_URL"] = f"{worker.backend.url}/internal/stream"
+        # Own session, so a terminal Ctrl-C reaches only the launcher, which drains in order
+        worker.process = subprocess.Popen(tier.command(worker.backend.port), env=env, start_new_session=True)
+        worker.backend.ready = False
+        worker.backend.failures = 0
+        logger.info(f"{tier.name}: started pid {worker.process.pid} on port {worker.backend.port}")
+
+    def _restart_later(self, tier: Tier, worker: Worker, reason: str) -> None:
+        if self.stopping or worker.stopping or (worker.restart_task and not worker.restart_task.done()):
+            return
+        delay = min(2 ** worker.restarts, RESTART_BACKOFF_MAX) if worker.restarts else 0
+        worker.restarts += 1
+        logger.warning(f"{tier.name}: restarting worker on port {worker.backend.port} in {delay:g}s ({reason})")
+        worker.restart_task = asyncio.create_task(self._restart(tier, worker, delay))
+
+    async def _restart(self, tier: Tier, worker: Worker, delay: float) -> None:
+        if worker.process is not None and worker.process.poll() is None:
+            await self._terminate([worker], timeout=self.drain_timeout)
+        await asyncio.sleep(delay)
+        if not self.stopping:
+            self._spawn(tier, worker)
+
+    async def _watch(self) -> None:
+        """Restart workers that exited on their own, and forgive old crashes of stable ones"""
+        while not self.stopping:
+            now = time.monotonic()
+            for tier in self.tiers:
+                for worker in tier.pool:
+                    code = worker.process.poll() if worker.process is not None else None
+                    if code is not None:
+                        worker.backend.ready = False
+                        self._restart_later(tier, worker, f"exited with {code}")
+                    if not worker.backend.ready:
+                        worker.ready_since = None
+                    elif worker.ready_since is None:
+                        worker.ready_since = now
+                    elif worker.restarts and now - worker.ready_since >= self.restart_reset_after:
+                        logger.info(f"{tier.name}: worker on port {worker.backend.port} is stable, resetting backoff")
+                        worker.restarts = 0
+            await asyncio.sleep(0.5)
+
+    async def start(self) -> bool:
+        for tier in self.tiers:
+            by_backend = {id(w.backend): w for w in tier.pool}
+            tier.balancer = Balancer(
+                tier.name, tier.public_host, tier.public_port, [w.backend for w in tier.pool],
+                health_interval=self.health_interval,
+                on_unhealthy=lambda b, t=tier, m=by_backend: self._restart_later(t, m[id(b)], "failed health checks"),
+            )
+            for worker in tier.pool:
+                self._spawn(tier, worker)
+            await tier.balancer.start()
+            if not await tier.balancer.wait_ready(self.ready_timeout):
+                logger.error(f"{tier.name}: not every worker became ready within {self.ready_timeout:g}s")
+                return False
+            logger.info(f"{tier.name}: {len(tier.pool)} workers ready on port {tier.public_port}")
+        self._watch_task = asyncio.create_task(self._watch())
+        return True
+
+    async def _terminate(self, workers: List[Worker], timeout: float) -> None:
+        running = [w for w in workers if w.process is not None and w.process.poll() is None]
+        for worker in running:
+            worker.process.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        while any(w.process.poll() is None for w in running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for worker in running:
+            if worker.process.poll() is None:
+                logger.warning(f"Killing pid {worker.process.pid} after {timeout:g}s")
+                worker.process.kill()
+                worker.process.wait()
+
+    async def stop(self) -> None:
+        """Drain and stop the tiers front to back"""
+        self.stopping = True
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        for tier in reversed(self.tiers):
+            for worker in tier.pool:
+                worker.stopping = True
+                worker.backend.draining = True
+                if worker.restart_task is not None:
+                    worker.restart_task.cancel()
+            if tier.balancer is not None:
+                await tier.balancer.stop_accepting()
+            # SIGTERM makes uvicorn, Sanic and the action server finish in-flight
+            # requests and close idle keep-alive connections
+            await self._terminate(tier.pool, self.drain_timeout)
+            if tier.balancer is not None:
+                await tier.balancer.drain(timeout=1)
+                await tier.balancer.close()
+            logger.info(f"{tier.name}: stopped")
+
+
+async def serve(args) -> int:
+    try:
+        tiers = build_tiers(args)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    supervisor = Supervisor(tiers, args.ready_timeout, args.drain_timeout, args.health_interval)
+    shutdown = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, shutdown.set)
+
+    started = await supervisor.start()
+    if started:
+        await shutdown.wait()
+    await supervisor.stop()
+    return 0 if started else 1
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gateway-workers", type=int, default=GATEWAY_WORKERS)
+    parser.add_argument("--action-workers", type=int, default=ACTION_WORKERS, help="0 uses an external action server")
+    parser.add_argument("--rasa-replicas", type=int, default=RASA_REPLICAS, help="0 uses RASA_URLS as given")
+    parser.add_argument("--host", default="0.0.0.0", help="interface of the public gateway port")
+    parser.add_argument("--gateway-port", type=int, default=GATEWAY_PORT)
+    parser.add_argument("--rasa-port", type=int, default=RASA_PORT)
+    parser.add_argument("--action-port", type=int, default=ACTION_PORT)
+    parser.add_argument("--worker-base-port", type=int, default=WORKER_BASE_PORT)
+    parser.add_argument("--ready-timeout", type=float, default=READY_TIMEOUT)
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT)
+    parser.add_argument("--health-interval", type=float, default=HEALTH_INTERVAL)
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sys.exit(asyncio.run(serve(parse_args())))
+
+
+if __name__ == "__main__":
+    main()
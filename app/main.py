@@ -1,50 +1,403 @@
-from fastapi import FastAPI, HTTPException
-import requests, os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import aiohttp, asyncio, hmac, logging, os
+
+from app.fast_router import DEFAULT_FAST_PATH_INTENTS, FAST_PATH_METADATA_KEY, FastPathRouter
+from app.payloads import REPLY_FORMATS, CompressionMiddleware, FastJSONResponse, dumps, shape_reply
+from app.sessions import HashRing, new_sender_id, valid_sender
+from app.telemetry import FAST_PATH, RASA_SECONDS, TRACE_ID, MetricsMiddleware
+
+logger = logging.getLogger(__name__)
 
 RASA_URL = os.getenv("RASA_URL", "http://localhost:5005/webhooks/rest/webhook")
-app = FastAPI(title="Hybrid Gemini Assistant")
+
+# Rasa replicas (comma-separated webhook URLs). Each sender is pinned to one
+# replica by consistent hashing so its tracker stays where it was built.
+RASA_URLS = [url.strip() for url in os.getenv("RASA_URLS", RASA_URL).split(",") if url.strip()]
+RASA_RING = HashRing(RASA_URLS)
+
+# Connection pool and timeout settings for the shared Rasa session
+RASA_MAX_CONNECTIONS = int(os.getenv("RASA_MAX_CONNECTIONS", "100"))
+RASA_KEEPALIVE_TIMEOUT = float(os.getenv("RASA_KEEPALIVE_TIMEOUT", "30"))
+RASA_CONNECT_TIMEOUT = float(os.getenv("RASA_CONNECT_TIMEOUT", "2"))
+RASA_TIMEOUT = float(os.getenv("RASA_TIMEOUT", "10"))
+RASA_HEALTH_TIMEOUT = float(os.getenv("RASA_HEALTH_TIMEOUT", "2"))
+# Keep-alive connections opened to each replica at startup (0 disables)
+RASA_WARMUP_CONNECTIONS = int(os.getenv("RASA_WARMUP_CONNECTIONS", "0"))
+
+# Deterministic NLU bypass for unambiguous, slot-complete messages. Needs the
+# REST channel from credentials.yml; Rasa's built-in one ignores the parse.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_INTENTS = os.getenv("FAST_PATH_INTENTS", ",".join(DEFAULT_FAST_PATH_INTENTS))
+NLU_DATA_PATH = os.getenv("NLU_DATA_PATH", str(Path(__file__).resolve().parent.parent / "data" / "nlu.yml"))
+
+
+def create_fast_router() -> Optional[FastPathRouter]:
+    if not FAST_PATH_ENABLED:
+        return None
+    intents = {
+        name.strip(): DEFAULT_FAST_PATH_INTENTS.get(name.strip(), ())
+        for name in FAST_PATH_INTENTS.split(",") if name.strip()
+    }
+    try:
+        return FastPathRouter.from_nlu_file(NLU_DATA_PATH, intents)
+    except OSError as e:
+        logger.warning(f"Fast path disabled, cannot read NLU data: {e}")
+        return None
+
+# Partial Gemini output pushed by the action server, keyed by sender ID
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "1024"))
+# This worker's own relay URL, sent along with streamed messages so chunks
+# reach the worker holding the SSE stream (set per worker by app.launcher)
+STREAM_RELAY_URL = os.getenv("STREAM_RELAY_URL")
+# Shared secret the action server sends with each chunk; the relay rejects
+# every chunk while it is unset
+STREAM_CALLBACK_TOKEN = os.getenv("STREAM_CALLBACK_TOKEN")
+
+# /chat/batch: concurrent Rasa calls per batch and maximum messages per request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "32"))
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "10000"))
+
+# Response compression (gzip, or brotli when installed) for JSON and NDJSON
+# bodies of at least GATEWAY_COMPRESS_MIN_BYTES
+GATEWAY_COMPRESSION = os.getenv("GATEWAY_COMPRESSION", "true").lower() == "true"
+GATEWAY_COMPRESS_MIN_BYTES = int(os.getenv("GATEWAY_COMPRESS_MIN_BYTES", "500"))
+GATEWAY_GZIP_LEVEL = int(os.getenv("GATEWAY_GZIP_LEVEL", "6"))
+GATEWAY_BROTLI_QUALITY = int(os.getenv("GATEWAY_BROTLI_QUALITY", "4"))
+
+# Reply shape when a request has no "format": full (Rasa's message list) or compact
+REPLY_FORMAT = os.getenv("REPLY_FORMAT", "full").lower()
+
+
+def create_rasa_session() -> aiohttp.ClientSession:
+    """Build the keep-alive connection pool shared by all requests to Rasa"""
+    connector = aiohttp.TCPConnector(
+        limit=RASA_MAX_CONNECTIONS,
+        keepalive_timeout=RASA_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(total=RASA_TIMEOUT, connect=RASA_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def warm_rasa_pool(session: aiohttp.ClientSession, connections: int) -> int:
+    """Open up to ``connections`` pooled connections to every replica; returns how many answered"""
+    timeout = aiohttp.ClientTimeout(total=RASA_HEALTH_TIMEOUT)
+
+    async def touch(url: str) -> bool:
+        try:
+            async with session.get(url, timeout=timeout) as res:
+                await res.read()
+                return res.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    # Concurrent requests cannot share a connection, so each one opens its own
+    # and returns it to the pool afterwards
+    urls = [_base_url(node) for node in RASA_RING.nodes for _ in range(connections)]
+    opened = sum(await asyncio.gather(*(touch(url) for url in urls)))
+    if opened < len(urls):
+        logger.warning(f"Rasa warm-up opened {opened} of {len(urls)} connections")
+    else:
+        logger.info(f"Rasa warm-up opened {opened} connections")
+    return opened
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.rasa_session = create_rasa_session()
+    if RASA_WARMUP_CONNECTIONS > 0:
+        await warm_rasa_pool(app.state.rasa_session, RASA_WARMUP_CONNECTIONS)
+    app.state.stream_queues = {}
+    app.state.fast_router = create_fast_router()
+    try:
+        yield
+    finally:
+        await app.state.rasa_session.close()
+
+
+app = FastAPI(title="Hybrid Gemini Assistant", lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(MetricsMiddleware)
+if GATEWAY_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=GATEWAY_COMPRESS_MIN_BYTES,
+        gzip_level=GATEWAY_GZIP_LEVEL,
+        brotli_quality=GATEWAY_BROTLI_QUALITY,
+    )
 
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "Hybrid Gemini Assistant API",
         "endpoints": {
             "/chat": "POST - Send a message to the assistant",
+            "/chat/stream": "POST - Send a message and receive the reply as server-sent events",
+            "/chat/batch": "POST - Send many messages and receive replies as NDJSON",
             "/health": "GET - Check API health status",
+            "/metrics": "GET - Prometheus metrics",
             "/docs": "GET - API documentation"
         },
-        "usage": "POST to /chat with JSON body: {\"message\": \"your message here\"}"
+        "usage": "POST to /chat with JSON body: {\"message\": \"your message here\"}",
+        "formats": "Add \"format\": \"compact\" for {\"text\", \"buttons\"} instead of Rasa's message list",
     }
 
+async def _replica_status(base_url: str) -> str:
+    try:
+        timeout = aiohttp.ClientTimeout(total=RASA_HEALTH_TIMEOUT)
+        async with app.state.rasa_session.get(base_url, timeout=timeout) as rasa_health:
+            return "connected" if rasa_health.status < 500 else "disconnected"
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return "disconnected"
+
+
 @app.get("/health")
-def health():
+async def health():
     """Health check endpoint"""
-    try:
-        # Check if Rasa server is running
-        rasa_health = requests.get("http://localhost:5005/", timeout=2)
-        rasa_status = "connected" if rasa_health.status_code < 500 else "disconnected"
-    except:
-        rasa_status = "disconnected"
-    
+    # Check if the Rasa replicas are running
+    statuses = await asyncio.gather(*(_replica_status(_base_url(node)) for node in RASA_RING.nodes))
+    if all(status == "connected" for status in statuses):
+        rasa_status = "connected"
+    else:
+        rasa_status = "degraded" if "connected" in statuses else "disconnected"
+
     return {
         "status": "healthy",
         "rasa_server": rasa_status,
-        "rasa_url": RASA_URL
+        "rasa_url": RASA_URL,
+        "rasa_replicas": dict(zip(RASA_RING.nodes, statuses)),
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _base_url(webhook_url: str) -> str:
+    return webhook_url.split("/webhooks/")[0] + "/"
+
+
+def rasa_webhook_url(sender: str) -> str:
+    """Webhook of the Rasa replica that owns ``sender``'s tracker"""
+    return RASA_RING.node_for(sender)
+
+
+def rasa_base_url(sender: str) -> str:
+    return _base_url(rasa_webhook_url(sender))
+
+
+def resolve_sender(sender: Optional[str]) -> str:
+    """The client's session ID, or a new one for a new conversation"""
+    if not sender:
+        return new_sender_id()
+    sender = str(sender)
+    if not valid_sender(sender):
+        raise HTTPException(status_code=400, detail="Invalid 'sender': use up to 128 letters, digits or . _ - @ :")
+    return sender
+
+
+def resolve_format(body: Dict[str, Any]) -> str:
+    """Requested reply shape, REPLY_FORMAT when the request has none"""
+    reply_format = str(body.get("format") or REPLY_FORMAT).lower()
+    if reply_format not in REPLY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid 'format': use one of {', '.join(REPLY_FORMATS)}")
+    return reply_format
+
+
+def _rasa_error(e: Exception) -> Tuple[int, str]:
+    """HTTP status and detail for a failed call to Rasa"""
+    if isinstance(e, aiohttp.ClientConnectorError):
+        return 503, "Cannot connect to Rasa server. Make sure Rasa is running on port 5005."
+    if isinstance(e, asyncio.TimeoutError):
+        return 504, "Request to Rasa server timed out."
+    return 500, f"Error communicating with Rasa server: {str(e)}"
+
+
+async def converse(sender: str, message: str) -> List[Dict]:
+    """Rasa's reply to one message, pre-parsed by the NLU fast path when it applies
+
+    Raises aiohttp.ClientError or asyncio.TimeoutError if Rasa cannot be reached.
+    """
+    router = app.state.fast_router
+    route = router.match(message) if router else None
+    metadata: Dict[str, Any] = {"trace_id": TRACE_ID.get()}
+    if route:
+        # The REST channel (channels/rest.py) uses this as the parse and skips NLU;
+        # the message text and trace ID still reach the tracker
+        metadata[FAST_PATH_METADATA_KEY] = {"intent": route.intent, "entities": route.entities}
+        FAST_PATH.labels("routed").inc()
+    elif router:
+        FAST_PATH.labels("miss").inc()
+
+    payload = {"sender": sender, "message": message, "metadata": metadata}
+    with RASA_SECONDS.labels("fast_path" if route else "webhook").time():
+        async with app.state.rasa_session.post(rasa_webhook_url(sender), json=payload) as res:
+            res.raise_for_status()
+            return await res.json()
+
+
 @app.post("/chat")
-def chat(user_msg: dict):
-    """Send a message to the Rasa assistant"""
+async def chat(user_msg: dict):
+    """Send a message to the Rasa assistant
+
+    Pass the ``sender`` returned by the first reply to continue a conversation;
+    without one a new session is started. ``"format": "compact"`` returns the
+    reply as ``text`` plus ``buttons`` instead of Rasa's message list.
+    """
     if not user_msg.get("message"):
         raise HTTPException(status_code=400, detail="Missing 'message' field in request body")
-    
+
+    sender = resolve_sender(user_msg.get("sender"))
+    reply_format = resolve_format(user_msg)
+    try:
+        return {**shape_reply(await converse(sender, user_msg["message"]), reply_format), "sender": sender}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        status, detail = _rasa_error(e)
+        raise HTTPException(status_code=status, detail=detail)
+
+
+async def _batch_replies(messages: List[Dict[str, Any]], reply_format: str = "full") -> AsyncIterator[bytes]:
+    """Fan a batch out to Rasa and yield one NDJSON line per message as it completes
+
+    Each sender's messages run one after another in request order, so a
+    conversation sees its turns in sequence; different senders run in
+    parallel on up to BATCH_CONCURRENCY workers.
+    """
+    by_sender: Dict[str, List[Tuple[int, str]]] = {}
+    for index, item in enumerate(messages):
+        by_sender.setdefault(item["sender"], []).append((index, item["message"]))
+
+    senders: asyncio.Queue = asyncio.Queue()
+    for sender, items in by_sender.items():
+        senders.put_nowait((sender, items))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while not senders.empty():
+            sender, items = senders.get_nowait()
+            for index, message in items:
+                line: Dict[str, Any] = {"index": index, "sender": sender}
+                try:
+                    line.update(shape_reply(await converse(sender, message), reply_format))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status, detail = _rasa_error(e)
+                    line["error"] = {"status": status, "detail": detail}
+                except Exception as e:
+                    # Every message must produce a line or the stream never ends
+                    line["error"] = {"status": 500, "detail": str(e)}
+                await results.put(line)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(BATCH_CONCURRENCY, len(by_sender)))]
+    try:
+        for _ in range(len(messages)):
+            yield dumps(await results.get()) + b"\n"
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+@app.post("/chat/batch")
+async def chat_batch(body: dict):
+    """Send many messages to the Rasa assistant and stream the replies as NDJSON
+
+    Body: ``{"messages": [{"sender": "...", "message": "..."}, ...]}``. Lines
+    arrive in completion order and carry the ``index`` of their message, plus
+    either ``reply`` (``text``/``buttons`` with ``"format": "compact"``) or
+    ``error``. A message without a sender starts its own session.
+    """
+    messages = body.get("messages")
+    if not isinstance(messages, list) or not messages:
+        raise HTTPException(status_code=400, detail="Request body needs a non-empty 'messages' list")
+    if len(messages) > BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_MESSAGES} messages per batch")
+    for index, item in enumerate(messages):
+        if not isinstance(item, dict) or not item.get("message"):
+            raise HTTPException(status_code=400, detail=f"Missing 'message' field in messages[{index}]")
+    reply_format = resolve_format(body)
+    messages = [{"sender": resolve_sender(item.get("sender")), "message": item["message"]} for item in messages]
+
+    return StreamingResponse(_batch_replies(messages, reply_format), media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+async def _stream_reply(sender: str, message: str, reply_format: str = "full") -> AsyncIterator[str]:
+    """Relay streamed action output as it arrives, then the final Rasa reply"""
+    queues = app.state.stream_queues
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    queues[sender] = queue
+
+    async def post_to_rasa():
+        metadata = {"stream": True, "trace_id": TRACE_ID.get()}
+        if STREAM_RELAY_URL:
+            metadata["stream_callback"] = STREAM_RELAY_URL
+        payload = {"sender": sender, "message": message, "metadata": metadata}
+        with RASA_SECONDS.labels("stream").time():
+            async with app.state.rasa_session.post(rasa_webhook_url(sender), json=payload) as res:
+                res.raise_for_status()
+                return await res.json()
+
+    rasa_task = asyncio.create_task(post_to_rasa())
+    try:
+        while True:
+            chunk_task = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({chunk_task, rasa_task}, return_when=asyncio.FIRST_COMPLETED)
+            if chunk_task not in done:
+                chunk_task.cancel()
+                break
+            yield _sse("token", {"text": chunk_task.result()})
+
+        # Chunks published just before the action returned
+        while not queue.empty():
+            yield _sse("token", {"text": queue.get_nowait()})
+
+        yield _sse("done", {**shape_reply(rasa_task.result(), reply_format), "sender": sender})
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        status, detail = _rasa_error(e)
+        yield _sse("error", {"status": status, "detail": detail})
+    finally:
+        rasa_task.cancel()
+        if queues.get(sender) is queue:
+            del queues[sender]
+
+
+@app.post("/chat/stream")
+async def chat_stream(user_msg: dict):
+    """Send a message to the Rasa assistant and stream the reply as server-sent events
+
+    Emits ``token`` events with partial Gemini output as the actions generate
+    it, followed by a single ``done`` event carrying the full Rasa reply, shaped
+    by ``format`` as in /chat (or an ``error`` event).
+    """
+    if not user_msg.get("message"):
+        raise HTTPException(status_code=400, detail="Missing 'message' field in request body")
+
+    sender = resolve_sender(user_msg.get("sender"))
+    reply_format = resolve_format(user_msg)
+    return StreamingResponse(
+        _stream_reply(sender, user_msg["message"], reply_format),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/internal/stream/{sender}", include_in_schema=False)
+async def publish_chunk(sender: str, body: dict, x_stream_token: Optional[str] = Header(None)):
+    """Receive a partial response chunk from the action server"""
+    if not (STREAM_CALLBACK_TOKEN and x_stream_token
+            and hmac.compare_digest(x_stream_token.encode(), STREAM_CALLBACK_TOKEN.encode())):
+        raise HTTPException(status_code=403, detail="Invalid stream token")
+    queue = app.state.stream_queues.get(sender)
+    if queue is None:
+        return {"delivered": False}
     try:
-        res = requests.post(RASA_URL, json={"sender": "user", "message": user_msg.get("message", "")}, timeout=10)
-        res.raise_for_status()
-        return {"reply": res.json()}
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(status_code=503, detail="Cannot connect to Rasa server. Make sure Rasa is running on port 5005.")
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=504, detail="Request to Rasa server timed out.")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error communicating with Rasa server: {str(e)}")
+        queue.put_nowait(body.get("text", ""))
+    except asyncio.QueueFull:
+        return {"delivered": False}
+    return {"delivered": True}
@@ -0,0 +1,161 @@
+"""Slim gateway responses: compact replies, fast JSON and compression
+
+``orjson`` and ``brotli`` are optional. Without orjson the standard library
+encoder is used with compact separators; without brotli only gzip is offered.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+REPLY_FORMATS = ("full", "compact")
+
+# Content types worth compressing; server-sent events stay uncompressed so
+# each token reaches the client immediately
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def compact_reply(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Bot texts joined into one string plus any buttons, without Rasa's per-message envelope"""
+    reply: Dict[str, Any] = {"text": "\n".join(m["text"] for m in messages if m.get("text"))}
+    buttons = [
+        {"title": b.get("title"), "payload": b.get("payload")}
+        for m in messages for b in m.get("buttons") or []
+    ]
+    if buttons:
+        reply["buttons"] = buttons
+    return reply
+
+
+def shape_reply(messages: List[Dict[str, Any]], reply_format: str) -> Dict[str, Any]:
+    return compact_reply(messages) if reply_format == "compact" else {"reply": messages}
+
+
+class _Encoder:
+    """Incremental gzip or brotli compressor"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        """Compress ``data``; a non-final chunk is flushed so the client can decode it right away"""
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported encoding from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON and NDJSON responses with brotli or gzip
+
+    Complete bodies under ``minimum_size`` bytes are sent as they are. Streamed
+    NDJSON is compressed chunk by chunk with a flush after each, so batch
+    lines still arrive as soon as they are ready.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        encoder: Optional[_Encoder] = None
+        started = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, started
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or started:
+                if encoder is not None and message["type"] == "http.response.body":
+                    more = message.get("more_body", False)
+                    message = {**message, "body": encoder.chunk(message.get("body", b""), final=not more)}
+                await send(message)
+                return
+
+            started = True
+            body, more = message.get("body", b""), message.get("more_body", False)
+            headers = MutableHeaders(raw=list(start["headers"]))
+            content_type = headers.get("content-type", "").split(";")[0].strip()
+            if (
+                content_type not in COMPRESSIBLE_TYPES
+                or "content-encoding" in headers
+                or (not more and len(body) < self.minimum_size)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+            data = encoder.chunk(body, final=not more)
+            headers["content-encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(data))
+            await send({**start, "headers": headers.raw})
+            await send({**message, "body": data})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,47 @@
+"""Per-session sender IDs and sticky routing to Rasa replicas"""
+
+import bisect
+import hashlib
+import re
+import uuid
+from typing import List, Sequence, Tuple
+
+_VALID_SENDER = re.compile(r"^[\w.@:-]{1,128}$")
+
+
+def new_sender_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_sender(sender: str) -> bool:
+    return bool(_VALID_SENDER.match(sender))
+
+
+def _hash(key: str) -> int:
+    # Python's hash() is salted per process; replicas of the gateway must agree
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping sender IDs to Rasa replicas
+
+    Each node is placed on the ring ``replicas`` times, so load stays even and
+    adding or removing a node only moves the senders on its arcs.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 100):
+        if not nodes:
+            raise ValueError("HashRing needs at least one node")
+        self.nodes = list(dict.fromkeys(nodes))
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
@@ -1,8 +1,15 @@
 import streamlit as st
 import requests
 import json
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
 import os
+import uuid
+
+# Messages rendered per page of chat history; older pages load on demand
+HISTORY_WINDOW = int(os.getenv("STREAMLIT_HISTORY_WINDOW", "50"))
+# Keep-alive connections kept per host by the shared HTTP session
+HTTP_POOL_SIZE = int(os.getenv("STREAMLIT_HTTP_POOL_SIZE", "20"))
 
 # Page configuration
 st.set_page_config(
@@ -50,6 +57,70 @@ if "rasa_url" not in st.session_state:
     st.session_state.rasa_url = os.getenv("RASA_URL", "http://localhost:5005/webhooks/rest/webhook")
 if "api_status" not in st.session_state:
     st.session_state.api_status = "unknown"
+if "gateway_url" not in st.session_state:
+    st.session_state.gateway_url = os.getenv("GATEWAY_URL", "http://localhost:8000")
+if "stream_responses" not in st.session_state:
+    st.session_state.stream_responses = False
+if "sender_id" not in st.session_state:
+    # One Rasa conversation per browser session
+    st.session_state.sender_id = uuid.uuid4().hex
+if "show_parse" not in st.session_state:
+    st.session_state.show_parse = False
+if "show_raw_response" not in st.session_state:
+    st.session_state.show_raw_response = False
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """Keep-alive HTTP session shared by every rerun and browser session"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def background_pool() -> ThreadPoolExecutor:
+    """Threads for optional side requests that must not delay the reply"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="streamlit-bg")
+
+
+def parse_message(rasa_url: str, text: str) -> Dict:
+    """Intent and entities from Rasa's /model/parse (a second NLU run)"""
+    response = http_session().post(
+        rasa_url.replace("/webhooks/rest/webhook", "/model/parse"),
+        json={"text": text},
+        timeout=5
+    )
+    response.raise_for_status()
+    parse_data = response.json()
+    return {
+        "intent_prediction": parse_data.get("intent", {}),
+        "entities": parse_data.get("entities", [])
+    }
+
+
+def stream_chat(gateway_url: str, sender: str, message: str):
+    """Yield (event, data) pairs from the gateway's /chat/stream endpoint
+
+    The final ``done`` event uses the compact format: joined ``text`` plus ``buttons``.
+    """
+    with http_session().post(
+        f"{gateway_url.rstrip('/')}/chat/stream",
+        json={"sender": sender, "message": message, "format": "compact"},
+        stream=True,
+        timeout=(5, 60)
+    ) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
 
 # Header
 st.markdown('<p class="main-header">🏦 Banking GenAI Assistant</p>', unsafe_allow_html=True)
@@ -66,6 +137,31 @@ with st.sidebar:
     )
     st.session_state.rasa_url = rasa_url
     
+    # Streaming goes through the FastAPI gateway's /chat/stream endpoint
+    st.session_state.stream_responses = st.checkbox(
+        "Stream responses",
+        value=st.session_state.stream_responses,
+        help="Render Gemini output token by token via the FastAPI gateway"
+    )
+    if st.session_state.stream_responses:
+        st.session_state.gateway_url = st.text_input(
+            "Gateway URL",
+            value=st.session_state.gateway_url,
+            help="Base URL of the FastAPI gateway (uvicorn app.main:app)"
+        )
+    
+    # The parse call runs NLU a second time, so it is opt-in and runs alongside the reply
+    st.session_state.show_parse = st.checkbox(
+        "Show NLU parse in debug info",
+        value=st.session_state.show_parse,
+        help="Also send each message to Rasa's /model/parse (costs an extra NLU run)"
+    )
+    st.session_state.show_raw_response = st.checkbox(
+        "Show raw Rasa response in debug info",
+        value=st.session_state.show_raw_response,
+        help="Echo the full Rasa message list instead of a summary"
+    )
+    
     # API Status check
     st.subheader("🔌 Connection Status")
     
@@ -73,7 +169,7 @@ with st.sidebar:
         try:
             # Try to connect to Rasa health endpoint
             health_url = rasa_url.replace("/webhooks/rest/webhook", "/")
-            response = requests.get(health_url, timeout=2)
+            response = http_session().get(health_url, timeout=2)
             if response.status_code < 500:
                 st.session_state.api_status = "connected"
                 st.success("✅ Rasa server is connected!")
@@ -99,6 +195,8 @@ with st.sidebar:
     st.subheader("🚀 Quick Actions")
     if st.button("Clear Chat History"):
         st.session_state.messages = []
+        st.session_state.sender_id = uuid.uuid4().hex
+        st.session_state.history_pages = 1
         st.rerun()
     
     # Example queries
@@ -119,10 +217,16 @@ with st.sidebar:
 # Main chat interface
 st.subheader("💬 Chat with your Banking Assistant")
 
-# Display chat history
+# Display chat history: only the newest pages, so reruns stay fast on long chats
 chat_container = st.container()
 with chat_container:
-    for message in st.session_state.messages:
+    shown = HISTORY_WINDOW * st.session_state.history_pages
+    hidden = max(len(st.session_state.messages) - shown, 0)
+    if hidden:
+        if st.button(f"Show {min(hidden, HISTORY_WINDOW)} earlier messages ({hidden} hidden)"):
+            st.session_state.history_pages += 1
+            st.rerun()
+    for message in st.session_state.messages[hidden:]:
         if message["role"] == "user":
             with st.chat_message("user"):
                 st.write(message["content"])
@@ -142,20 +246,42 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
     
+    # Start the optional parse now so it overlaps the reply instead of following it
+    parse_future: Optional[Future] = None
+    if st.session_state.show_parse:
+        parse_future = background_pool().submit(parse_message, st.session_state.rasa_url, user_input)
+    
     # Get response from Rasa
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
             try:
-                # Send request to Rasa
-                response = requests.post(
-                    st.session_state.rasa_url,
-                    json={"sender": "user", "message": user_input},
-                    timeout=10
-                )
-                response.raise_for_status()
-                
-                # Parse Rasa response
-                rasa_response = response.json()
+                if st.session_state.stream_responses:
+                    # Render partial output as it arrives, then the final reply
+                    placeholder = st.empty()
+                    streamed = ""
+                    rasa_response = []
+                    for event, data in stream_chat(st.session_state.gateway_url, st.session_state.sender_id, user_input):
+                        if event == "token":
+                            streamed += data.get("text", "")
+                            placeholder.markdown(streamed + "▌")
+                        elif event == "done":
+                            # One webhook-style message, so buttons are kept along with the text
+                            reply = {key: data[key] for key in ("text", "buttons") if data.get(key)}
+                            rasa_response = [reply] if reply else []
+                        elif event == "error":
+                            raise requests.exceptions.RequestException(data.get("detail", "Streaming failed"))
+                    placeholder.empty()
+                else:
+                    # Send request to Rasa
+                    response = http_session().post(
+                        st.session_state.rasa_url,
+                        json={"sender": st.session_state.sender_id, "message": user_input},
+                        timeout=10
+                    )
+                    response.raise_for_status()
+                    
+                    # Parse Rasa response
+                    rasa_response = response.json()
                 
                 # Extract bot messages
                 if isinstance(rasa_response, list):
@@ -180,27 +306,21 @@ if user_input:
                 
                 # Show debug info in expander
                 with st.expander("🔍 Debug Info"):
-                    st.json({
-                        "rasa_response": rasa_response,
+                    debug_info = {
                         "user_message": user_input,
                         "response_length": len(rasa_response) if isinstance(rasa_response, list) else 0
-                    })
+                    }
+                    if st.session_state.show_raw_response:
+                        debug_info["rasa_response"] = rasa_response
+                    st.json(debug_info)
                     
-                    # Try to get intent prediction
-                    try:
-                        parse_response = requests.post(
-                            f"{st.session_state.rasa_url.replace('/webhooks/rest/webhook', '/model/parse')}",
-                            json={"text": user_input},
-                            timeout=5
-                        )
-                        if parse_response.status_code == 200:
-                            parse_data = parse_response.json()
-                            st.json({
-                                "intent_prediction": parse_data.get("intent", {}),
-                                "entities": parse_data.get("entities", [])
-                            })
-                    except:
-                        pass
+                    if parse_future is not None:
+                        try:
+                            st.json(parse_future.result(timeout=5))
+                        except Exception as e:
+                            st.caption(f"NLU parse unavailable: {e}")
+                    else:
+                        st.caption("Enable 'Show NLU parse in debug info' in the sidebar to see the intent prediction.")
                     
             except requests.exceptions.ConnectionError:
                 error_msg = "❌ Cannot connect to Rasa server. Please make sure:\n1. Rasa server is running (`rasa run --enable-api`)\n2. Action server is running (`rasa run actions`)\n3. The URL is correct in the sidebar"
@@ -0,0 +1,75 @@
+"""Prometheus metrics and trace IDs for the gateway
+
+Every HTTP request gets a trace ID, taken from an incoming ``X-Trace-Id``
+header or freshly generated. The ID is returned in the response header and
+sent to Rasa in the message ``metadata``, so action server logs for a turn can
+be matched to the gateway request.
+"""
+
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Histogram
+
+TRACE_HEADER = b"x-trace-id"
+_VALID_TRACE_ID = re.compile(r"^[\w-]{1,64}$")
+
+# Buckets sized for chat turns: sub-ms fast paths up to multi-second LLM replies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUESTS = Counter("gateway_requests_total", "HTTP requests handled by the gateway", ["path", "status"])
+REQUEST_SECONDS = Histogram(
+    "gateway_request_seconds", "Gateway request duration, including streamed bodies",
+    ["path"], buckets=LATENCY_BUCKETS,
+)
+RASA_SECONDS = Histogram(
+    "gateway_rasa_call_seconds", "Duration of calls from the gateway to Rasa",
+    ["call"], buckets=LATENCY_BUCKETS,
+)
+FAST_PATH = Counter("gateway_fast_path_total", "NLU fast-path routing outcomes", ["outcome"])
+
+TRACE_ID: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class MetricsMiddleware:
+    """ASGI middleware that assigns trace IDs and records per-route request metrics"""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(TRACE_HEADER, b"").decode("latin-1")
+        trace_id = incoming if _VALID_TRACE_ID.match(incoming) else new_trace_id()
+        token = TRACE_ID.set(trace_id)
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (TRACE_HEADER, trace_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            # The router stores the matched route in the scope; label by its
+            # template so path parameters don't explode the label set
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            if path not in self.skip_paths:
+                REQUEST_SECONDS.labels(path).observe(time.perf_counter() - start)
+                REQUESTS.labels(path, str(status)).inc()
+            TRACE_ID.reset(token)
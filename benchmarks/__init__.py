@@ -0,0 +1,4 @@
+# Offline benchmarks for the gateway and action server
+#
+# Run from the repository root, e.g.:
+#   python -m benchmarks.bench_gateway_pool
@@ -0,0 +1,87 @@
+"""Balance-check latency while slow Gemini fallbacks are in flight
+
+Runs ``--fallbacks`` concurrent fallback actions against a fake Gemini with
+``--latency`` seconds of injected latency and measures sequential balance
+checks on the same event loop. With async actions the balance checks stay in
+the sub-millisecond range; ``--blocking`` emulates the old synchronous SDK
+calls for comparison. Exits non-zero if balance p99 exceeds ``--budget-ms``.
+
+    python -m benchmarks.bench_action_concurrency --fallbacks 50 --latency 2
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+import actions.banking_actions as banking_actions
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+
+def make_tracker(text: str, sender: str = "user123") -> Tracker:
+    return Tracker(sender, {}, {"text": text, "entities": []}, [], False, None, {}, "")
+
+
+async def run_scenario(fallbacks: int, latency: float, checks: int, blocking: bool) -> dict:
+    fake = FakeGenerativeModel(latency=latency, blocking=blocking)
+    banking_actions.MODEL_REGISTRY.factory = lambda *args, **kwargs: fake
+    banking_actions.MODEL_REGISTRY.clear()
+
+    fallback = banking_actions.ActionBankingGeminiFallback()
+    balance = banking_actions.ActionCheckBalance()
+
+    in_flight = [
+        asyncio.create_task(fallback.run(CollectingDispatcher(), make_tracker(f"question number {i}"), {}))
+        for i in range(fallbacks)
+    ]
+    await asyncio.sleep(0)
+
+    loop = asyncio.get_running_loop()
+
+    async def balance_check(due: float) -> float:
+        # Latency is measured from when the request was due, so time spent
+        # waiting for a blocked event loop counts against it
+        await asyncio.sleep(max(0.0, due - loop.time()))
+        await balance.run(CollectingDispatcher(), make_tracker("what is my checking balance"), {})
+        return loop.time() - due
+
+    start = loop.time()
+    latencies = await asyncio.gather(*(
+        balance_check(start + i * latency / checks) for i in range(checks)
+    ))
+    await asyncio.gather(*in_flight)
+    latencies = list(latencies)
+    latencies.sort()
+    return {
+        "fallbacks_in_flight": fallbacks,
+        "balance_checks": checks,
+        "balance_p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "balance_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        "gemini_calls": fake.calls,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fallbacks", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--checks", type=int, default=100)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--blocking", action="store_true", help="emulate the old synchronous Gemini calls")
+    args = parser.parse_args()
+
+    # Distinct questions so the fallback cache does not short-circuit Gemini
+    banking_actions.FALLBACK_CACHE.threshold = 1.1
+    result = asyncio.run(run_scenario(args.fallbacks, args.latency, args.checks, args.blocking))
+    print(result)
+    if result["balance_p99_ms"] > args.budget_ms:
+        print(f"FAIL: balance p99 above {args.budget_ms} ms budget")
+        sys.exit(1)
+    print("OK: balance checks unaffected by in-flight fallbacks")
+
+
+if __name__ == "__main__":
+    main()
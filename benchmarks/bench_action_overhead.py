@@ -0,0 +1,98 @@
+"""Time each Gemini-backed action spends outside the LLM call
+
+The fake model answers instantly, so ``run()`` time is pure action overhead:
+history extraction, cache lookup, prompt formatting and client lookup. Client
+construction is measured separately with the real SDK class, since that is
+what every turn paid before the model registry.
+
+    python -m benchmarks.bench_action_overhead --iterations 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+import google.generativeai as genai
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+import actions.banking_actions as banking_actions
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+REAL_MODEL = genai.GenerativeModel
+
+
+def make_tracker(text: str, events: int = 50) -> Tracker:
+    history = []
+    for i in range(events):
+        history.append({"event": "user", "text": f"question {i}"})
+        history.append({"event": "bot", "text": f"answer {i}"})
+    return Tracker("user123", {}, {"text": text, "entities": []}, history, False, None, {}, "")
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def action_overhead_us(action, tracker: Tracker, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await action.run(CollectingDispatcher(), tracker, {})
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    registry = banking_actions.ModelRegistry()
+    construct = per_call_us(
+        lambda: REAL_MODEL("gemini-pro"), args.iterations
+    )
+    construct_with_instruction = per_call_us(
+        lambda: REAL_MODEL(
+            banking_actions.FALLBACK_MODEL,
+            system_instruction=banking_actions.BANKING_SYSTEM_INSTRUCTION,
+            generation_config=banking_actions.FALLBACK_GENERATION_CONFIG,
+        ),
+        args.iterations,
+    )
+    lookup = per_call_us(
+        lambda: registry.get(
+            banking_actions.FALLBACK_MODEL,
+            banking_actions.BANKING_SYSTEM_INSTRUCTION,
+            banking_actions.FALLBACK_GENERATION_CONFIG,
+        ),
+        args.iterations,
+    )
+
+    fake = FakeGenerativeModel(latency=0.0)
+    banking_actions.MODEL_REGISTRY.factory = lambda *a, **k: fake
+    banking_actions.MODEL_REGISTRY.clear()
+    # Every question must reach the model, not the fallback cache
+    banking_actions.FALLBACK_CACHE.threshold = 1.1
+    banking_actions.FALLBACK_CACHE.store = lambda *a, **k: None
+    # ...and every spending analysis must reach it too, not the insight cache
+    banking_actions.SPENDING_INSIGHTS.precompute = False
+    banking_actions.SPENDING_INSIGHTS.backend.put = lambda *a, **k: None
+
+    fallback = asyncio.run(action_overhead_us(
+        banking_actions.ActionBankingGeminiFallback(), make_tracker("what is overdraft protection"), args.iterations
+    ))
+    spending = asyncio.run(action_overhead_us(
+        banking_actions.ActionAnalyzeSpending(), make_tracker("analyze my spending"), args.iterations
+    ))
+
+    print(f"GenerativeModel() per turn (old)     : {construct:8.1f} us")
+    print(f"GenerativeModel() + system/config    : {construct_with_instruction:8.1f} us")
+    print(f"ModelRegistry.get() per turn (new)   : {lookup:8.1f} us")
+    print(f"fallback action overhead outside LLM : {fallback:8.1f} us")
+    print(f"spending action overhead outside LLM : {spending:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Balance lookups: read-through cache hits vs. pooled SQLite round trips
+
+Seeds a SQLite file with ``--users`` customers and drives concurrent balance
+reads through CachedBankingData. ``--round-trip-ms`` adds a per-query delay on
+the pool thread to stand in for a networked database. Also checks that a
+transfer is visible on the next read and that reads racing transfers never
+leave stale balances in the cache.
+
+    python -m benchmarks.bench_banking_data --users 10000 --requests 20000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from actions.banking_data import CachedBankingData, InMemoryBankingBackend, SQLiteBankingBackend
+from actions.transfers import TransferEngine
+from benchmarks.loadtest import percentile
+
+
+class RemoteSQLiteBackend(SQLiteBankingBackend):
+    """SQLite backend that pays a fixed round trip per query, holding its pool slot"""
+
+    def __init__(self, path: str, pool_size: int, round_trip: float):
+        self.round_trip = round_trip
+        super().__init__(path, pool_size=pool_size)
+
+    def _connection(self):
+        conn = super()._connection()
+        if self.round_trip:
+            time.sleep(self.round_trip)
+        return conn
+
+
+def synthetic_data(users: int, transactions: int) -> dict:
+    rng = random.Random(42)
+    return {
+        "accounts": {
+            f"user{i}": {
+                "checking": {"balance": round(rng.uniform(0, 20000), 2), "account_number": f"****{i % 10000:04d}"},
+                "savings": {"balance": round(rng.uniform(0, 50000), 2), "account_number": f"****{(i + 1) % 10000:04d}"},
+                "credit": {"balance": -round(rng.uniform(0, 5000), 2), "credit_limit": 10000,
+                           "account_number": f"****{(i + 2) % 10000:04d}"},
+            }
+            for i in range(users)
+        },
+        "transactions": {
+            f"user{i}": [
+                {"date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "description": "STARBUCKS",
+                 "amount": -round(rng.uniform(1, 50), 2), "type": "debit"}
+                for _ in range(transactions)
+            ]
+            for i in range(users)
+        },
+    }
+
+
+async def drive(data: CachedBankingData, user_ids: List[str], concurrency: int) -> dict:
+    latencies: List[float] = []
+    queue = list(reversed(user_ids))
+
+    async def worker() -> None:
+        while queue:
+            user_id = queue.pop()
+            start = time.perf_counter()
+            await data.accounts(user_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **{f"p{q}_us": round(percentile(ordered, q / 100) * 1e6, 1) for q in (50, 95, 99)},
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 1),
+    }
+
+
+async def invalidation_checks(data: CachedBankingData, users: int) -> dict:
+    engine = TransferEngine(data)
+    before = (await data.accounts("user0"))["checking"]["balance"]
+    await engine.execute("user0", "checking", "savings", 10.0)
+    after = (await data.accounts("user0"))["checking"]["balance"]
+
+    # Reads racing transfers: afterwards every cached balance must match the backend
+    rng = random.Random(7)
+    racing = [f"user{rng.randrange(min(users, 50))}" for _ in range(2000)]
+    tasks = [data.accounts(u) for u in racing]
+    tasks += [engine.execute(f"user{i}", "savings", "checking", 1.0) for i in range(min(users, 50))]
+    await asyncio.gather(*tasks)
+    stale = 0
+    for i in range(min(users, 50)):
+        user_id = f"user{i}"
+        if await data.accounts(user_id) != await data.backend.accounts(user_id):
+            stale += 1
+    return {"transfer_visible": round(before - after, 2) == 10.0, "stale_after_race": stale}
+
+
+async def run(args, path: str) -> dict:
+    rng = random.Random(1)
+    seed = synthetic_data(args.users, args.transactions)
+    uniform = [f"user{rng.randrange(args.users)}" for _ in range(args.requests)]
+    # Skewed traffic: a few customers check their balance far more often
+    weights = [1 / (i + 1) ** args.zipf for i in range(args.users)]
+    skewed = [f"user{i}" for i in rng.choices(range(args.users), weights, k=args.requests)]
+
+    sqlite = RemoteSQLiteBackend(path, args.pool_size, args.round_trip_ms / 1000)
+    sqlite.seed(seed)
+    results = {}
+
+    uncached = CachedBankingData(sqlite, ttl=0)
+    results["sqlite_miss"] = await drive(uncached, uniform, args.concurrency)
+
+    cached = CachedBankingData(sqlite, ttl=3600)
+    for user_id in set(uniform):
+        await cached.accounts(user_id)
+    results["cache_hit"] = await drive(cached, uniform, args.concurrency)
+
+    ttl = CachedBankingData(sqlite, ttl=args.ttl)
+    skewed_run = await drive(ttl, skewed, args.concurrency)
+    results[f"skewed_ttl_{args.ttl:g}s"] = {**skewed_run, "hit_rate": round(ttl.stats["hit_rate"], 3)}
+
+    memory = CachedBankingData(InMemoryBankingBackend.from_mapping(seed), ttl=0)
+    results["memory_backend"] = await drive(memory, uniform, args.concurrency)
+
+    results["invalidation"] = await invalidation_checks(CachedBankingData(sqlite, ttl=3600), args.users)
+    await sqlite.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--transactions", type=int, default=20, help="transactions per user")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--round-trip-ms", type=float, default=0.5, help="simulated network delay per query")
+    parser.add_argument("--ttl", type=float, default=5.0, help="balance cache TTL for the skewed run")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of the per-user request distribution")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(run(args, os.path.join(tmp, "banking.sqlite3")))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
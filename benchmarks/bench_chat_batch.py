@@ -0,0 +1,80 @@
+"""/chat/batch vs. sequential single /chat calls
+
+Sends the same messages, spread over ``--senders`` conversations, once as
+sequential /chat requests and once as a single /chat/batch request. The
+in-process gateway forwards to the stub Rasa server. The batch run also checks
+that every sender's replies arrive in the order its messages were sent.
+
+    python -m benchmarks.bench_chat_batch --messages 2000 --senders 200
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks.stub_rasa import StubRasaServer
+
+
+async def run(rasa_url: str, messages: list) -> dict:
+    os.environ["RASA_URL"] = rasa_url
+    main = importlib.reload(importlib.import_module("app.main"))
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=600) as client:
+            start = time.perf_counter()
+            for item in messages:
+                res = await client.post("/chat", json={"message": item["message"]})
+                res.raise_for_status()
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            lines = []
+            async with client.stream("POST", "/chat/batch", json={"messages": messages}) as res:
+                res.raise_for_status()
+                async for raw in res.aiter_lines():
+                    if raw:
+                        lines.append(json.loads(raw))
+            batch = time.perf_counter() - start
+
+    last_index = {}
+    out_of_order = 0
+    for line in lines:
+        if line["index"] < last_index.get(line["sender"], -1):
+            out_of_order += 1
+        last_index[line["sender"]] = line["index"]
+
+    return {
+        "messages": len(messages),
+        "sequential_s": round(sequential, 3),
+        "sequential_msgs_per_s": round(len(messages) / sequential, 1),
+        "batch_s": round(batch, 3),
+        "batch_msgs_per_s": round(len(messages) / batch, 1),
+        "batch_lines": len(lines),
+        "batch_errors": sum(1 for line in lines if "error" in line),
+        "out_of_order_within_sender": out_of_order,
+        "speedup": round(sequential / batch, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub Rasa latency in seconds")
+    args = parser.parse_args()
+
+    messages = [
+        {"sender": f"sender-{i % args.senders}", "message": f"message {i // args.senders} from sender {i % args.senders}"}
+        for i in range(args.messages)
+    ]
+    with StubRasaServer(latency=args.latency) as rasa:
+        print(asyncio.run(run(rasa.webhook_url, messages)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Latency of the deterministic NLU bypass vs. the full Rasa round trip
+
+Replays slot-complete balance checks through the gateway's /chat twice: once
+with the fast path disabled (webhook, NLU + dialogue) and once enabled
+(router match + pre-parsed webhook message, dialogue only). By default Rasa is
+the local stub with an emulated NLU cost; pass ``--rasa-url`` to measure a
+live server using the REST channel from credentials.yml.
+
+    python -m benchmarks.bench_fast_path --requests 500
+    python -m benchmarks.bench_fast_path --rasa-url http://localhost:5005
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import statistics
+import time
+from contextlib import nullcontext
+
+import httpx
+
+from benchmarks.stub_rasa import StubRasaServer
+
+MESSAGES = [
+    "What is my checking account balance?",
+    "how much money do I have in savings",
+    "credit card balance",
+    "Show me my checking balance",
+    "hi",
+    "goodbye",
+]
+
+
+def percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 2),
+    }
+
+
+async def drive(rasa_base: str, total: int, fast_path: bool) -> dict:
+    os.environ["RASA_URL"] = f"{rasa_base.rstrip('/')}/webhooks/rest/webhook"
+    os.environ["FAST_PATH_ENABLED"] = "true" if fast_path else "false"
+    main = importlib.reload(importlib.import_module("app.main"))
+
+    latencies = []
+    errors = 0
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+            for i in range(total):
+                start = time.perf_counter()
+                res = await client.post("/chat", json={"message": MESSAGES[i % len(MESSAGES)]})
+                latencies.append(time.perf_counter() - start)
+                errors += res.status_code != 200
+        bypassed = main.app.state.fast_router is not None
+    return {"requests": total, "errors": errors, "fast_path_active": fast_path and bypassed, **percentiles(latencies)}
+
+
+def bench_router(iterations: int) -> dict:
+    from app.fast_router import FastPathRouter
+    from app.main import NLU_DATA_PATH
+
+    router = FastPathRouter.from_nlu_file(NLU_DATA_PATH)
+    latencies = []
+    for i in range(iterations):
+        message = MESSAGES[i % len(MESSAGES)]
+        start = time.perf_counter()
+        router.match(message)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "routed": sum(router.match(m) is not None for m in MESSAGES),
+        "of": len(MESSAGES),
+        "p50_us": round(statistics.median(latencies) * 1e6, 2),
+        "p99_us": round(sorted(latencies)[int(iterations * 0.99) - 1] * 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--rasa-url", help="base URL of a live Rasa server (default: local stub)")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub dialogue + action latency in seconds")
+    parser.add_argument("--nlu-latency", type=float, default=0.03, help="stub NLU inference latency in seconds")
+    args = parser.parse_args()
+
+    stub = nullcontext() if args.rasa_url else StubRasaServer(latency=args.latency, nlu_latency=args.nlu_latency)
+    with stub as rasa:
+        base = args.rasa_url or rasa.base_url
+        full = asyncio.run(drive(base, args.requests, fast_path=False))
+        bypass = asyncio.run(drive(base, args.requests, fast_path=True))
+
+    print(f"router match        : {bench_router(100000)}")
+    print(f"full Rasa round trip: {full}")
+    print(f"fast-path bypass    : {bypass}")
+    print(f"p50 reduction       : {1 - bypass['p50_ms'] / full['p50_ms']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare the pooled async /chat gateway with the legacy sync requests-based handler
+
+Both gateways are driven in-process through httpx's ASGI transport and forward
+to a local stub Rasa server with a fixed per-message latency.
+
+    python -m benchmarks.bench_gateway_pool --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import statistics
+import time
+
+import httpx
+import requests
+from fastapi import FastAPI, HTTPException
+
+from benchmarks.stub_rasa import StubRasaServer
+
+
+def create_legacy_app(rasa_url: str) -> FastAPI:
+    """The original gateway: sync handler, one new connection per turn"""
+    legacy = FastAPI()
+
+    @legacy.post("/chat")
+    def chat(user_msg: dict):
+        try:
+            res = requests.post(rasa_url, json={"sender": "user", "message": user_msg.get("message", "")}, timeout=10)
+            res.raise_for_status()
+            return {"reply": res.json()}
+        except requests.exceptions.RequestException as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return legacy
+
+
+async def drive(app: FastAPI, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.post("/chat", json={"message": f"what is my balance {i}"})
+                latencies.append(time.perf_counter() - start)
+                if res.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+async def run_pooled(rasa_url: str, total: int, concurrency: int) -> dict:
+    os.environ["RASA_URL"] = rasa_url
+    main = importlib.import_module("app.main")
+    main = importlib.reload(main)
+    async with main.lifespan(main.app):
+        return await drive(main.app, total, concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub Rasa latency in seconds")
+    args = parser.parse_args()
+
+    with StubRasaServer(latency=args.latency) as rasa:
+        legacy = asyncio.run(drive(create_legacy_app(rasa.webhook_url), args.requests, args.concurrency))
+        pooled = asyncio.run(run_pooled(rasa.webhook_url, args.requests, args.concurrency))
+
+    print(f"legacy sync gateway : {legacy}")
+    print(f"pooled async gateway: {pooled}")
+    print(f"throughput gain     : {pooled['throughput_rps'] / legacy['throughput_rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Gemini resilience layer against a fault-injecting fake
+
+Scenarios:
+  tail    - 5% of calls take 2 s: p99 with and without hedged requests
+  flaky   - 30% of calls fail: success rate with jittered retries
+  outage  - every call fails: breaker opens and later calls fail fast
+  recover - after the cooldown a half-open probe succeeds and closes the circuit
+
+The run exits non-zero unless hedging lowers p99, the breaker is open after
+the outage and failed calls fast while open, and it closes again on recovery.
+
+    python -m benchmarks.bench_gemini_resilience --requests 400
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import List
+
+from actions.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+
+async def drive(caller: ResilientCaller, model: FakeGenerativeModel, requests: int, concurrency: int = 20) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, rejected = [], 0, 0
+
+    async def one():
+        nonlocal errors, rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await caller.call(lambda: model.generate_content_async("prompt"))
+            except CircuitOpenError:
+                rejected += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    latencies.sort()
+    return {
+        "ok": requests - errors - rejected,
+        "errors": errors,
+        "fast_failed": rejected,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+async def run(requests: int) -> dict:
+    results = {}
+
+    def tail_model():
+        return FakeGenerativeModel(latency=0.05, jitter=0.01, slow_rate=0.05, slow_latency=2.0, seed=7)
+
+    # Warm both callers' latency windows so the hedge delay is known
+    for hedge in (False, True):
+        caller = ResilientCaller("gemini", timeout=5, hedge=hedge, breaker=CircuitBreaker(min_calls=10 ** 9))
+        model = tail_model()
+        await drive(caller, model, 50)
+        results[f"tail_{'hedged' if hedge else 'plain'}"] = {
+            **await drive(caller, model, requests), "hedges": caller.hedged, "model_calls": model.calls,
+        }
+
+    caller = ResilientCaller("gemini", timeout=1, retries=2, backoff_base=0.01,
+                             breaker=CircuitBreaker(min_calls=10 ** 9))
+    results["flaky_30pct"] = {
+        **await drive(caller, FakeGenerativeModel(latency=0.02, error_rate=0.3, seed=3), requests),
+        "retries": caller.retried,
+    }
+
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=10, window=30, cooldown=0.5)
+    caller = ResilientCaller("gemini", timeout=1, retries=1, backoff_base=0.01, breaker=breaker)
+    down = FakeGenerativeModel(latency=0.2, error_rate=1.0, seed=1)
+    results["outage"] = {**await drive(caller, down, requests), "breaker": breaker.snapshot()["state"],
+                         "model_calls": down.calls}
+
+    await asyncio.sleep(breaker.cooldown)
+    results["recover"] = {**await drive(caller, FakeGenerativeModel(latency=0.02), 50, concurrency=1),
+                          "breaker": breaker.snapshot()["state"]}
+    results["snapshot"] = caller.snapshot()
+    return results
+
+
+def failures(results: dict) -> List[str]:
+    """Expected behaviours the scenarios did not show"""
+    failed = []
+    if results["outage"]["breaker"] != "open":
+        failed.append(f"breaker {results['outage']['breaker']} after the outage, expected open")
+    if not results["outage"]["fast_failed"]:
+        failed.append("no call failed fast while the breaker was open")
+    if results["recover"]["breaker"] != "closed":
+        failed.append(f"breaker {results['recover']['breaker']} after recovery, expected closed")
+    plain, hedged = results["tail_plain"]["p99_ms"], results["tail_hedged"]["p99_ms"]
+    if hedged >= plain:
+        failed.append(f"hedged p99 {hedged} ms not below unhedged p99 {plain} ms")
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.requests))
+    print(json.dumps(results, indent=2))
+    failed = failures(results)
+    if failed:
+        print("FAIL: " + "; ".join(failed))
+        sys.exit(1)
+    print("OK: hedging cut p99, breaker opened, failed fast and closed on recovery")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""History prompt size and build time on synthetic trackers with thousands of events
+
+Each synthetic turn is a user message followed by several non-dialogue
+events (slots, action executions) and a bot reply, like real Rasa trackers.
+The script checks the history stays within the token budget and compares
+against the original ``tracker.events[-10:]`` slice.
+
+    python -m benchmarks.bench_history_builder --turns 2000
+"""
+
+import argparse
+import sys
+import time
+
+from rasa_sdk import Tracker
+
+from actions.history import HistoryBuilder, estimate_tokens
+
+
+def synthetic_tracker(turns: int, sender: str = "user123") -> Tracker:
+    events = []
+    clock = 1_700_000_000.0
+    for i in range(turns):
+        clock += 1
+        events.append({"event": "user", "text": f"question {i} about my account fees and overdraft limits", "timestamp": clock})
+        for name in ("user_featurization", "action_listen", "slot", "action"):
+            clock += 0.01
+            events.append({"event": name, "name": "action_banking_gemini_fallback", "timestamp": clock})
+        clock += 0.01
+        events.append({"event": "bot", "text": f"answer {i}: " + "fees depend on the account type. " * 4, "timestamp": clock})
+    # The message currently being answered
+    events.append({"event": "user", "text": "what is overdraft protection", "timestamp": clock + 1})
+    return Tracker(sender, {}, {"text": "what is overdraft protection"}, events, False, None, {}, "")
+
+
+def legacy_history(tracker: Tracker, max_turns: int = 5) -> str:
+    history = []
+    for event in tracker.events[-max_turns * 2:]:
+        if event.get("event") == "user":
+            history.append(f"User: {event.get('text', '')}")
+        elif event.get("event") == "bot":
+            history.append(f"Assistant: {event.get('text', '')}")
+    return "\n".join(history) if history else "No previous conversation."
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--budget", type=int, default=400)
+    parser.add_argument("--summary-budget", type=int, default=120)
+    args = parser.parse_args()
+
+    tracker = synthetic_tracker(args.turns)
+    builder = HistoryBuilder(token_budget=args.budget, summary_budget=args.summary_budget)
+
+    start = time.perf_counter()
+    cold = builder.build(tracker)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(100):
+        warm = builder.build(tracker)
+    warm_ms = (time.perf_counter() - start) * 10
+
+    # One more turn arrives: only the newly displaced turns get summarised
+    grown = synthetic_tracker(args.turns + 1)
+    start = time.perf_counter()
+    builder.build(grown)
+    next_turn_ms = (time.perf_counter() - start) * 1000
+
+    legacy = legacy_history(tracker)
+    tokens = estimate_tokens(warm)
+    limit = args.budget + args.summary_budget + 40
+
+    print(f"events                      : {len(tracker.events):,}")
+    print(f"legacy slice dialogue lines : {legacy.count(chr(10)) + 1 if legacy else 0}")
+    print(f"builder dialogue lines      : {warm.count(chr(10))}")
+    print(f"builder prompt tokens       : ~{tokens} (limit {limit})")
+    print(f"cold build (summarise all)  : {cold_ms:.2f} ms")
+    print(f"warm build (cached summary) : {warm_ms:.3f} ms")
+    print(f"next turn build             : {next_turn_ms:.3f} ms")
+    print(warm.splitlines()[0][:160])
+    if tokens > limit or cold != warm:
+        print("FAIL: history exceeded its budget or changed between identical builds")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Latency against accuracy for NLU pipeline and policy config variants
+
+Each variant is a copy of ``config.yml`` with some components changed, or a
+config file given with ``--config``. The NLU examples in ``data/nlu.yml`` are
+split into train and test sets once. Each variant is trained on the train
+split plus ``data/stories.yml`` and ``data/rules.yml``. The model is then
+loaded in a fresh process, which reports:
+- model load time, size on disk and resident memory added by the load
+- intent F1 on the test split (macro and weighted)
+- per-message parse latency, after one warm-up parse
+- next-action accuracy and latency for every story and rule turn
+
+Training runs in its own process too, so no variant's memory shows up in
+another's numbers. Needs a full Rasa install.
+
+    python -m benchmarks.bench_nlu_configs
+    python -m benchmarks.bench_nlu_configs --variants baseline,low_latency --config my_config.yml
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from benchmarks.conversations import DATA_DIR, ConversationCorpus
+from benchmarks.loadtest import latency_summary
+
+ROOT = DATA_DIR.parent
+
+
+def _component(config: dict, section: str, name: str, **match) -> List[dict]:
+    return [c for c in config.get(section, []) if c.get("name") == name and all(c.get(k) == v for k, v in match.items())]
+
+
+def _drop(config: dict, section: str, name: str) -> None:
+    config[section] = [c for c in config.get(section, []) if c.get("name") != name]
+
+
+def no_response_selector(config: dict) -> None:
+    _drop(config, "pipeline", "ResponseSelector")
+
+
+def char_ngram_3(config: dict) -> None:
+    for featurizer in _component(config, "pipeline", "CountVectorsFeaturizer", analyzer="char_wb"):
+        featurizer["max_ngram"] = 3
+
+
+def no_char_ngrams(config: dict) -> None:
+    config["pipeline"] = [
+        c for c in config["pipeline"]
+        if not (c.get("name") == "CountVectorsFeaturizer" and c.get("analyzer") == "char_wb")
+    ]
+
+
+def small_diet(config: dict) -> None:
+    for diet in _component(config, "pipeline", "DIETClassifier"):
+        diet.update(number_of_transformer_layers=1, transformer_size=128)
+
+
+def no_lexical(config: dict) -> None:
+    _drop(config, "pipeline", "LexicalSyntacticFeaturizer")
+
+
+def no_ted(config: dict) -> None:
+    _drop(config, "policies", "TEDPolicy")
+    for memo in _component(config, "policies", "MemoizationPolicy"):
+        memo["max_history"] = 2
+
+
+def ted_history_3(config: dict) -> None:
+    for policy in _component(config, "policies", "TEDPolicy") + _component(config, "policies", "MemoizationPolicy"):
+        policy["max_history"] = 3
+
+
+# name -> edits applied to a copy of config.yml
+VARIANTS: Dict[str, Tuple[Callable[[dict], None], ...]] = {
+    "baseline": (),
+    "no_response_selector": (no_response_selector,),
+    "char_ngram_3": (char_ngram_3,),
+    "no_char_ngrams": (no_char_ngrams,),
+    "small_diet": (small_diet,),
+    "no_lexical": (no_lexical,),
+    "no_ted": (no_ted,),
+    "ted_history_3": (ted_history_3,),
+}
+
+# Config files measured alongside the variants unless --variants leaves them out
+PROFILES: Dict[str, Path] = {"low_latency": ROOT / "config.low_latency.yml"}
+
+
+def load_config(path: Path, epochs: Optional[int] = None) -> dict:
+    config = yaml.safe_load(path.read_text(encoding="utf-8"))
+    return with_epochs(config, epochs)
+
+
+def with_epochs(config: dict, epochs: Optional[int]) -> dict:
+    """Shorter training for quick comparisons; epochs do not change inference cost"""
+    if epochs:
+        for component in config.get("pipeline", []) + config.get("policies", []):
+            if "epochs" in component:
+                component["epochs"] = epochs
+    return config
+
+
+def variant_config(name: str, base: dict, epochs: Optional[int]) -> dict:
+    if name in PROFILES:
+        return load_config(PROFILES[name], epochs)
+    config = copy.deepcopy(base)
+    for edit in VARIANTS[name]:
+        edit(config)
+    return with_epochs(config, epochs)
+
+
+def split_nlu(workdir: Path, train_frac: float, seed: int) -> Tuple[Path, Path]:
+    """Write train and test splits of data/nlu.yml, stratified by intent"""
+    from rasa.shared.nlu.training_data.loading import load_data
+
+    data = load_data(str(DATA_DIR / "nlu.yml"))
+    train, test = data.train_test_split(train_frac=train_frac, random_seed=seed)
+    train_path, test_path = workdir / "nlu_train.yml", workdir / "nlu_test.yml"
+    train.persist_nlu(str(train_path))
+    test.persist_nlu(str(test_path))
+    return train_path, test_path
+
+
+def train_variant(config_path: str, train_nlu: str, output: str, name: str) -> dict:
+    from rasa.model_training import train
+
+    start = time.perf_counter()
+    result = train(
+        domain=str(ROOT / "domain.yml"),
+        config=config_path,
+        training_files=[train_nlu, str(DATA_DIR / "stories.yml"), str(DATA_DIR / "rules.yml")],
+        output=output,
+        fixed_model_name=name,
+        force_training=True,
+    )
+    if result.code != 0 or not result.model:
+        raise RuntimeError(f"training {name} failed with code {result.code}")
+    return {"model": result.model, "train_seconds": round(time.perf_counter() - start, 1)}
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:
+        # ru_maxrss is the peak in KiB on Linux; close enough where statm is missing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def f1_scores(expected: List[str], predicted: List[str]) -> dict:
+    support = Counter(expected)
+    per_intent = {}
+    for intent in support:
+        tp = sum(1 for e, p in zip(expected, predicted) if e == p == intent)
+        fp = sum(1 for e, p in zip(expected, predicted) if p == intent and e != intent)
+        fn = support[intent] - tp
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        per_intent[intent] = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    total = sum(support.values())
+    return {
+        "intent_f1_macro": round(sum(per_intent.values()) / len(per_intent), 4) if per_intent else 0.0,
+        "intent_f1_weighted": round(sum(f * support[i] for i, f in per_intent.items()) / total, 4) if total else 0.0,
+        "intent_accuracy": round(sum(e == p for e, p in zip(expected, predicted)) / total, 4) if total else 0.0,
+        "worst_intents": dict(sorted(((i, round(f, 3)) for i, f in per_intent.items()), key=lambda x: x[1])[:3]),
+    }
+
+
+def _tracker(domain, turn_text: str, intent: str, entities: Dict[str, str], sender: str):
+    from rasa.shared.core.constants import ACTION_LISTEN_NAME, ACTION_SESSION_START_NAME
+    from rasa.shared.core.events import ActionExecuted, SessionStarted, UserUttered
+    from rasa.shared.core.trackers import DialogueStateTracker
+
+    events = [
+        ActionExecuted(ACTION_SESSION_START_NAME),
+        SessionStarted(),
+        ActionExecuted(ACTION_LISTEN_NAME),
+        UserUttered(
+            turn_text,
+            intent={"name": intent, "confidence": 1.0},
+            entities=[{"entity": k, "value": v} for k, v in entities.items()],
+        ),
+    ]
+    return DialogueStateTracker.from_events(sender, events, slots=domain.slots)
+
+
+async def _evaluate(model: str, test_nlu: str, seed: int) -> dict:
+    from rasa.core.agent import Agent
+    from rasa.shared.nlu.training_data.loading import load_data
+
+    test = [(m.get("text"), m.get("intent")) for m in load_data(test_nlu).intent_examples]
+    corpus = ConversationCorpus.from_data_dir()
+    rng = random.Random(seed)
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    agent = Agent.load(model)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    start = time.perf_counter()
+    await agent.parse_message(test[0][0])
+    first_parse = time.perf_counter() - start
+
+    latencies, predicted = [], []
+    for text, _ in test:
+        start = time.perf_counter()
+        parse = await agent.parse_message(text)
+        latencies.append(time.perf_counter() - start)
+        predicted.append((parse.get("intent") or {}).get("name"))
+
+    # One single-turn tracker per story and rule intent, predicting its action
+    processor = agent.processor
+    policy_latencies, correct = [], 0
+    turns = list(corpus.actions.items())
+    for i, (intent, action) in enumerate(turns):
+        turn = next((t for s in corpus.scripts for t in s.turns if t.intent == intent), None)
+        entities = turn.entities if turn is not None else {}
+        text = corpus.render(turn, rng) if turn is not None else intent
+        tracker = _tracker(agent.domain, text, intent, entities, f"bench-{i}")
+        start = time.perf_counter()
+        prediction = processor.predict_next_with_tracker(tracker)
+        policy_latencies.append(time.perf_counter() - start)
+        best = max(prediction["scores"], key=lambda s: s["score"])["action"] if prediction else None
+        correct += best == action
+
+    return {
+        "model_mb": round(Path(model).stat().st_size / 2 ** 20, 2),
+        "load_seconds": round(load_seconds, 2),
+        "rss_added_mb": round(rss_loaded - rss_before, 1),
+        "rss_mb": round(_rss_mb(), 1),
+        "first_parse_ms": round(first_parse * 1000, 1),
+        "parse": latency_summary(latencies),
+        **f1_scores([intent for _, intent in test], predicted),
+        "action_accuracy": round(correct / len(turns), 4) if turns else None,
+        "policy": latency_summary(policy_latencies),
+    }
+
+
+def evaluate_variant(model: str, test_nlu: str, seed: int) -> dict:
+    return asyncio.run(_evaluate(model, test_nlu, seed))
+
+
+def _in_child(fn, *args):
+    """Run ``fn`` in a fresh interpreter so memory and TensorFlow state do not carry over"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run(args) -> dict:
+    base = load_config(ROOT / "config.yml")
+    names = args.variants.split(",") if args.variants else [*VARIANTS, *PROFILES]
+    unknown = [n for n in names if n not in VARIANTS and n not in PROFILES]
+    if unknown:
+        raise SystemExit(f"unknown variants: {', '.join(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-nlu-") as tmp:
+        workdir = Path(tmp)
+        train_nlu, test_nlu = split_nlu(workdir, args.train_frac, args.seed)
+        configs = {name: variant_config(name, base, args.epochs) for name in names}
+        for path in args.config or []:
+            configs[Path(path).stem] = load_config(Path(path), args.epochs)
+
+        for name, config in configs.items():
+            config_path = workdir / f"config_{name}.yml"
+            config_path.write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+            trained = _in_child(train_variant, str(config_path), str(train_nlu), str(workdir / "models"), name)
+            results[name] = {**trained, **_in_child(evaluate_variant, trained["model"], str(test_nlu), args.seed)}
+            results[name].pop("model")
+            print(f"{name}: {json.dumps(results[name])}", flush=True)
+
+    base_row = results.get("baseline")
+    if base_row:
+        for row in results.values():
+            row["parse_speedup"] = round(base_row["parse"]["p50_ms"] / max(row["parse"]["p50_ms"], 1e-6), 2)
+            row["load_speedup"] = round(base_row["load_seconds"] / max(row["load_seconds"], 1e-6), 2)
+    return {"train_frac": args.train_frac, "seed": args.seed, "epochs": args.epochs, "variants": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", help=f"comma-separated subset of {', '.join([*VARIANTS, *PROFILES])}")
+    parser.add_argument("--config", action="append", help="extra config file to measure (repeatable)")
+    parser.add_argument("--epochs", type=int, help="override every epochs setting for faster runs")
+    parser.add_argument("--train-frac", type=float, default=0.8, help="share of NLU examples used for training")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
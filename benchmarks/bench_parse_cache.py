@@ -0,0 +1,160 @@
+"""NLU parse cache on a replayed Zipf-distributed utterance log
+
+Builds a message log from the ``data/nlu.yml`` examples with Zipf-skewed
+popularity. Part of the log is re-typed with different case and spacing.
+The log is replayed through ParseCache against a stand-in parser that blocks
+for ``--parse-ms`` per call, which is how the featurizers and DIET hold
+Rasa's event loop. Reports hit rate and per-message parse latency with and
+without the cache, hit rate per cache size, coalescing of concurrent cold
+misses, and invalidation when the model fingerprint changes.
+
+    python -m benchmarks.bench_parse_cache --requests 5000 --parse-ms 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from benchmarks.conversations import DATA_DIR, _examples, load_yaml, parse_example
+from benchmarks.loadtest import percentile
+from channels.parse_cache import ParseCache
+
+
+def utterances() -> Dict[str, dict]:
+    """Plain text of every NLU example mapped to its expected parse"""
+    parses = {}
+    for item in load_yaml(DATA_DIR / "nlu.yml").get("nlu", []):
+        if "intent" not in item:
+            continue
+        for example in _examples(item.get("examples")):
+            text, entities = parse_example(example)
+            parses[text] = {"intent": {"name": item["intent"], "confidence": 0.98}, "entities": entities}
+    return parses
+
+
+def retype(text: str, rng: random.Random) -> str:
+    variant = rng.choice((str.lower, str.capitalize, str.upper))(text)
+    return variant.replace(" ", "  ", 1) + rng.choice(("", " "))
+
+
+class StandInParser:
+    """Returns the expected parse after blocking the loop for ``parse_seconds``"""
+
+    def __init__(self, parses: Dict[str, dict], parse_seconds: float, model: str = "model-a"):
+        self.parses = {text.casefold(): parse for text, parse in parses.items()}
+        self.parse_seconds = parse_seconds
+        self.model = model
+        self.calls = 0
+
+    async def __call__(self, text: str) -> dict:
+        self.calls += 1
+        deadline = time.perf_counter() + self.parse_seconds
+        while time.perf_counter() < deadline:
+            pass
+        parse = self.parses.get(" ".join(text.split()).casefold(), {"intent": {"name": "nlu_fallback"}, "entities": []})
+        return {**parse, "text": text, "model": self.model}
+
+
+def summary_us(latencies: List[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        **{f"p{q}_us": round(percentile(ordered, q / 100) * 1e6, 1) for q in (50, 95, 99)},
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 1),
+    }
+
+
+async def replay(log: List[str], parser: StandInParser, cache=None) -> dict:
+    latencies = []
+    mismatched = 0
+    for text in log:
+        start = time.perf_counter()
+        parse = await (cache.parse(text, parser.model, parser) if cache is not None else parser(text))
+        latencies.append(time.perf_counter() - start)
+        expected = parser.parses.get(" ".join(text.split()).casefold())
+        if parse["text"] != text or (expected and parse["intent"] != expected["intent"]):
+            mismatched += 1
+    result = {**summary_us(latencies), "parser_calls": parser.calls, "mismatched": mismatched}
+    if cache is not None:
+        result["hit_rate"] = round(cache.stats["hit_rate"], 3)
+    return result
+
+
+async def coalescing_check(parses: Dict[str, dict], concurrent: int) -> dict:
+    class SlowParser(StandInParser):
+        async def __call__(self, text):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return {**self.parses[text.casefold()], "text": text, "model": self.model}
+
+    parser = SlowParser(parses, 0)
+    cache = ParseCache()
+    text = next(iter(parses))
+    await asyncio.gather(*(cache.parse(text, parser.model, parser) for _ in range(concurrent)))
+    return {"concurrent_requests": concurrent, "parser_calls": parser.calls, **{
+        k: cache.stats[k] for k in ("misses", "coalesced")
+    }}
+
+
+async def invalidation_check(parses: Dict[str, dict]) -> dict:
+    cache = ParseCache()
+    old, new = StandInParser(parses, 0, "model-a"), StandInParser(parses, 0, "model-b")
+    text = next(iter(parses))
+    await cache.parse(text, old.model, old)
+    warm = await cache.parse(text, old.model, old)
+    after_swap = await cache.parse(text, new.model, new)
+    return {
+        "warm_hit_from_old_model": warm["model"] == "model-a" and old.calls == 1,
+        "new_model_reparsed": after_swap["model"] == "model-b" and new.calls == 1,
+        "invalidations": cache.stats["invalidations"],
+    }
+
+
+async def run(args) -> dict:
+    parses = utterances()
+    texts = list(parses)
+    rng = random.Random(args.seed)
+    rng.shuffle(texts)
+    weights = [1 / (i + 1) ** args.zipf for i in range(len(texts))]
+    log = [
+        retype(text, rng) if rng.random() < args.retyped else text
+        for text in rng.choices(texts, weights, k=args.requests)
+    ]
+    parse_seconds = args.parse_ms / 1000
+
+    results = {"distinct_utterances": len(texts), "distinct_in_log": len(set(log)), "requests": len(log)}
+    results["uncached"] = await replay(log, StandInParser(parses, parse_seconds))
+    cache = ParseCache(max_entries=args.cache_size)
+    results["cached"] = await replay(log, StandInParser(parses, parse_seconds), cache)
+    results["mean_speedup"] = round(results["uncached"]["mean_us"] / results["cached"]["mean_us"], 1)
+
+    sizes = {}
+    for size in (10, 25, 50, 100, len(texts)):
+        sized = ParseCache(max_entries=size)
+        parser = StandInParser(parses, 0)
+        for text in log:
+            await sized.parse(text, parser.model, parser)
+        sizes[str(size)] = round(sized.stats["hit_rate"], 3)
+    results["hit_rate_by_cache_size"] = sizes
+
+    results["coalescing"] = await coalescing_check(parses, 50)
+    results["invalidation"] = await invalidation_check(parses)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="messages in the replayed log")
+    parser.add_argument("--parse-ms", type=float, default=10.0, help="CPU time of one NLU parse")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of utterance popularity")
+    parser.add_argument("--retyped", type=float, default=0.3, help="share of messages re-typed with other case/spacing")
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
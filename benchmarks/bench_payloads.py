@@ -0,0 +1,159 @@
+"""Gateway reply payloads: full vs. compact format, json vs. orjson, gzip/brotli
+
+Builds a typical balance reply (with quick-reply buttons) and a transaction
+history reply of ``--history-rows`` lines in the format the actions use. For
+each it reports body size and serialization time in the full and compact
+formats, and compressed size and time. It then sends both replies through the
+in-process gateway (stub Rasa echoing the message) with and without
+``Accept-Encoding`` and checks the bytes on the wire and the decoded body.
+
+    python -m benchmarks.bench_payloads --history-rows 200 --iterations 2000
+"""
+
+import argparse
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from app.payloads import brotli, compact_reply, orjson
+from benchmarks.stub_rasa import StubRasaServer
+
+SENDER = "3f2c9a1e8b7d4c6f9e0a1b2c3d4e5f60"
+
+
+def balance_reply() -> list:
+    return [
+        {"recipient_id": SENDER, "text": "Your checking account (ending in ****1234) balance is $15,234.56."},
+        {
+            "recipient_id": SENDER,
+            "text": "Anything else I can help with?",
+            "buttons": [
+                {"title": "Recent transactions", "payload": "/get_transactions"},
+                {"title": "Transfer money", "payload": "/transfer_money"},
+                {"title": "Analyze spending", "payload": "/analyze_spending"},
+            ],
+        },
+    ]
+
+
+def history_text(rows: int) -> str:
+    rng = random.Random(3)
+    merchants = ["AMAZON PURCHASE", "STARBUCKS", "SALARY DEPOSIT", "WHOLE FOODS", "UBER TRIP", "TRANSFER TO SAVINGS"]
+    lines = [
+        f"{date(2025, 11, 30) - timedelta(days=i // 3)}: {rng.choice(merchants)} - "
+        f"${rng.uniform(1, 500):,.2f} ({rng.choice(['debit', 'credit', 'transfer'])})"
+        for i in range(rows)
+    ]
+    return f"Here are your recent transactions (last {rows // 3 + 1} days):\n" + "\n".join(lines)
+
+
+def time_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+def baseline_dumps(obj) -> bytes:
+    # What Starlette's JSONResponse does
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def measure(messages: list, iterations: int) -> dict:
+    bodies = {
+        "full": {"reply": messages, "sender": SENDER},
+        "compact": {**compact_reply(messages), "sender": SENDER},
+    }
+    result = {}
+    for name, body in bodies.items():
+        raw = baseline_dumps(body)
+        row = {"bytes": len(raw), "json_us": time_us(lambda: baseline_dumps(body), iterations)}
+        if orjson is not None:
+            row["orjson_us"] = time_us(lambda: orjson.dumps(body), iterations)
+        row["gzip_bytes"] = len(gzip.compress(raw, 6))
+        row["gzip_us"] = time_us(lambda: gzip.compress(raw, 6), max(iterations // 10, 1))
+        if brotli is not None:
+            row["brotli_bytes"] = len(brotli.compress(raw, quality=4))
+            row["brotli_us"] = time_us(lambda: brotli.compress(raw, quality=4), max(iterations // 10, 1))
+        result[name] = row
+    result["compact_vs_full_bytes"] = round(result["compact"]["bytes"] / result["full"]["bytes"], 3)
+    result["compact_gzip_vs_full_bytes"] = round(result["compact"]["gzip_bytes"] / result["full"]["bytes"], 3)
+    return result
+
+
+async def gateway_checks(rasa_url: str, replies: dict) -> dict:
+    os.environ["RASA_URL"] = rasa_url
+    os.environ["RASA_URLS"] = rasa_url
+    main = importlib.reload(importlib.import_module("app.main"))
+    results = {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+            for name, text in replies.items():
+                for reply_format in ("full", "compact"):
+                    for accept in ("identity", "gzip"):
+                        res = await client.post(
+                            "/chat",
+                            json={"message": text, "sender": SENDER, "format": reply_format},
+                            headers={"Accept-Encoding": accept},
+                        )
+                        res.raise_for_status()
+                        body = res.json()
+                        echoed = body["reply"][0]["text"] if reply_format == "full" else body["text"]
+                        results[f"{name}_{reply_format}_{accept}"] = {
+                            "wire_bytes": res.num_bytes_downloaded,
+                            "content_encoding": res.headers.get("content-encoding", "identity"),
+                            "decoded_ok": echoed == f"echo: {text}",
+                        }
+
+            # Streamed NDJSON is compressed per line and must decode line by line
+            messages = [{"sender": f"s{i}", "message": replies["history"]} for i in range(20)]
+            lines, wire = [], 0
+            async with client.stream(
+                "POST", "/chat/batch", json={"messages": messages, "format": "compact"},
+                headers={"Accept-Encoding": "gzip"},
+            ) as res:
+                async for raw in res.aiter_lines():
+                    if raw:
+                        lines.append(json.loads(raw))
+                wire = res.num_bytes_downloaded
+                encoding = res.headers.get("content-encoding", "identity")
+            results["batch_compact_gzip"] = {
+                "lines": len(lines),
+                "wire_bytes": wire,
+                "content_encoding": encoding,
+                "decoded_ok": all(line.get("text") == f"echo: {replies['history']}" for line in lines),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-rows", type=int, default=200, help="lines in the long transaction reply")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    history = [{"recipient_id": SENDER, "text": history_text(args.history_rows)}]
+    results = {
+        "orjson": orjson is not None,
+        "brotli": brotli is not None,
+        "balance": measure(balance_reply(), args.iterations),
+        "history": measure(history, args.iterations),
+    }
+    with StubRasaServer(latency=0.0) as rasa:
+        results["gateway"] = asyncio.run(gateway_checks(
+            rasa.webhook_url,
+            {"balance": balance_reply()[0]["text"], "history": history[0]["text"]},
+        ))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Gemini request coalescer vs. independent calls at 500 concurrent requests
+
+The workload is a burst of interactive fallback prompts, drawn from a small
+set of common banking questions with a Zipf-like skew, mixed with unique
+per-user spending analyses. It runs against a fake Gemini backend that slows
+down once more than ``--capacity`` calls are in flight. Three strategies are
+compared:
+
+  unbounded  - every request calls the model directly
+  semaphore  - the previous behaviour: at most --workers calls, FIFO, no sharing
+  coalescer  - RequestCoalescer: same bound, identical prompts share one call,
+               interactive prompts are served ahead of analytics
+
+    python -m benchmarks.bench_request_coalescer --requests 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from actions.coalescer import PRIORITY_ANALYTICS, PRIORITY_INTERACTIVE, RequestCoalescer
+from benchmarks.fake_gemini import FakeGenerativeModel
+
+QUESTIONS = [f"How do I {verb}?" for verb in (
+    "open a savings account", "order a new debit card", "dispute a charge", "set up direct deposit",
+    "reset my online banking password", "increase my credit limit", "enable two-factor authentication",
+    "close an account", "report a lost card", "avoid overdraft fees", "set up a recurring transfer",
+    "change my address", "find my routing number", "activate my card", "stop a check payment",
+    "improve my credit score", "download a statement", "add a joint account holder", "send a wire transfer",
+    "freeze my card",
+)]
+
+
+def workload(total: int, analytics_share: float, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    requests = []
+    for i in range(total):
+        if rng.random() < analytics_share:
+            requests.append((PRIORITY_ANALYTICS, f"Spending summary for user {i}"))
+        else:
+            requests.append((PRIORITY_INTERACTIVE, rng.choices(QUESTIONS, weights)[0]))
+    return requests
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 1),
+    }
+
+
+async def drive(strategy: str, requests: list, args) -> dict:
+    model = FakeGenerativeModel(latency=args.latency, jitter=args.latency / 4, capacity=args.capacity, seed=5)
+    semaphore = asyncio.Semaphore(args.workers)
+    coalescer = RequestCoalescer("gemini", workers=args.workers, window=args.window_ms / 1000)
+    latencies = {PRIORITY_INTERACTIVE: [], PRIORITY_ANALYTICS: []}
+
+    async def one(priority: int, prompt: str) -> None:
+        start = time.perf_counter()
+        if strategy == "unbounded":
+            await model.generate_content_async(prompt)
+        elif strategy == "semaphore":
+            async with semaphore:
+                await model.generate_content_async(prompt)
+        else:
+            await coalescer.submit(lambda: model.generate_content_async(prompt), priority, key=prompt)
+        latencies[priority].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(priority, prompt) for priority, prompt in requests))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "throughput_rps": round(len(requests) / elapsed, 1),
+        "model_calls": model.calls,
+        "max_in_flight": model.max_in_flight,
+        "all": summarize(latencies[PRIORITY_INTERACTIVE] + latencies[PRIORITY_ANALYTICS]),
+        "interactive": summarize(latencies[PRIORITY_INTERACTIVE]),
+        "analytics": summarize(latencies[PRIORITY_ANALYTICS]),
+    }
+    if strategy == "coalescer":
+        snapshot = coalescer.snapshot()
+        result["pool"] = {k: snapshot[k] for k in ("deduplicated", "max_queue_depth", "batches")}
+        result["pool"]["wait_p99_ms"] = {
+            name: round(h["p99"] * 1000, 1) for name, h in snapshot["wait"].items()
+        }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--analytics-share", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=16, help="fake backend calls served at full speed")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake completion time in seconds")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    requests = workload(args.requests, args.analytics_share)
+    results = {strategy: asyncio.run(drive(strategy, requests, args))
+               for strategy in ("unbounded", "semaphore", "coalescer")}
+    print(json.dumps(results, indent=2))
+    base = results["semaphore"]
+    print(f"throughput gain vs semaphore : {results['coalescer']['throughput_rps'] / base['throughput_rps']:.2f}x")
+    print(f"interactive p99 vs semaphore : {base['interactive']['p99_ms']} -> "
+          f"{results['coalescer']['interactive']['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
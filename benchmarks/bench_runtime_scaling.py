@@ -0,0 +1,203 @@
+"""Gateway throughput against worker count under app.launcher, plus a graceful-drain check
+
+Starts ``python -m app.launcher`` with only the gateway tier, in front of a
+stub Rasa server, once per worker count. Client processes then drive /chat
+over keep-alive connections for a fixed time, and the benchmark reports
+requests per second and how well throughput scales. The drain check sends
+SIGTERM while slow requests are in flight. Every request accepted before the
+signal must still get its reply.
+
+Throughput can only scale up to the cores that are free. The client
+processes and the stub share the machine with the workers, so use
+``--client-processes`` to keep enough load generators busy.
+
+    python -m benchmarks.bench_runtime_scaling --workers 1,2,4 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+
+import aiohttp
+
+from app.launcher import CPU_COUNT
+from benchmarks.stub_rasa import StubRasaServer
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_launcher(workers: int, port: int, rasa_url: str, drain_timeout: float) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "RASA_URLS": rasa_url,
+        "FAST_PATH_ENABLED": "false",
+        "GATEWAY_COMPRESSION": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.launcher", "--gateway-workers", str(workers), "--action-workers", "0",
+         "--rasa-replicas", "0", "--host", "127.0.0.1", "--gateway-port", str(port),
+         "--worker-base-port", str(_free_port()),
+         "--drain-timeout", f"{drain_timeout:g}", "--health-interval", "0.5"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120) -> None:
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"launcher exited with {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gateway did not become ready")
+
+
+def stop_launcher(process: subprocess.Popen, timeout: float = 60) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def _drive(url: str, concurrency: int, duration: float, worker_id: int) -> dict:
+    stats = {"ok": 0, "failed": 0}
+    deadline = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def user(i: int) -> None:
+            sender = f"bench-{worker_id}-{i}"
+            while time.monotonic() < deadline:
+                try:
+                    async with session.post(f"{url}/chat", json={"message": "hi", "sender": sender}) as res:
+                        await res.read()
+                        stats["ok" if res.status == 200 else "failed"] += 1
+                except aiohttp.ClientError:
+                    stats["failed"] += 1
+
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return stats
+
+
+def _client(url: str, concurrency: int, duration: float, worker_id: int, results) -> None:
+    results.put(asyncio.run(_drive(url, concurrency, duration, worker_id)))
+
+
+def measure(url: str, processes: int, concurrency: int, duration: float) -> dict:
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=_client, args=(url, concurrency, duration, i, results))
+        for i in range(processes)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    totals = [results.get() for _ in clients]
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.join()
+    ok = sum(t["ok"] for t in totals)
+    return {"rps": round(ok / elapsed, 1), "requests": ok, "failed": sum(t["failed"] for t in totals)}
+
+
+async def _drain_check(url: str, process: subprocess.Popen, in_flight: int) -> dict:
+    """Start ``in_flight`` slow requests, SIGTERM the launcher, count replies"""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+        async def one(i: int) -> bool:
+            try:
+                async with session.post(f"{url}/chat", json={"message": "hi", "sender": f"drain-{i}"}) as res:
+                    await res.read()
+                    return res.status == 200
+            except aiohttp.ClientError:
+                return False
+
+        tasks = [asyncio.create_task(one(i)) for i in range(in_flight)]
+        await asyncio.sleep(0.5)
+        process.send_signal(signal.SIGTERM)
+        completed = await asyncio.gather(*tasks)
+
+    refused = False
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{url}/health") as res:
+                await res.read()
+    except aiohttp.ClientError:
+        refused = True
+    return {"in_flight": in_flight, "completed": sum(completed), "failed": in_flight - sum(completed),
+            "new_connections_refused": refused}
+
+
+def run(args) -> dict:
+    counts = [int(n) for n in args.workers.split(",")]
+    results = {"cpu_count": CPU_COUNT, "client_processes": args.client_processes, "scaling": {}}
+
+    with StubRasaServer(latency=args.rasa_latency) as rasa:
+        for workers in counts:
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            launcher = start_launcher(workers, port, rasa.webhook_url, args.drain_timeout)
+            try:
+                wait_ready(url, launcher)
+                measure(url, args.client_processes, args.concurrency, min(2.0, args.duration))
+                results["scaling"][str(workers)] = measure(url, args.client_processes, args.concurrency, args.duration)
+            finally:
+                stop_launcher(launcher)
+
+    base = results["scaling"].get(str(counts[0]), {}).get("rps")
+    if base:
+        for row in results["scaling"].values():
+            row["speedup"] = round(row["rps"] / base, 2)
+
+    # Slow replies, so requests are still in flight when SIGTERM arrives
+    with StubRasaServer(latency=args.drain_latency) as rasa:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        launcher = start_launcher(counts[-1], port, rasa.webhook_url, args.drain_timeout)
+        try:
+            wait_ready(url, launcher)
+            results["drain"] = asyncio.run(_drain_check(url, launcher, args.drain_requests))
+            launcher.wait(args.drain_timeout + 30)
+            results["drain"]["launcher_exit_code"] = launcher.returncode
+        finally:
+            if launcher.poll() is None:
+                launcher.kill()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    default_workers: List[int] = sorted({1, 2, 4, CPU_COUNT})
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="gateway worker counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--client-processes", type=int, default=max(2, CPU_COUNT // 2))
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent users per client process")
+    parser.add_argument("--rasa-latency", type=float, default=0.0, help="stub Rasa seconds per message")
+    parser.add_argument("--drain-latency", type=float, default=3.0, help="stub latency during the drain check")
+    parser.add_argument("--drain-requests", type=int, default=50)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Per-session sender IDs, sticky sharding across Rasa replicas and tracker trimming
+
+Runs the story-based load test (benchmarks.loadtest) against scripted Rasa
+replicas, which lock each conversation and store trackers as JSON like Rasa
+does:
+
+  shared_sender - every conversation sent as "user" (the old gateway behaviour)
+  per_session   - one sender ID per conversation, one replica
+  sharded       - one sender ID per conversation, consistent hashing over
+                  --replicas replicas; checks every tracker lives on one replica
+  long_untrimmed / long_trimmed - long conversations on replicas without
+                  and with tracker store trimming (--max-events)
+
+    python -m benchmarks.bench_session_routing --replicas 3
+"""
+
+import argparse
+import asyncio
+import json
+from contextlib import ExitStack
+
+import httpx
+
+from benchmarks.conversations import ConversationCorpus
+from benchmarks.loadtest import gateway_client, run_load
+from benchmarks.scripted_rasa import create_scripted_rasa
+from benchmarks.stub_rasa import StubRasaServer
+
+
+def load_args(conversations: int, turns: int, concurrency: int, seed: int, sender=None) -> argparse.Namespace:
+    # Sender IDs derive from the seed, so each scenario gets fresh trackers
+    return argparse.Namespace(
+        conversations=conversations, turns=turns, concurrency=concurrency,
+        think_time=0.0, seed=seed, sender=sender,
+    )
+
+
+async def tracker_sizes(replicas: list) -> list:
+    async with httpx.AsyncClient(timeout=30) as client:
+        return [(await client.get(f"{replica.base_url}/stats/trackers")).json() for replica in replicas]
+
+
+async def scenario(replicas: list, corpus: ConversationCorpus, args: argparse.Namespace) -> dict:
+    before = await tracker_sizes(replicas)
+    async with gateway_client(None, ",".join(r.base_url for r in replicas)) as client:
+        result = await run_load(client, corpus, args)
+    after = await tracker_sizes(replicas)
+
+    new = [{s: n for s, n in sizes.items() if s not in old} for old, sizes in zip(before, after)]
+    owners = {}
+    for i, sizes in enumerate(new):
+        for sender in sizes:
+            owners.setdefault(sender, set()).add(i)
+    events = [n for sizes in new for n in sizes.values()]
+    return {
+        "throughput_rps": result["throughput_rps"],
+        "error_rate": result["error_rate"],
+        "latency": {k: result["latency"][k] for k in ("p50_ms", "p95_ms", "p99_ms")},
+        "senders_per_replica": [len(sizes) for sizes in new],
+        "senders_on_multiple_replicas": sum(1 for o in owners.values() if len(o) > 1),
+        "max_tracker_events": max(events, default=0),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--conversations", type=int, default=120)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--long-turns", type=int, default=150)
+    parser.add_argument("--max-events", type=int, default=60)
+    parser.add_argument("--keep-events", type=int, default=30)
+    parser.add_argument("--gemini-latency", default="fixed:0.2")
+    args = parser.parse_args()
+
+    corpus = ConversationCorpus.from_data_dir()
+    with ExitStack() as stack:
+        def start_replicas(**options) -> list:
+            return [
+                stack.enter_context(StubRasaServer(
+                    latency="uniform:0.002,0.008", nlu_latency="lognormal:0.02,0.3",
+                    app_factory=create_scripted_rasa, gemini_latency=args.gemini_latency, seed=i, **options,
+                ))
+                for i in range(args.replicas)
+            ]
+
+        replicas = start_replicas()
+        trimming = start_replicas(max_events=args.max_events, keep_events=args.keep_events)
+
+        async def run_all() -> dict:
+            short = (args.conversations, args.turns, args.concurrency)
+            long = (10, args.long_turns, 10)
+            return {
+                "shared_sender": await scenario(replicas[:1], corpus, load_args(*short, 1, sender="user")),
+                "per_session": await scenario(replicas[:1], corpus, load_args(*short, 2)),
+                "sharded": await scenario(replicas, corpus, load_args(*short, 3)),
+                "long_untrimmed": await scenario(replicas, corpus, load_args(*long, 4)),
+                "long_trimmed": await scenario(trimming, corpus, load_args(*long, 5)),
+            }
+
+        results = asyncio.run(run_all())
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Spending aggregation on long histories: vectorised rebuild, incremental add, summary
+
+Also checks that incrementally maintained monthly totals and anomaly flags
+match a full rebuild.
+
+    python -m benchmarks.bench_spending_analytics --rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from actions.spending_analytics import SpendingAnalytics, categorize
+from actions.transaction_store import TransactionStore
+from benchmarks.bench_transaction_store import synthetic_transactions
+
+
+def python_loop_breakdown(transactions):
+    """Per-month, per-category totals with a plain Python loop, for comparison"""
+    totals = {}
+    for t in transactions:
+        if t["amount"] < 0:
+            key = (t["date"][:7], categorize(t["description"]))
+            totals[key] = totals.get(key, 0.0) - t["amount"]
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--incremental", type=int, default=10_000, help="transactions folded in one at a time")
+    args = parser.parse_args()
+
+    history = synthetic_transactions(args.rows + args.incremental, span_days=730)
+    history.sort(key=lambda t: t["date"])
+    base, arriving = history[:args.rows], history[args.rows:]
+
+    store = TransactionStore.from_mapping({"user123": base})
+
+    start = time.perf_counter()
+    analytics = SpendingAnalytics.from_store(store)
+    rebuild = time.perf_counter() - start
+
+    start = time.perf_counter()
+    python_loop_breakdown(base)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in arriving:
+        store.add("user123", t)
+    incremental = (time.perf_counter() - start) / len(arriving)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        summary = analytics.summary("user123")
+    render = (time.perf_counter() - start) / 100
+
+    reference = SpendingAnalytics()
+    reference.rebuild("user123", *store.columns("user123"))
+    consistent = all(
+        np.allclose(analytics._users["user123"].monthly[m], reference._users["user123"].monthly[m])
+        for m in reference._users["user123"].monthly
+    )
+    same_anomalies = [(a.date, a.description, a.amount) for a in analytics._users["user123"].anomalies] == [
+        (a.date, a.description, a.amount) for a in reference._users["user123"].anomalies
+    ]
+
+    print(f"rows                          : {args.rows:,}")
+    print(f"vectorised rebuild            : {rebuild * 1000:,.1f} ms")
+    print(f"python loop breakdown only    : {loop * 1000:,.1f} ms")
+    print(f"incremental add (store + aggr): {incremental * 1e6:,.1f} us/transaction")
+    print(f"summary render                : {render * 1e6:,.1f} us")
+    print(f"summary size                  : {len(summary)} chars")
+    print(f"incremental == rebuild        : {consistent}")
+    print(f"same anomalies flagged        : {same_anomalies}")
+
+
+if __name__ == "__main__":
+    main()
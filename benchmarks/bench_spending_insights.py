@@ -0,0 +1,155 @@
+"""Spending insights: cold generation vs. memoized and precomputed lookups
+
+Loads ``--users`` synthetic customers into the in-memory banking backend and
+asks for each one's spending analysis through SpendingInsights, with a fake
+Gemini that answers after ``--latency`` seconds. Phases:
+- cold: empty cache, every request computes the summary and calls Gemini
+- repeat: the same requests again, answered from the memoized insights
+- precomputed: after new transactions for ``--changed`` of the users, the
+  precompute worker refreshes the active users, then every request hits
+- stale: another change, without a precompute pass, once with ``max_stale=0``
+  (changed users miss) and once with stale serving (old insight, then a
+  background refresh)
+
+Every answer is checked against the summary of the transactions at request
+time, so a cache that served an outdated insight fails the check.
+
+    python -m benchmarks.bench_spending_insights --users 2000 --latency 0.8
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import List
+
+from actions.banking_data import CachedBankingData, InMemoryBankingBackend
+from actions.insights import SpendingInsights
+from benchmarks.bench_banking_data import synthetic_data
+from benchmarks.loadtest import latency_summary
+
+
+class FakeInsightGenerator:
+    """Stands in for the Gemini call; the answer names the summary it was built from"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.background_calls = 0
+
+    async def __call__(self, summary: str, publisher, background: bool) -> str:
+        self.calls += 1
+        self.background_calls += background
+        await asyncio.sleep(self.latency)
+        return expected_answer(summary)
+
+
+def expected_answer(summary: str) -> str:
+    return "insight " + hashlib.blake2b(summary.encode(), digest_size=8).hexdigest()
+
+
+async def ask(insights: SpendingInsights, data: CachedBankingData, users: List[str], concurrency: int,
+              check: bool = True) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    outdated = 0
+
+    async def one(user_id: str) -> None:
+        nonlocal outdated
+        async with semaphore:
+            start = time.perf_counter()
+            answer = await insights.get(user_id)
+            latencies.append(time.perf_counter() - start)
+        if check and answer != expected_answer(await data.spending_summary(user_id)):
+            outdated += 1
+
+    await asyncio.gather(*(one(u) for u in users))
+    return {**latency_summary(latencies), "outdated_answers": outdated}
+
+
+def add_transactions(backend: InMemoryBankingBackend, users: List[str], rng: random.Random) -> None:
+    for user_id in users:
+        transaction = {"date": f"2025-12-{rng.randint(1, 28):02d}", "description": "WHOLE FOODS",
+                       "amount": -round(rng.uniform(20, 200), 2), "type": "debit"}
+        backend.store.add(user_id, transaction)
+
+
+def build(args, max_stale: float = 0.0):
+    backend = InMemoryBankingBackend.from_mapping(synthetic_data(args.users, args.transactions))
+    data = CachedBankingData(backend)
+    generator = FakeInsightGenerator(args.latency)
+    insights = SpendingInsights(
+        data, generator, fingerprint="bench", max_stale=max_stale, precompute=False,
+        concurrency=args.precompute_concurrency, interval=3600,
+    )
+    return backend, data, generator, insights
+
+
+async def phase(label: str, generator: FakeInsightGenerator, coro) -> dict:
+    calls = generator.calls
+    result = await coro
+    result["gemini_calls"] = generator.calls - calls
+    print(f"{label}: {json.dumps(result)}", flush=True)
+    return result
+
+
+async def run(args) -> dict:
+    rng = random.Random(7)
+    users = [f"user{i}" for i in range(args.users)]
+    changed = rng.sample(users, int(len(users) * args.changed))
+    results = {}
+
+    backend, data, generator, insights = build(args)
+    results["cold"] = await phase("cold", generator, ask(insights, data, users, args.concurrency))
+    results["repeat"] = await phase("repeat", generator, ask(insights, data, users, args.concurrency))
+
+    add_transactions(backend, changed, rng)
+    start = time.perf_counter()
+    generated = await insights.precompute_once()
+    results["precompute_pass"] = {"generated": generated, "seconds": round(time.perf_counter() - start, 2)}
+    results["precomputed"] = await phase("precomputed", generator, ask(insights, data, users, args.concurrency))
+    await insights.stop()
+
+    add_transactions(backend, changed, rng)
+    results["stale_disabled"] = await phase(
+        "stale_disabled", generator, ask(insights, data, users, args.concurrency)
+    )
+
+    # Stale serving hands back the previous insight on purpose, so only latency is compared
+    backend, data, generator, insights = build(args, max_stale=args.max_stale)
+    await ask(insights, data, users, args.concurrency, check=False)
+    add_transactions(backend, changed, rng)
+    results["stale_served"] = await phase(
+        "stale_served", generator, ask(insights, data, users, args.concurrency, check=False)
+    )
+    await asyncio.sleep(args.latency * 2)
+    results["stale_served"]["background_refreshes"] = generator.calls - args.users
+    results["after_refresh"] = await phase(
+        "after_refresh", generator, ask(insights, data, users, args.concurrency)
+    )
+    await insights.stop()
+
+    cold, warm = results["cold"]["p50_ms"], results["precomputed"]["p50_ms"]
+    results["p50_speedup"] = round(cold / warm, 1) if warm else None
+    results["stats"] = insights.stats
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=200, help="transactions per user")
+    parser.add_argument("--latency", type=float, default=0.8, help="fake Gemini seconds per insight")
+    parser.add_argument("--changed", type=float, default=0.1, help="share of users given new transactions")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent analysis requests")
+    parser.add_argument("--precompute-concurrency", type=int, default=50)
+    parser.add_argument("--max-stale", type=float, default=600.0, help="seconds of stale serving in that phase")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Tracker load/save latency as a conversation grows to thousands of events
+
+Grows one conversation turn by turn, six Rasa-shaped events per turn. At
+each checkpoint it times a turn's load and save in four storage layouts:
+``full_blob`` re-serialises the whole tracker into one value, as Rasa's Redis
+and in-memory stores do; ``row_per_event`` writes one JSON row per event and
+reads them all back, as Rasa's SQLTrackerStore does; ``compact`` is
+SQLiteEventLog, which appends one compacted chunk per turn; and
+``compact_trimmed`` adds the tracker store's save-time trimming. It also
+measures concurrent turns over the connection pool and, with
+``--redis-url``, runs the compact layout on RedisEventLog.
+
+    python -m benchmarks.bench_tracker_store --checkpoints 60,600,3000,6000 --samples 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+from stores.event_log import SQLiteEventLog, compact_event, trimmed_events
+
+INTENTS = ["check_balance", "get_transactions", "transfer_money", "analyze_spending", "greet", "goodbye",
+           "affirm", "deny", "bot_challenge", "ask_question"]
+
+
+def turn_events(rng: random.Random, t: float) -> List[dict]:
+    """One turn as Rasa's Event.as_dict() renders it"""
+    intent = rng.choice(INTENTS)
+    text = rng.choice(["what is my savings balance", "show my transactions", "move 50 from checking to savings"])
+    ranking = sorted(({"name": name, "confidence": rng.random()} for name in INTENTS),
+                     key=lambda r: -r["confidence"])
+    message_id = uuid.UUID(int=rng.getrandbits(128)).hex
+    return [
+        {"event": "user", "timestamp": t, "metadata": {"trace_id": message_id[:16]}, "text": text,
+         "parse_data": {"intent": {"name": intent, "confidence": ranking[0]["confidence"]},
+                        "entities": [{"entity": "account_type", "start": 15, "end": 22, "value": "savings",
+                                      "extractor": "DIETClassifier", "confidence_entity": 0.99}],
+                        "text": text, "message_id": message_id, "metadata": {},
+                        "intent_ranking": ranking,
+                        "response_selector": {"all_retrieval_intents": [], "default": {
+                            "response": {"responses": None, "confidence": 0.0, "intent_response_key": None,
+                                         "utter_action": "utter_None"},
+                            "ranking": []}}},
+         "input_channel": "rest", "message_id": message_id},
+        {"event": "user_featurization", "timestamp": t, "use_text_for_featurization": False},
+        {"event": "action", "timestamp": t + 0.01, "metadata": {"model_id": "3f2c9a1e"},
+         "name": f"action_{intent}", "policy": "policy_1_RulePolicy", "confidence": 1.0,
+         "action_text": None, "hide_rule_turn": False},
+        {"event": "slot", "timestamp": t + 0.01, "name": "account_type", "value": rng.choice(["checking", "savings"])},
+        {"event": "bot", "timestamp": t + 0.02, "metadata": {"utter_action": None},
+         "text": "Your savings account (ending in ****5678) balance is $45,678.90.",
+         "data": {"elements": None, "quick_replies": None, "buttons": None, "attachment": None,
+                  "image": None, "custom": None}},
+        {"event": "action", "timestamp": t + 0.02, "metadata": {"model_id": "3f2c9a1e"},
+         "name": "action_listen", "policy": "policy_1_RulePolicy", "confidence": 1.0,
+         "action_text": None, "hide_rule_turn": False},
+    ]
+
+
+def slots_of(events: List[dict]) -> Dict[str, object]:
+    return {e["name"]: e.get("value") for e in events if e.get("event") == "slot"}
+
+
+class FullBlobStore:
+    """Whole tracker as one JSON value per sender"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("CREATE TABLE trackers (sender_id TEXT PRIMARY KEY, data TEXT)")
+
+    def load(self, sender_id: str) -> List[dict]:
+        row = self.conn.execute("SELECT data FROM trackers WHERE sender_id = ?", (sender_id,)).fetchone()
+        return json.loads(row[0])["events"] if row else []
+
+    def save(self, sender_id: str, events: List[dict]) -> None:
+        data = json.dumps({"sender_id": sender_id, "events": events})
+        self.conn.execute("INSERT OR REPLACE INTO trackers VALUES (?, ?)", (sender_id, data))
+
+    def stored_bytes(self) -> int:
+        return self.conn.execute("SELECT SUM(LENGTH(data)) FROM trackers").fetchone()[0] or 0
+
+
+class RowPerEventStore:
+    """One JSON row per event, all rows read back on load"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, sender_id TEXT, data TEXT)")
+        self.conn.execute("CREATE INDEX events_sender ON events (sender_id, id)")
+
+    def load(self, sender_id: str) -> List[dict]:
+        rows = self.conn.execute("SELECT data FROM events WHERE sender_id = ? ORDER BY id", (sender_id,))
+        return [json.loads(data) for (data,) in rows]
+
+    def save(self, sender_id: str, new_events: List[dict]) -> None:
+        self.conn.execute("BEGIN")
+        self.conn.executemany("INSERT INTO events (sender_id, data) VALUES (?, ?)",
+                              ((sender_id, json.dumps(e)) for e in new_events))
+        self.conn.execute("COMMIT")
+
+    def stored_bytes(self) -> int:
+        return self.conn.execute("SELECT SUM(LENGTH(data)) FROM events").fetchone()[0] or 0
+
+
+def compact_bytes(log: SQLiteEventLog) -> int:
+    conn = sqlite3.connect(log.path)
+    try:
+        return conn.execute("SELECT SUM(LENGTH(data)) FROM tracker_chunks").fetchone()[0] or 0
+    finally:
+        conn.close()
+
+
+async def save_compact(log, sender_id: str, events: List[dict], turn: List[dict],
+                       max_events: int, keep_events: int) -> None:
+    """Save ``turn`` as CompactTrackerStore.save does, trimming when ``max_events`` is set
+
+    ``events`` is the loaded conversation, to which the turn is added.
+    """
+    stored = await log.append(sender_id, [compact_event(e) for e in turn])
+    if max_events and stored > max_events:
+        events = events + turn
+        trimmed = trimmed_events(events, slots_of(events), keep_events)
+        if trimmed is not None:
+            await log.replace(sender_id, [compact_event(e) for e in trimmed])
+
+
+def mean_ms(values: List[float]) -> float:
+    return round(sum(values) / len(values) * 1000, 3)
+
+
+async def growth(args, tmp: str, redis_log=None) -> dict:
+    rng = random.Random(11)
+    sender = "3f2c9a1e8b7d4c6f"
+    blob = FullBlobStore(os.path.join(tmp, "blob.sqlite3"))
+    rows = RowPerEventStore(os.path.join(tmp, "rows.sqlite3"))
+    compact = SQLiteEventLog(os.path.join(tmp, "compact.sqlite3"), pool_size=1)
+    trimmed = SQLiteEventLog(os.path.join(tmp, "trimmed.sqlite3"), pool_size=1)
+    checkpoints = sorted(int(c) for c in args.checkpoints.split(","))
+    all_events: List[dict] = []
+    results = {}
+    t = time.time()
+
+    async def compact_turn(log, turn, max_events, keep_events, timings):
+        start = time.perf_counter()
+        events = await log.load(sender)
+        timings["load"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await save_compact(log, sender, events, turn, max_events, keep_events)
+        timings["save"].append(time.perf_counter() - start)
+
+    for checkpoint in checkpoints:
+        # Grow to the checkpoint; the full blob is written only when measured
+        while len(all_events) < checkpoint:
+            turn = turn_events(rng, t)
+            t += 30
+            all_events.extend(turn)
+            rows.save(sender, turn)
+            await compact.append(sender, [compact_event(e) for e in turn])
+            await save_compact(trimmed, sender, await trimmed.load(sender), turn, args.max_events, args.keep_events)
+            if redis_log is not None:
+                await redis_log.append(sender, [compact_event(e) for e in turn])
+        blob.save(sender, all_events)
+
+        timings = {name: {"load": [], "save": []} for name in
+                   ("full_blob", "row_per_event", "compact", "compact_trimmed", "redis_compact")}
+        for _ in range(args.samples):
+            turn = turn_events(rng, t)
+            t += 30
+            start = time.perf_counter()
+            events = blob.load(sender)
+            timings["full_blob"]["load"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            blob.save(sender, events + turn)
+            timings["full_blob"]["save"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            rows.load(sender)
+            timings["row_per_event"]["load"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            rows.save(sender, turn)
+            timings["row_per_event"]["save"].append(time.perf_counter() - start)
+
+            await compact_turn(compact, turn, 0, 0, timings["compact"])
+            await compact_turn(trimmed, turn, args.max_events, args.keep_events, timings["compact_trimmed"])
+            if redis_log is not None:
+                await compact_turn(redis_log, turn, 0, 0, timings["redis_compact"])
+            all_events.extend(turn)
+
+        row = {}
+        for name, timing in timings.items():
+            if timing["load"]:
+                row[name] = {"load_ms": mean_ms(timing["load"]), "save_ms": mean_ms(timing["save"])}
+        row["trimmed_events_loaded"] = len(await trimmed.load(sender))
+        results[str(checkpoint)] = row
+
+    results["bytes_per_event"] = {
+        "full_blob": round(blob.stored_bytes() / len(all_events), 1),
+        "row_per_event": round(rows.stored_bytes() / len(all_events), 1),
+        "compact": round(compact_bytes(compact) / len(all_events), 1),
+    }
+    await compact.close()
+    await trimmed.close()
+    return results
+
+
+async def pooled(tmp: str, pool_size: int, senders: int, turns: int) -> dict:
+    """Concurrent conversations, each doing load + save per turn"""
+    log = SQLiteEventLog(os.path.join(tmp, f"pool{pool_size}.sqlite3"), pool_size=pool_size)
+
+    async def conversation(i: int) -> None:
+        rng = random.Random(i)
+        for n in range(turns):
+            await log.load(f"s{i}")
+            await log.append(f"s{i}", [compact_event(e) for e in turn_events(rng, n * 30.0)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(senders)))
+    elapsed = time.perf_counter() - start
+    await log.close()
+    return {"turns_per_s": round(senders * turns / elapsed, 1)}
+
+
+async def run(args, tmp: str) -> dict:
+    redis_log = None
+    results = {}
+    if args.redis_url:
+        try:
+            from stores.event_log import RedisEventLog
+            redis_log = RedisEventLog(args.redis_url, key_prefix=f"bench:{uuid.uuid4().hex[:8]}:")
+        except ImportError:
+            results["redis"] = "skipped: the redis package is not installed"
+    results["growth"] = await growth(args, tmp, redis_log)
+    results["pooled"] = {
+        f"pool_{size}": await pooled(tmp, size, args.senders, args.turns) for size in (1, args.pool_size)
+    }
+    if redis_log is not None:
+        for key in await redis_log.keys():
+            await redis_log.delete(key)
+        await redis_log.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checkpoints", default="60,600,3000,6000", help="conversation lengths in events")
+    parser.add_argument("--samples", type=int, default=20, help="turns timed at each checkpoint")
+    parser.add_argument("--max-events", type=int, default=1000, help="trim threshold of compact_trimmed")
+    parser.add_argument("--keep-events", type=int, default=500)
+    parser.add_argument("--senders", type=int, default=100, help="concurrent conversations in the pool run")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--redis-url", help="e.g. redis://localhost:6379/15 to include RedisEventLog")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(run(args, tmp))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
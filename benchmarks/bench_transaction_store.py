@@ -0,0 +1,75 @@
+"""Date-range lookups: indexed TransactionStore vs. the original strptime list scan
+
+    python -m benchmarks.bench_transaction_store --rows 1000000 --days 7
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from actions.transaction_store import TransactionStore
+
+DESCRIPTIONS = ["AMAZON PURCHASE", "STARBUCKS", "SALARY DEPOSIT", "UBER TRIP", "WHOLE FOODS", "NETFLIX"]
+
+
+def synthetic_transactions(rows: int, span_days: int = 3650):
+    today = date.today()
+    rng = random.Random(42)
+    return [
+        {
+            "date": (today - timedelta(days=rng.randrange(span_days))).strftime("%Y-%m-%d"),
+            "description": rng.choice(DESCRIPTIONS),
+            "amount": round(rng.uniform(-300, 300), 2),
+            "type": "debit",
+        }
+        for _ in range(rows)
+    ]
+
+
+def list_scan(transactions, days: int):
+    """The original ActionGetTransactions filter"""
+    cutoff_date = datetime.now() - timedelta(days=days)
+    recent = [
+        t for t in transactions
+        if datetime.strptime(t["date"], "%Y-%m-%d") >= cutoff_date
+    ]
+    return recent[:10]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.rows)
+
+    start = time.perf_counter()
+    store = TransactionStore.from_mapping({"user123": transactions})
+    build = time.perf_counter() - start
+
+    cutoff = date.today() - timedelta(days=args.days)
+    scan = timed(lambda: list_scan(transactions, args.days), repeat=1)
+    indexed = timed(lambda: store.query("user123", start=cutoff, limit=10), repeat=1000)
+    paged = timed(lambda: store.query("user123", start=cutoff, offset=50, limit=10, newest_first=True), repeat=1000)
+    latest = timed(lambda: store.latest("user123", 20), repeat=1000)
+
+    print(f"rows                 : {args.rows:,}")
+    print(f"store build (once)   : {build * 1000:,.1f} ms")
+    print(f"list scan + strptime : {scan * 1000:,.2f} ms/query")
+    print(f"indexed range query  : {indexed * 1e6:,.1f} us/query")
+    print(f"indexed page 6 (desc): {paged * 1e6:,.1f} us/query")
+    print(f"latest 20            : {latest * 1e6:,.1f} us/query")
+    print(f"speedup              : {scan / indexed:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
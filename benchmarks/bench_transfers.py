@@ -0,0 +1,208 @@
+"""Concurrent transfer stress test: conservation, exactly-once and throughput
+
+Fires thousands of concurrent transfers between random accounts of
+``--users`` customers, re-submitting a share of them with the same
+idempotency key as a retrying client would. Afterwards it checks that every
+customer's total balance is unchanged, that each balance equals its start
+value plus the ledgered transfers (so no retry moved money twice), that the
+ledger holds exactly one entry per completed transfer and a receipt for each,
+and that no account went below its available funds. The run exits non-zero
+when any check fails. Throughput is compared with a single
+global lock (``stripes=1``) and the striped engine, on both backends.
+
+    python -m benchmarks.bench_transfers --transfers 5000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from actions.banking_data import (
+    AccountNotFoundError,
+    CachedBankingData,
+    InMemoryBankingBackend,
+    InsufficientFundsError,
+    TransferReceipt,
+    available_funds,
+)
+from actions.transfers import TransferEngine, idempotency_key
+from benchmarks.bench_banking_data import RemoteSQLiteBackend
+
+ACCOUNTS = ("checking", "savings", "credit")
+
+
+def seed_data(users: int) -> dict:
+    rng = random.Random(3)
+    return {
+        "accounts": {
+            f"user{i}": {
+                "checking": {"balance": round(rng.uniform(500, 5000), 2), "account_number": "****1234"},
+                "savings": {"balance": round(rng.uniform(500, 5000), 2), "account_number": "****5678"},
+                "credit": {"balance": -round(rng.uniform(0, 2000), 2), "credit_limit": 3000,
+                           "account_number": "****9012"},
+            }
+            for i in range(users)
+        },
+        "transactions": {},
+    }
+
+
+def workload(users: int, transfers: int, duplicates: float, seed: int) -> List[Tuple]:
+    """(user, from, to, amount, key) requests; duplicates reuse an earlier key"""
+    rng = random.Random(seed)
+    requests = []
+    for n in range(transfers):
+        user_id = f"user{rng.randrange(users)}"
+        from_account, to_account = rng.sample(ACCOUNTS, 2)
+        amount = round(rng.uniform(1, 800), 2)
+        requests.append((user_id, from_account, to_account, amount, idempotency_key(user_id, n)))
+    retries = [requests[rng.randrange(len(requests))] for _ in range(int(transfers * duplicates))]
+    requests += retries
+    rng.shuffle(requests)
+    return requests
+
+
+async def run_engine(data: CachedBankingData, engine: TransferEngine, requests: List[Tuple],
+                     concurrency: int) -> dict:
+    queue = list(requests)
+    receipts: Dict[str, TransferReceipt] = {}
+    outcomes = {"completed": 0, "replayed": 0, "insufficient_funds": 0, "account_not_found": 0}
+
+    async def worker() -> None:
+        while queue:
+            user_id, from_account, to_account, amount, key = queue.pop()
+            try:
+                receipt = await engine.execute(user_id, from_account, to_account, amount, key)
+            except InsufficientFundsError:
+                outcomes["insufficient_funds"] += 1
+                continue
+            except AccountNotFoundError:
+                outcomes["account_not_found"] += 1
+                continue
+            if receipt.replayed:
+                outcomes["replayed"] += 1
+            else:
+                outcomes["completed"] += 1
+                receipts[key] = receipt
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"throughput_tps": round(len(requests) / elapsed, 1), **outcomes, "receipts": receipts}
+
+
+def ledger_size(backend) -> int:
+    """Entries in the backend's transfer ledger"""
+    if isinstance(backend, InMemoryBankingBackend):
+        return len(backend._transfers)
+    with sqlite3.connect(backend.path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM transfers").fetchone()[0]
+
+
+async def verify(data: CachedBankingData, seed: dict, receipts: Dict[str, TransferReceipt]) -> dict:
+    expected = {
+        user_id: {account: a["balance"] for account, a in accounts.items()}
+        for user_id, accounts in seed["accounts"].items()
+    }
+    for r in receipts.values():
+        expected[r.user_id][r.from_account] -= r.amount
+        expected[r.user_id][r.to_account] += r.amount
+
+    conserved = ledger_consistent = overdrawn = 0
+    for user_id, start in seed["accounts"].items():
+        accounts = await data.backend.accounts(user_id)
+        if abs(sum(a["balance"] for a in accounts.values()) - sum(a["balance"] for a in start.values())) < 0.005:
+            conserved += 1
+        if all(abs(accounts[k]["balance"] - v) < 0.005 for k, v in expected[user_id].items()):
+            ledger_consistent += 1
+        overdrawn += sum(1 for a in accounts.values() if available_funds(a) < -0.005)
+    missing = 0
+    for key in receipts:
+        missing += await data.get_transfer(key) is None
+    return {
+        "users": len(seed["accounts"]),
+        "balances_conserved": conserved,
+        "matches_ledger": ledger_consistent,
+        "overdrawn_accounts": overdrawn,
+        "ledger_entries": ledger_size(data.backend),
+        "receipts_missing_from_ledger": missing,
+    }
+
+
+def failures(result: dict) -> List[str]:
+    """Checks of one scenario that did not hold"""
+    checks = result["checks"]
+    failed = []
+    if checks["balances_conserved"] != checks["users"]:
+        failed.append(f"total balance changed for {checks['users'] - checks['balances_conserved']} users")
+    if checks["matches_ledger"] != checks["users"]:
+        failed.append(f"balances differ from the ledger for {checks['users'] - checks['matches_ledger']} users")
+    if checks["ledger_entries"] != result["completed"]:
+        failed.append(f"{checks['ledger_entries']} ledger entries for {result['completed']} completed transfers")
+    if checks["overdrawn_accounts"]:
+        failed.append(f"{checks['overdrawn_accounts']} accounts below their credit line")
+    if checks["receipts_missing_from_ledger"]:
+        failed.append(f"{checks['receipts_missing_from_ledger']} accepted transfers without a receipt")
+    return failed
+
+
+async def scenario(backend_factory, args, stripes: int) -> dict:
+    seed = seed_data(args.users)
+    backend = backend_factory(seed)
+    data = CachedBankingData(backend, ttl=5)
+    engine = TransferEngine(data, stripes=stripes)
+    requests = workload(args.users, args.transfers, args.duplicates, seed=11)
+    # Replaying the same key concurrently is the interesting retry case
+    result = await run_engine(data, engine, requests, args.concurrency)
+    receipts = result.pop("receipts")
+    result["checks"] = await verify(data, seed, receipts)
+    await backend.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transfers", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of transfers re-sent with the same key")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--stripes", type=int, default=256)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--round-trip-ms", type=float, default=0.5, help="simulated SQLite round trip per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def memory(seed):
+            # The in-memory backend updates the mapping it is given
+            return InMemoryBankingBackend.from_mapping(copy.deepcopy(seed))
+
+        def sqlite(seed, counter=iter(range(1000))):
+            backend = RemoteSQLiteBackend(
+                os.path.join(tmp, f"banking{next(counter)}.sqlite3"), args.pool_size, args.round_trip_ms / 1000,
+            )
+            backend.seed(seed)
+            return backend
+
+        results = {
+            "memory_striped": asyncio.run(scenario(memory, args, args.stripes)),
+            "sqlite_global_lock": asyncio.run(scenario(sqlite, args, 1)),
+            "sqlite_striped": asyncio.run(scenario(sqlite, args, args.stripes)),
+        }
+    print(json.dumps(results, indent=2))
+    failed = [f"{name}: {failure}" for name, result in results.items() for failure in failures(result)]
+    if failed:
+        print("FAIL: " + "; ".join(failed))
+        sys.exit(1)
+    print("OK: balances conserved, one ledger entry per transfer, no overdrafts")
+
+
+if __name__ == "__main__":
+    main()
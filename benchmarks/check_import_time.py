@@ -0,0 +1,101 @@
+"""Import-time check for the action server and gateway entry modules
+
+Imports each module in a fresh interpreter with ``python -X importtime``
+(best of ``--repeat`` runs) and prints the slowest top-level dependencies.
+It exits non-zero when a module pulls in a dependency that must stay lazy.
+Times are reported against a baseline import of the framework the module
+builds on, since absolute milliseconds depend on the machine. They only
+fail the check for modules given a ``--max-ratio``.
+
+    python -m benchmarks.check_import_time
+    python -m benchmarks.check_import_time --max-ratio actions.banking_actions=3
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# module -> (baseline module, modules that must not be imported at startup)
+DEFAULT_CHECKS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "actions.banking_actions": ("rasa_sdk", ("google.generativeai", "google.api_core", "aiohttp", "numpy")),
+    "app.main": ("fastapi", ("rasa_sdk", "actions", "google.generativeai")),
+}
+
+# import time: self [us] | cumulative | imported package
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile(module: str) -> List[Tuple[int, int, str]]:
+    """(cumulative us, depth, name) of every import made by ``import module``"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def subtree(rows: List[Tuple[int, int, str]], module: str) -> List[Tuple[int, int, str]]:
+    """Rows imported on behalf of ``module`` (the output is in post-order), itself last"""
+    end = max(i for i, (_, depth, name) in enumerate(rows) if name == module and depth == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+
+def best_run(module: str, repeat: int) -> List[Tuple[int, int, str]]:
+    runs = [subtree(profile(module), module) for _ in range(repeat)]
+    return min(runs, key=lambda rows: rows[-1][0])
+
+
+def check(module: str, baseline: str, forbidden: Tuple[str, ...], repeat: int, top: int,
+          max_ratio: Optional[float] = None) -> dict:
+    best = best_run(module, repeat)
+    total_ms = best[-1][0] / 1000
+    baseline_ms = best_run(baseline, repeat)[-1][0] / 1000
+    ratio = total_ms / baseline_ms if baseline_ms else None
+    leaked = sorted({f for _, _, name in best for f in forbidden if name == f or name.startswith(f + ".")})
+    # Direct dependencies, slowest first
+    heaviest = sorted(((us, name) for us, depth, name in best if depth == 1), reverse=True)[:top]
+    return {
+        "import_ms": round(total_ms, 1),
+        "baseline": baseline,
+        "baseline_ms": round(baseline_ms, 1),
+        "ratio": round(ratio, 2) if ratio is not None else None,
+        "max_ratio": max_ratio,
+        "forbidden_imported": leaked,
+        "heaviest": {name: round(us / 1000, 1) for us, name in heaviest},
+        "ok": not leaked and (max_ratio is None or ratio is None or ratio <= max_ratio),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-ratio", action="append", default=[], metavar="MODULE=RATIO",
+                        help="fail when the module takes longer than RATIO times its baseline import")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    max_ratios = {}
+    for spec in args.max_ratio:
+        module, ratio = spec.split("=")
+        max_ratios[module] = float(ratio)
+
+    report = {module: check(module, baseline, forbidden, args.repeat, args.top, max_ratios.get(module))
+              for module, (baseline, forbidden) in DEFAULT_CHECKS.items()}
+    print(json.dumps(report, indent=2))
+    if not all(r["ok"] for r in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Conversation scripts built from the Rasa training data
+
+Stories and rules give the intent sequence of each script and the action the
+assistant runs for every intent; NLU examples give the user wording. Each
+replay renders a fresh phrasing of every turn, so load tests exercise the whole
+example set rather than one canned sentence per intent.
+"""
+
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Text, Tuple
+
+import yaml
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+FALLBACK_ACTION = "action_banking_gemini_fallback"
+
+# [value](entity) or [value](entity:canonical)
+_ANNOTATION = re.compile(r"\[(?P<text>[^\]]+)\]\((?P<entity>[^):]+)(?::(?P<value>[^)]+))?\)")
+
+
+def load_yaml(path: Path) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _examples(block: Optional[Text]) -> List[Text]:
+    return [line.strip()[2:].strip() for line in (block or "").splitlines() if line.strip().startswith("- ")]
+
+
+def plain_text(example: Text, values: Optional[Dict[Text, Text]] = None) -> Text:
+    """Strip annotations, optionally replacing entity spans with ``values``"""
+    values = values or {}
+    return _ANNOTATION.sub(lambda m: values.get(m.group("entity"), m.group("text")), example)
+
+
+def parse_example(example: Text) -> Tuple[Text, List[Dict[Text, Text]]]:
+    """Plain text and Rasa-style entity list of an annotated example"""
+    entities = []
+    text, offset = [], 0
+    for match in _ANNOTATION.finditer(example):
+        text.append(example[offset:match.start()])
+        start = sum(len(t) for t in text)
+        text.append(match.group("text"))
+        entities.append({
+            "entity": match.group("entity"),
+            "value": match.group("value") or match.group("text"),
+            "start": start,
+            "end": start + len(match.group("text")),
+        })
+        offset = match.end()
+    text.append(example[offset:])
+    return "".join(text), entities
+
+
+@dataclass
+class Turn:
+    intent: Text
+    entities: Dict[Text, Text] = field(default_factory=dict)
+    action: Text = FALLBACK_ACTION
+
+
+@dataclass
+class Script:
+    name: Text
+    turns: List[Turn]
+
+
+class ConversationCorpus:
+    """Story scripts plus the NLU examples used to phrase them"""
+
+    def __init__(self, examples: Dict[Text, List[Text]], actions: Dict[Text, Text], scripts: List[Script],
+                 synonyms: Optional[Dict[Text, Text]] = None):
+        self.examples = examples
+        self.actions = actions
+        self.scripts = scripts
+        self.synonyms = synonyms or {}
+
+    @classmethod
+    def from_data_dir(cls, data_dir: Path = DATA_DIR) -> "ConversationCorpus":
+        examples: Dict[Text, List[Text]] = {}
+        synonyms: Dict[Text, Text] = {}
+        for item in load_yaml(data_dir / "nlu.yml").get("nlu", []):
+            if "intent" in item:
+                examples.setdefault(item["intent"], []).extend(_examples(item.get("examples")))
+            elif "synonym" in item:
+                synonyms.update({e.lower(): str(item["synonym"]) for e in _examples(item.get("examples"))})
+
+        actions: Dict[Text, Text] = {}
+        scripts: List[Script] = []
+        for source, key in (("rules.yml", "rules"), ("stories.yml", "stories")):
+            for entry in load_yaml(data_dir / source).get(key, []):
+                turns: List[Turn] = []
+                for step in entry.get("steps", []):
+                    if "intent" in step:
+                        entities = {k: str(v) for e in step.get("entities") or [] for k, v in e.items()}
+                        turns.append(Turn(step["intent"], entities))
+                    elif "action" in step and turns and turns[-1].action == FALLBACK_ACTION:
+                        turns[-1].action = step["action"]
+                        actions.setdefault(turns[-1].intent, step["action"])
+                if key == "stories" and turns and all(t.intent in examples for t in turns):
+                    scripts.append(Script(entry.get("story", "story"), turns))
+        return cls(examples, actions, scripts, synonyms)
+
+    def render(self, turn: Turn, rng: random.Random) -> Text:
+        """A random training phrasing of ``turn`` carrying its story entities"""
+        candidates = self.examples[turn.intent]
+        if turn.entities:
+            annotated = [e for e in candidates
+                         if set(turn.entities) <= {m.group("entity") for m in _ANNOTATION.finditer(e)}]
+            candidates = annotated or candidates
+        return plain_text(rng.choice(candidates), turn.entities)
+
+    def conversation(self, rng: random.Random, length: int) -> List[Tuple[Turn, Text]]:
+        """``length`` turns chained from randomly chosen story scripts"""
+        turns: List[Tuple[Turn, Text]] = []
+        while len(turns) < length:
+            for turn in rng.choice(self.scripts).turns:
+                turns.append((turn, self.render(turn, rng)))
+        return turns[:length]
@@ -0,0 +1,37 @@
+"""Latency distributions for the local stand-ins, parsed from short specs
+
+    0.05 / fixed:0.05      always 50 ms
+    uniform:0.02,0.08      uniform between 20 and 80 ms
+    exp:0.05               exponential with a 50 ms mean
+    lognormal:0.8,0.5      log-normal with a 0.8 s median and sigma 0.5 (long tail)
+"""
+
+import math
+import random
+from typing import Callable, Union
+
+Sampler = Callable[[random.Random], float]
+
+
+def parse_distribution(spec: Union[str, float]) -> Sampler:
+    if isinstance(spec, (int, float)):
+        value = float(spec)
+        return lambda rng: value
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+    values = [float(p) for p in params.split(",")]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "exp":
+        mean = values[0]
+        return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
@@ -0,0 +1,122 @@
+"""In-process stand-in for google.generativeai.GenerativeModel"""
+
+import asyncio
+import random
+import time
+from typing import Callable, List, Optional
+
+try:
+    from google.api_core.exceptions import ServiceUnavailable as InjectedFault
+except ImportError:
+    InjectedFault = ConnectionError
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = []
+
+
+class FakeGenerativeModel:
+    """Answers every prompt after an injected latency
+
+    ``latency`` is the mean completion time in seconds; ``jitter`` adds a
+    uniform +/- spread. Streaming splits the answer into ``chunks`` pieces spread
+    over the same total time.
+
+    Faults: ``error_rate`` of calls raise a 503 after the latency, and
+    ``slow_rate`` of calls take ``slow_latency`` instead (tail latency).
+
+    A ``sampler`` (see ``benchmarks.distributions``) replaces the
+    ``latency``/``jitter`` model with an arbitrary distribution.
+
+    With ``capacity`` set, the backend serves that many calls at full speed;
+    beyond it every in-flight call slows down proportionally, like a shared
+    server under overload.
+    """
+
+    def __init__(self, model_name: str = "fake", latency: float = 1.0, jitter: float = 0.0,
+                 answer: str = "This is a generated banking answer.", chunks: int = 4,
+                 blocking: bool = False, seed: Optional[int] = None, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 5.0, capacity: Optional[int] = None,
+                 sampler: Optional[Callable[[random.Random], float]] = None):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.answer = answer
+        self.chunks = chunks
+        self.blocking = blocking
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.capacity = capacity
+        self.sampler = sampler
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            return self.slow_latency
+        if self.sampler:
+            return max(0.0, self.sampler(self._rng))
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise InjectedFault("injected fault")
+
+    def _pieces(self) -> List[str]:
+        words = self.answer.split(" ")
+        size = max(1, len(words) // self.chunks)
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    async def _sleep(self, seconds: float) -> None:
+        if self.blocking:
+            # Emulates a synchronous SDK call made from the event loop
+            time.sleep(seconds)
+        elif self.capacity:
+            await self._shared_sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    async def _shared_sleep(self, work: float, tick: float = 0.005) -> None:
+        """Consume ``work`` seconds of service, at a rate that drops when over capacity"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            while work > 0:
+                rate = min(1.0, self.capacity / self.in_flight)
+                step = min(tick, work / rate)
+                await asyncio.sleep(step)
+                work -= step * rate
+        finally:
+            self.in_flight -= 1
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        self.calls += 1
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return FakeChunk(self.answer)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        self.calls += 1
+        delay = self._delay()
+        if not stream:
+            await self._sleep(delay)
+            self._maybe_fail()
+            return FakeChunk(self.answer)
+
+        self._maybe_fail()
+
+        pieces = self._pieces()
+
+        async def chunks():
+            for piece in pieces:
+                await self._sleep(delay / len(pieces))
+                yield FakeChunk(piece)
+
+        return chunks()
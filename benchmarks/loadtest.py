@@ -0,0 +1,181 @@
+"""Replay story-based conversations against the gateway and report JSON
+
+Virtual users each play multi-turn conversations rendered from
+data/stories.yml and data/nlu.yml, one turn at a time, against /chat. By
+default the gateway runs in-process and forwards to the scripted Rasa
+stand-in (real custom actions, fake Gemini) in a child process. Pass
+``--gateway-url`` to load a deployed gateway instead.
+
+Latencies take a distribution spec (see benchmarks.distributions), e.g.
+``--gemini-latency lognormal:0.8,0.4``.
+
+    python -m benchmarks.loadtest --conversations 200 --concurrency 50 --output loadtest.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import subprocess
+import time
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.conversations import ConversationCorpus
+from benchmarks.scripted_rasa import create_scripted_rasa
+from benchmarks.stub_rasa import StubRasaServer
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+@asynccontextmanager
+async def gateway_client(gateway_url: Optional[str], rasa_url: Optional[str]):
+    """HTTP client for a deployed gateway, or for an in-process one wired to ``rasa_url``
+
+    ``rasa_url`` may list several comma-separated replicas.
+    """
+    if gateway_url:
+        async with httpx.AsyncClient(base_url=gateway_url, timeout=60) as client:
+            yield client
+        return
+
+    webhooks = [f"{url}/webhooks/rest/webhook" for url in rasa_url.split(",")]
+    os.environ["RASA_URL"] = webhooks[0]
+    os.environ["RASA_URLS"] = ",".join(webhooks)
+    main = importlib.reload(importlib.import_module("app.main"))
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+            yield client
+
+
+async def run_load(client: httpx.AsyncClient, corpus: ConversationCorpus, args) -> dict:
+    rng = random.Random(args.seed)
+    conversations = [corpus.conversation(rng, args.turns) for _ in range(args.conversations)]
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, conversation in enumerate(conversations):
+        queue.put_nowait((i, conversation))
+
+    latencies: List[float] = []
+    by_intent: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    error_turns = 0
+
+    async def user() -> None:
+        nonlocal error_turns
+        while not queue.empty():
+            i, conversation = queue.get_nowait()
+            sender = args.sender or f"loadtest-{args.seed}-{i}"
+            for turn, text in conversation:
+                start = time.perf_counter()
+                try:
+                    res = await client.post("/chat", json={"message": text, "sender": sender})
+                    failure = None if res.status_code == 200 else f"http_{res.status_code}"
+                except httpx.HTTPError as e:
+                    failure = type(e).__name__
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                by_intent.setdefault(turn.intent, []).append(elapsed)
+                if failure:
+                    error_turns += 1
+                    errors[failure] = errors.get(failure, 0) + 1
+                if args.think_time:
+                    await asyncio.sleep(rng.uniform(0, args.think_time))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "duration_s": round(elapsed, 3),
+        "conversations": len(conversations),
+        "turns": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "error_rate": round(error_turns / len(latencies), 4) if latencies else 0.0,
+        "errors": errors,
+        "latency": latency_summary(latencies),
+        "intents": {
+            intent: {"turns": len(values), **latency_summary(values)}
+            for intent, values in sorted(by_intent.items())
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4, help="turns per conversation")
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous virtual users")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max pause between turns in seconds")
+    parser.add_argument("--nlu-latency", default="lognormal:0.02,0.3")
+    parser.add_argument("--policy-latency", default="uniform:0.002,0.008")
+    parser.add_argument("--gemini-latency", default="lognormal:0.8,0.4")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sender", help="send every conversation as this one sender ID")
+    parser.add_argument("--gateway-url", help="load a deployed gateway instead of the local stack")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    corpus = ConversationCorpus.from_data_dir()
+    rasa = nullcontext() if args.gateway_url else StubRasaServer(
+        latency=args.policy_latency, nlu_latency=args.nlu_latency,
+        app_factory=create_scripted_rasa, gemini_latency=args.gemini_latency, seed=args.seed,
+    )
+
+    async def run(rasa_url: Optional[str]) -> dict:
+        async with gateway_client(args.gateway_url, rasa_url) as client:
+            return await run_load(client, corpus, args)
+
+    with rasa as server:
+        results = asyncio.run(run(server.base_url if server else None))
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "config": {
+            key: getattr(args, key) for key in (
+                "conversations", "turns", "concurrency", "think_time", "nlu_latency",
+                "policy_latency", "gemini_latency", "seed", "sender", "gateway_url",
+            )
+        },
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
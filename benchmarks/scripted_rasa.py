@@ -0,0 +1,177 @@
+"""Rasa stand-in that runs the real custom actions against a fake Gemini
+
+NLU is an exact lookup of the training examples (anything else becomes
+``nlu_fallback``) and the dialogue policy is the intent -> action mapping of
+the stories and rules, each with an injected latency. Custom actions from
+``actions/banking_actions.py`` run in-process with the same tracker events
+Rasa would pass them, so their own cost shows up in the measurements.
+
+Like Rasa, turns of one sender are serialised by a per-conversation lock and
+trackers are stored as JSON, so every turn pays to load and save the whole
+tracker. With ``max_events`` set, a save trims the tracker as
+CompactTrackerStore does. The tracker read/replace endpoints of Rasa's HTTP
+API are supported.
+"""
+
+import asyncio
+import inspect
+import json
+import random
+import time
+from typing import Any, Dict, List, Text, Union
+
+from fastapi import FastAPI
+
+from app.fast_router import normalize
+from benchmarks.conversations import DATA_DIR, FALLBACK_ACTION, ConversationCorpus, load_yaml, parse_example
+from benchmarks.distributions import parse_distribution
+from benchmarks.fake_gemini import FakeGenerativeModel
+from stores.event_log import trimmed_events
+
+
+
+def create_scripted_rasa(
+    latency: Union[str, float] = 0.005,
+    nlu_latency: Union[str, float] = 0.02,
+    gemini_latency: Union[str, float] = "lognormal:0.8,0.4",
+    account: Text = "user123",
+    seed: int = 0,
+    max_events: int = 0,
+    keep_events: int = 0,
+) -> FastAPI:
+    """Build the scripted Rasa app
+
+    ``latency`` is the dialogue policy time per turn and ``nlu_latency`` the
+    intent classification time (skipped for messages the gateway's fast path
+    pre-parsed). Conversations
+    are tracked per sender, but every tracker is handed to the actions as
+    ``account`` so they find data in the mock banking database. A tracker
+    longer than ``max_events`` is cut to its newest ``keep_events`` on save
+    (0 keeps everything).
+    """
+    from rasa_sdk import Action, Tracker
+    from rasa_sdk.executor import CollectingDispatcher
+
+    from actions import banking_actions
+
+    rng = random.Random(seed)
+    policy_delay = parse_distribution(latency)
+    nlu_delay = parse_distribution(nlu_latency)
+
+    fake = FakeGenerativeModel(sampler=parse_distribution(gemini_latency), seed=seed)
+    banking_actions.MODEL_REGISTRY.factory = lambda *args, **kwargs: fake
+    banking_actions.MODEL_REGISTRY.clear()
+
+    actions: Dict[Text, Any] = {}
+    for _, cls in inspect.getmembers(banking_actions, inspect.isclass):
+        if issubclass(cls, Action) and cls.__module__ == banking_actions.__name__:
+            action = cls()
+            actions[action.name()] = action
+
+    corpus = ConversationCorpus.from_data_dir()
+    parses: Dict[Text, Dict[Text, Any]] = {}
+    for intent, examples in corpus.examples.items():
+        for example in examples:
+            text, entities = parse_example(example)
+            for entity in entities:
+                entity["value"] = corpus.synonyms.get(entity["value"].lower(), entity["value"])
+            parses.setdefault(normalize(text), {"intent": intent, "entities": entities})
+
+    domain = load_yaml(DATA_DIR.parent / "domain.yml")
+    responses = {name: [r["text"] for r in variants] for name, variants in domain.get("responses", {}).items()}
+    slot_names = list(domain.get("slots", {}))
+    # sender -> serialised {"events": [...], "slots": {...}}, as a tracker store keeps them
+    trackers: Dict[Text, Text] = {}
+    locks: Dict[Text, asyncio.Lock] = {}
+
+    def load(sender: Text) -> Dict[Text, Any]:
+        stored = trackers.get(sender)
+        return json.loads(stored) if stored else {"events": [], "slots": {name: None for name in slot_names}}
+
+    def save(sender: Text, tracker: Dict[Text, Any]) -> None:
+        if max_events > 0 and len(tracker["events"]) > max_events:
+            trimmed = trimmed_events(tracker["events"], tracker["slots"], keep_events or max_events)
+            if trimmed is not None:
+                tracker["events"] = trimmed
+        trackers[sender] = json.dumps(tracker)
+
+    async def respond(sender: Text, text: Text, parse: Dict[Text, Any], metadata: Dict) -> List[Dict]:
+        async with locks.setdefault(sender, asyncio.Lock()):
+            state = load(sender)
+            messages = await run_turn(sender, state, text, parse, metadata)
+            save(sender, state)
+        return messages
+
+    async def run_turn(sender: Text, state: Dict[Text, Any], text: Text, parse: Dict[Text, Any],
+                       metadata: Dict) -> List[Dict]:
+        events, slots = state["events"], state["slots"]
+        latest = {
+            "text": text,
+            "intent": {"name": parse["intent"], "confidence": 1.0},
+            "entities": parse["entities"],
+            "metadata": metadata or {},
+        }
+        events.append({"event": "user", "text": text, "timestamp": time.time(), "parse_data": latest})
+
+        await asyncio.sleep(policy_delay(rng))
+        action_name = corpus.actions.get(parse["intent"], FALLBACK_ACTION)
+        if action_name in responses:
+            messages = [{"text": rng.choice(responses[action_name])}]
+        elif action_name in actions:
+            for entity in parse["entities"]:
+                if entity["entity"] in slots:
+                    slots[entity["entity"]] = entity["value"]
+                    events.append({"event": "slot", "name": entity["entity"], "value": entity["value"]})
+            tracker = Tracker(account, dict(slots), latest, list(events), False, None, {}, action_name)
+            dispatcher = CollectingDispatcher()
+            await actions[action_name].run(dispatcher, tracker, domain)
+            messages = dispatcher.messages
+        else:
+            messages = []
+
+        for message in messages:
+            if message.get("text"):
+                events.append({"event": "bot", "text": message["text"], "timestamp": time.time()})
+        events.append({"event": "action", "name": "action_listen", "timestamp": time.time()})
+        return [{"recipient_id": sender, **{k: v for k, v in m.items() if v}} for m in messages]
+
+    stub = FastAPI()
+
+    @stub.get("/")
+    async def root():
+        return "Hello from Rasa: scripted"
+
+    @stub.post("/webhooks/rest/webhook")
+    async def webhook(payload: dict):
+        text = payload.get("message", "")
+        metadata = dict(payload.get("metadata") or {})
+        route = metadata.pop("fast_path", None)
+        if route:
+            entities = [{"entity": k, "value": v} for k, v in (route.get("entities") or {}).items()]
+            parse = {"intent": route["intent"], "entities": entities}
+        else:
+            await asyncio.sleep(nlu_delay(rng))
+            parse = parses.get(normalize(text), {"intent": "nlu_fallback", "entities": []})
+        return await respond(payload.get("sender", "default"), text, parse, metadata)
+
+    @stub.get("/conversations/{sender}/tracker")
+    async def get_tracker(sender: str):
+        return {"sender_id": sender, **load(sender)}
+
+    @stub.put("/conversations/{sender}/tracker/events")
+    async def replace_events(sender: str, events: List[Dict[str, Any]]):
+        async with locks.setdefault(sender, asyncio.Lock()):
+            state = load(sender)
+            state["events"] = events
+            for event in events:
+                if event.get("event") == "slot":
+                    state["slots"][event["name"]] = event.get("value")
+            save(sender, state)
+        return {"sender_id": sender, **state}
+
+    @stub.get("/stats/trackers")
+    async def tracker_stats():
+        """Benchmark helper: event count per stored tracker"""
+        return {sender: len(json.loads(stored)["events"]) for sender, stored in trackers.items()}
+
+    return stub
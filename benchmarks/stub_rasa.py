@@ -0,0 +1,86 @@
+"""Local stand-in for the Rasa REST webhook used by the benchmarks"""
+
+import asyncio
+import multiprocessing
+import socket
+import time
+from typing import Any, Callable, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+
+def create_stub_rasa(latency: float = 0.05, nlu_latency: float = 0.0) -> FastAPI:
+    """Build a stub Rasa server that answers every message after ``latency`` seconds
+
+    Messages sent as text also pay ``nlu_latency`` for intent classification;
+    messages the gateway's fast path pre-parsed (``fast_path`` metadata) do not.
+    """
+    stub = FastAPI()
+
+    @stub.get("/")
+    async def root():
+        return "Hello from Rasa: stub"
+
+    @stub.post("/webhooks/rest/webhook")
+    async def webhook(payload: dict):
+        route = (payload.get("metadata") or {}).get("fast_path")
+        await asyncio.sleep(latency + (0.0 if route else nlu_latency))
+        text = f"intent: {route['intent']}" if route else f"echo: {payload.get('message', '')}"
+        return [{"recipient_id": payload.get("sender", "user"), "text": text}]
+
+    return stub
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(factory: Callable[..., FastAPI], options: dict, port: int) -> None:
+    uvicorn.run(
+        factory(**options), host="127.0.0.1", port=port,
+        log_level="warning", backlog=4096,
+    )
+
+
+class StubRasaServer:
+    """Run the stub Rasa app with uvicorn in a child process
+
+    A separate process keeps the stub from competing with the code under test
+    for the GIL, so measured latency reflects the gateway and not the stand-in.
+    ``app_factory`` swaps in another stand-in (e.g. ``create_scripted_rasa``);
+    extra keyword arguments are passed to it.
+    """
+
+    def __init__(self, latency: Any = 0.05, port: Optional[int] = None, nlu_latency: Any = 0.0,
+                 app_factory: Callable[..., FastAPI] = create_stub_rasa, **options):
+        self.port = port or _free_port()
+        options = {"latency": latency, "nlu_latency": nlu_latency, **options}
+        self._process = multiprocessing.Process(
+            target=_serve, args=(app_factory, options, self.port), daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def webhook_url(self) -> str:
+        return f"{self.base_url}/webhooks/rest/webhook"
+
+    def __enter__(self) -> "StubRasaServer":
+        self._process.start()
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.1):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("Stub Rasa server did not start")
+
+    def __exit__(self, *exc) -> None:
+        self._process.terminate()
+        self._process.join(timeout=5)
@@ -0,0 +1 @@
+# Rasa input channels
@@ -0,0 +1,160 @@
+"""LRU cache of NLU parse results for repeated utterances
+
+Entries are keyed by the normalized message text. They are only valid for
+one model fingerprint: when Rasa loads another model the cache sees the new
+fingerprint on the next lookup and drops every entry. Concurrent misses on the
+same text share one parse.
+"""
+
+import asyncio
+import copy
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Text
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Messages written in intent syntax ("/greet") skip the NLU pipeline anyway
+INTENT_MESSAGE_PREFIX = "/"
+
+_WHITESPACE = re.compile(r"\s+")
+
+PARSE_CACHE_LOOKUPS = Counter("nlu_parse_cache_lookups_total", "NLU parse cache lookups", ["result"])
+PARSE_CACHE_ENTRIES = Gauge("nlu_parse_cache_entries", "Parse results held in the NLU parse cache")
+PARSE_CACHE_INVALIDATIONS = Counter(
+    "nlu_parse_cache_invalidations_total", "Times the NLU parse cache was cleared for a new model"
+)
+
+ParseFn = Callable[[Text], Awaitable[Dict[Text, Any]]]
+
+
+def normalize(text: Text) -> Text:
+    """Cache key for ``text``: case-folded, with whitespace collapsed
+
+    The count-vector featurizers already lowercase their input. Punctuation is
+    kept because it changes the char n-grams.
+    """
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def for_text(parse: Dict[Text, Any], text: Text) -> Dict[Text, Any]:
+    """Copy of a cached parse re-pointed at ``text``, with entity offsets moved to match"""
+    parse = copy.deepcopy(parse)
+    original = parse.get("text") or ""
+    parse["text"] = text
+    if original != text:
+        folded = text.casefold()
+        for entity in parse.get("entities") or []:
+            start, end = entity.get("start"), entity.get("end")
+            if start is None or end is None:
+                continue
+            found = folded.find(original[start:end].casefold())
+            if found >= 0:
+                entity["start"], entity["end"] = found, found + (end - start)
+    return parse
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # Every waiter may have been cancelled; keep asyncio from logging the error as unhandled
+    if not task.cancelled():
+        task.exception()
+
+
+class ParseCache:
+    """Parse results keyed by normalized text, for one model fingerprint at a time
+
+    Texts longer than ``max_text_length`` rarely repeat, so they bypass the cache
+    instead of evicting useful entries.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_text_length: int = 200):
+        self.max_entries = max_entries
+        self.max_text_length = max_text_length
+        self.fingerprint: Optional[Text] = None
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Text, Dict[Text, Any]]" = OrderedDict()
+        self._inflight: Dict[Text, asyncio.Future] = {}
+
+    def cacheable(self, text: Text) -> bool:
+        return (
+            self.max_entries > 0
+            and bool(text)
+            and not text.startswith(INTENT_MESSAGE_PREFIX)
+            and len(text) <= self.max_text_length
+        )
+
+    def _use_model(self, fingerprint: Text) -> None:
+        if fingerprint == self.fingerprint:
+            return
+        if self.fingerprint is not None:
+            self.invalidations += 1
+            PARSE_CACHE_INVALIDATIONS.inc()
+            logger.info(f"Model changed to {fingerprint}, dropping {len(self._entries)} cached parses")
+        self._entries.clear()
+        self._inflight = {}
+        self.fingerprint = fingerprint
+        PARSE_CACHE_ENTRIES.set(0)
+
+    async def parse(self, text: Text, fingerprint: Optional[Text], parser: ParseFn) -> Dict[Text, Any]:
+        """The parse of ``text`` under model ``fingerprint``, calling ``parser`` on a miss"""
+        if not fingerprint or not self.cacheable(text):
+            self.bypassed += 1
+            PARSE_CACHE_LOOKUPS.labels("bypass").inc()
+            return await parser(text)
+
+        self._use_model(fingerprint)
+        key = normalize(text)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            PARSE_CACHE_LOOKUPS.labels("hit").inc()
+            return for_text(cached, text)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            PARSE_CACHE_LOOKUPS.labels("coalesced").inc()
+        else:
+            self.misses += 1
+            PARSE_CACHE_LOOKUPS.labels("miss").inc()
+            # Its own task, so a cancelled request does not fail the others waiting on it
+            task = self._inflight[key] = asyncio.ensure_future(self._fill(key, text, fingerprint, parser))
+            task.add_done_callback(_retrieve_exception)
+        return for_text(await asyncio.shield(task), text)
+
+    async def _fill(self, key: Text, text: Text, fingerprint: Text, parser: ParseFn) -> Dict[Text, Any]:
+        inflight = self._inflight
+        try:
+            result = await parser(text)
+        finally:
+            if inflight.get(key) is asyncio.current_task():
+                del inflight[key]
+        # A model swapped in while parsing gets its own results
+        if self.fingerprint == fingerprint:
+            self._entries[key] = result
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            PARSE_CACHE_ENTRIES.set(len(self._entries))
+        return result
+
+    @property
+    def stats(self) -> Dict[Text, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "fingerprint": self.fingerprint,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
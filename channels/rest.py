@@ -0,0 +1,94 @@
+"""Rasa REST channel that reuses cached NLU parse results
+
+A drop-in for the built-in ``rest`` channel: same /webhooks/rest/webhook URL,
+request body and reply format. Before a message reaches the agent its parse
+comes from the ParseCache when the same text was seen under the loaded model,
+so Rasa skips the featurizers and DIET. Messages the gateway's fast path
+already classified carry their intent and entities in the metadata and skip
+NLU as well, while the tracker keeps the user's text and metadata. Enabled in
+credentials.yml.
+"""
+
+import logging
+import os
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional, Text
+
+from prometheus_client import start_http_server
+from rasa.core.channels.channel import UserMessage
+from rasa.core.channels.rest import RestInput
+from sanic import Blueprint, response
+
+from channels.parse_cache import ParseCache
+
+logger = logging.getLogger(__name__)
+
+# Cached parses (0 disables the cache) and the longest text worth caching
+NLU_PARSE_CACHE_SIZE = int(os.getenv("NLU_PARSE_CACHE_SIZE", "10000"))
+NLU_PARSE_CACHE_MAX_CHARS = int(os.getenv("NLU_PARSE_CACHE_MAX_CHARS", "200"))
+# Port of a Prometheus endpoint for the cache metrics in the Rasa process; 0 disables it
+NLU_PARSE_CACHE_METRICS_PORT = int(os.getenv("NLU_PARSE_CACHE_METRICS_PORT", "0"))
+
+# Metadata key of a pre-parsed intent sent by the gateway (app/fast_router.py)
+FAST_PATH_METADATA_KEY = "fast_path"
+
+
+def fast_path_parse(text: Text, route: Any, intents: Collection[Text]) -> Optional[Dict[Text, Any]]:
+    """Parse data for a message the gateway's fast path already classified
+
+    None when the route is malformed or names an intent the model does not
+    know, so the message goes through NLU instead.
+    """
+    if not isinstance(route, dict) or route.get("intent") not in intents:
+        return None
+    entities = route.get("entities") or {}
+    if not isinstance(entities, dict):
+        return None
+    intent = {"name": route["intent"], "confidence": 1.0}
+    return {
+        "text": text,
+        "intent": intent,
+        "intent_ranking": [intent],
+        "entities": [{"entity": entity, "value": value} for entity, value in entities.items()],
+    }
+
+
+class CachedParseRestInput(RestInput):
+    """``rest`` channel with an NLU parse cache in front of the agent"""
+
+    def __init__(self, cache: Optional[ParseCache] = None):
+        self.cache = cache or ParseCache(NLU_PARSE_CACHE_SIZE, NLU_PARSE_CACHE_MAX_CHARS)
+        self._app = None
+
+    @classmethod
+    def from_credentials(cls, credentials: Optional[Dict[Text, Any]]) -> "CachedParseRestInput":
+        if NLU_PARSE_CACHE_METRICS_PORT:
+            try:
+                start_http_server(NLU_PARSE_CACHE_METRICS_PORT)
+                logger.info(f"NLU parse cache metrics served on :{NLU_PARSE_CACHE_METRICS_PORT}/metrics")
+            except OSError as e:
+                logger.warning(f"NLU parse cache metrics not started on port {NLU_PARSE_CACHE_METRICS_PORT}: {e}")
+        return cls()
+
+    def blueprint(self, on_new_message: Callable[[UserMessage], Awaitable[Any]]) -> Blueprint:
+        async def parse_then_handle(message: UserMessage) -> None:
+            # PUT /model swaps app.ctx.agent, so look it up per message
+            agent = getattr(self._app.ctx, "agent", None) if self._app else None
+            route = message.metadata.pop(FAST_PATH_METADATA_KEY, None) if isinstance(message.metadata, dict) else None
+            if agent is not None and agent.is_ready() and message.parse_data is None and message.text:
+                if route is not None:
+                    message.parse_data = fast_path_parse(message.text, route, agent.domain.intents)
+                if message.parse_data is None:
+                    message.parse_data = await self.cache.parse(message.text, agent.model_id, agent.parse_message)
+            await on_new_message(message)
+
+        webhook = super().blueprint(parse_then_handle)
+
+        @webhook.listener("before_server_start")
+        async def remember_app(app, _loop) -> None:
+            self._app = app
+
+        @webhook.route("/parse_cache", methods=["GET"])
+        async def parse_cache_stats(_request) -> response.HTTPResponse:
+            return response.json(self.cache.stats)
+
+        return webhook
@@ -0,0 +1 @@
+# Rasa tracker and lock stores
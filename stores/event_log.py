@@ -0,0 +1,316 @@
+"""Append-only, compacted storage of Rasa tracker events
+
+Rasa's built-in Redis and in-memory stores re-serialise the whole tracker on
+every save, so a turn costs more the longer the conversation gets. Here each
+save appends only the events added since the previous one, as a single chunk.
+Events are compacted before storage: fields set to None are dropped, NLU
+rankings are cut to their top entries, and chunks above COMPRESS_MIN_BYTES
+are zlib-compressed.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+Event = Dict[Text, Any]
+
+COMPRESS_MIN_BYTES = 512
+_RAW, _ZLIB = b"j", b"z"
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def compact_event(event: Event, ranking_length: int = 3) -> Event:
+    """Smaller copy of an event dict that Rasa deserialises to the same event
+
+    Rasa reads every optional field with ``.get``, so None values need not be
+    stored. Old turns only need the top intents, and only the chosen response of
+    each response selector.
+    """
+    event = {k: v for k, v in event.items() if v is not None}
+    parse = event.get("parse_data")
+    if parse:
+        parse = {k: v for k, v in parse.items() if v is not None}
+        if parse.get("text") == event.get("text"):
+            # expand_event restores it; actions read latest_message["text"]
+            del parse["text"]
+        if "intent_ranking" in parse:
+            parse["intent_ranking"] = parse["intent_ranking"][:ranking_length]
+        selector = parse.get("response_selector")
+        if isinstance(selector, dict):
+            parse["response_selector"] = {
+                name: {k: v for k, v in value.items() if k != "ranking"} if isinstance(value, dict) else value
+                for name, value in selector.items()
+            }
+        event["parse_data"] = parse
+    return event
+
+
+def expand_event(event: Event) -> Event:
+    parse = event.get("parse_data")
+    if parse is not None and "text" not in parse and "text" in event:
+        parse["text"] = event["text"]
+    return event
+
+
+def trimmed_events(events: List[Event], slots: Dict[Text, Any], max_events: int) -> Optional[List[Event]]:
+    """Replacement event list keeping the newest ``max_events`` events
+
+    The kept tail starts at a user turn and is preceded by a synthetic session
+    start that carries over the current slot values. Returns None when the
+    tracker is already small enough or no turn boundary falls inside the tail.
+    """
+    if max_events <= 0 or len(events) <= max_events:
+        return None
+    tail = events[-max_events:]
+    start = next((i for i, e in enumerate(tail) if e.get("event") == "user"), None)
+    if start is None:
+        return None
+    tail = tail[start:]
+
+    timestamp = tail[0].get("timestamp")
+    prefix: List[Event] = [
+        {"event": "action", "name": "action_session_start"},
+        {"event": "session_started"},
+        *({"event": "slot", "name": name, "value": value} for name, value in slots.items() if value is not None),
+        {"event": "action", "name": "action_listen"},
+    ]
+    if timestamp is not None:
+        for event in prefix:
+            event["timestamp"] = timestamp
+    return prefix + tail
+
+
+def encode_chunk(events: List[Event]) -> bytes:
+    data = _dumps(events)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(data, 1)
+    return _RAW + data
+
+
+def decode_chunk(chunk: bytes) -> List[Event]:
+    data = zlib.decompress(chunk[1:]) if chunk[:1] == _ZLIB else chunk[1:]
+    return [expand_event(e) for e in _loads(data)]
+
+
+class SQLiteEventLog:
+    """Event chunks in a SQLite file, written through a fixed pool of connections
+
+    Same pooling as SQLiteBankingBackend: each of the ``pool_size`` executor
+    threads owns one connection. In WAL mode, several Rasa processes on one host
+    can share the file.
+    """
+
+    def __init__(self, path: Text = "trackers.sqlite3", pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="tracker-db")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor.submit(lambda: self._create_schema(self._connection())).result()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _run(self, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracker_chunks ("
+            " sender_id TEXT NOT NULL, seq INTEGER NOT NULL, events INTEGER NOT NULL, data BLOB NOT NULL,"
+            " PRIMARY KEY (sender_id, seq)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracker_generations ("
+            " sender_id TEXT PRIMARY KEY, generation INTEGER NOT NULL) WITHOUT ROWID"
+        )
+
+    async def load(self, sender_id: Text) -> List[Event]:
+        rows = await self._run(
+            lambda conn: conn.execute(
+                "SELECT data FROM tracker_chunks WHERE sender_id = ? ORDER BY seq", (sender_id,)
+            ).fetchall()
+        )
+        return [event for (data,) in rows for event in decode_chunk(data)]
+
+    async def count(self, sender_id: Text) -> int:
+        return await self._run(self._count, sender_id)
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, sender_id: Text) -> int:
+        row = conn.execute("SELECT SUM(events) FROM tracker_chunks WHERE sender_id = ?", (sender_id,)).fetchone()
+        return row[0] or 0
+
+    async def state(self, sender_id: Text) -> Tuple[int, int]:
+        """Stored event count and generation, which every ``replace`` increments"""
+        return await self._run(self._state, sender_id)
+
+    @staticmethod
+    def _state(conn: sqlite3.Connection, sender_id: Text) -> Tuple[int, int]:
+        row = conn.execute(
+            "SELECT (SELECT SUM(events) FROM tracker_chunks WHERE sender_id = ?),"
+            " (SELECT generation FROM tracker_generations WHERE sender_id = ?)",
+            (sender_id, sender_id),
+        ).fetchone()
+        return row[0] or 0, row[1] or 0
+
+    async def append(self, sender_id: Text, events: List[Event]) -> int:
+        """Store ``events`` after the existing ones; returns the new event count"""
+        return await self._run(self._append, sender_id, len(events), encode_chunk(events))
+
+    @classmethod
+    def _append(cls, conn: sqlite3.Connection, sender_id: Text, n: int, data: bytes) -> int:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO tracker_chunks SELECT ?, COALESCE(MAX(seq) + 1, 0), ?, ?"
+                " FROM tracker_chunks WHERE sender_id = ?",
+                (sender_id, n, data, sender_id),
+            )
+            total = cls._count(conn, sender_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return total
+
+    async def replace(self, sender_id: Text, events: List[Event]) -> int:
+        """Swap all stored events of ``sender_id`` for ``events`` in one transaction; returns the new generation"""
+        return await self._run(self._replace, sender_id, len(events), encode_chunk(events))
+
+    @staticmethod
+    def _replace(conn: sqlite3.Connection, sender_id: Text, n: int, data: bytes) -> int:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM tracker_chunks WHERE sender_id = ?", (sender_id,))
+            conn.execute("INSERT INTO tracker_chunks VALUES (?, 0, ?, ?)", (sender_id, n, data))
+            conn.execute(
+                "INSERT INTO tracker_generations VALUES (?, 1)"
+                " ON CONFLICT (sender_id) DO UPDATE SET generation = generation + 1",
+                (sender_id,),
+            )
+            generation = conn.execute(
+                "SELECT generation FROM tracker_generations WHERE sender_id = ?", (sender_id,)
+            ).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return generation
+
+    async def delete(self, sender_id: Text) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM tracker_chunks WHERE sender_id = ?", (sender_id,)))
+
+    async def keys(self) -> List[Text]:
+        rows = await self._run(lambda conn: conn.execute("SELECT DISTINCT sender_id FROM tracker_chunks").fetchall())
+        return [sender_id for (sender_id,) in rows]
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class RedisEventLog:
+    """Event chunks in a Redis list per sender, over a pool of ``pool_size`` connections
+
+    Works with any Redis-compatible server (Redis, Valkey, KeyDB). Needs the
+    ``redis`` package. ``record_exp`` expires idle conversations after that many
+    seconds.
+    """
+
+    def __init__(self, url: Text = "redis://localhost:6379/0", pool_size: int = 16,
+                 key_prefix: Text = "tracker:", record_exp: Optional[float] = None):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, max_connections=pool_size)
+        self.key_prefix = key_prefix
+        self.record_exp = int(record_exp) if record_exp else None
+
+    def _keys(self, sender_id: Text):
+        return f"{self.key_prefix}events:{sender_id}", f"{self.key_prefix}count:{sender_id}"
+
+    def _generation_key(self, sender_id: Text) -> Text:
+        return f"{self.key_prefix}generation:{sender_id}"
+
+    async def load(self, sender_id: Text) -> List[Event]:
+        chunks = await self.redis.lrange(self._keys(sender_id)[0], 0, -1)
+        return [event for chunk in chunks for event in decode_chunk(chunk)]
+
+    async def count(self, sender_id: Text) -> int:
+        return int(await self.redis.get(self._keys(sender_id)[1]) or 0)
+
+    async def state(self, sender_id: Text) -> Tuple[int, int]:
+        """Stored event count and generation, which every ``replace`` increments"""
+        count, generation = await self.redis.mget(self._keys(sender_id)[1], self._generation_key(sender_id))
+        return int(count or 0), int(generation or 0)
+
+    async def append(self, sender_id: Text, events: List[Event]) -> int:
+        chunks, count = self._keys(sender_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(chunks, encode_chunk(events))
+            pipe.incrby(count, len(events))
+            if self.record_exp:
+                pipe.expire(chunks, self.record_exp)
+                pipe.expire(count, self.record_exp)
+                pipe.expire(self._generation_key(sender_id), self.record_exp)
+            results = await pipe.execute()
+        return int(results[1])
+
+    async def replace(self, sender_id: Text, events: List[Event]) -> int:
+        chunks, count = self._keys(sender_id)
+        generation = self._generation_key(sender_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(chunks)
+            pipe.rpush(chunks, encode_chunk(events))
+            pipe.set(count, len(events), ex=self.record_exp)
+            pipe.incr(generation)
+            if self.record_exp:
+                pipe.expire(chunks, self.record_exp)
+                pipe.expire(generation, self.record_exp)
+            results = await pipe.execute()
+        return int(results[3])
+
+    async def delete(self, sender_id: Text) -> None:
+        await self.redis.delete(*self._keys(sender_id))
+
+    async def keys(self) -> List[Text]:
+        prefix = f"{self.key_prefix}events:"
+        keys = []
+        async for key in self.redis.scan_iter(match=f"{prefix}*"):
+            keys.append((key.decode() if isinstance(key, bytes) else key)[len(prefix):])
+        return keys
+
+    async def close(self) -> None:
+        await self.redis.close()
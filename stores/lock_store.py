@@ -0,0 +1,70 @@
+"""Rasa lock store in a SQLite file, shared by the Rasa processes on one host
+
+Rasa's default lock store lives in memory, so two replicas serving the same
+conversation do not see each other's locks. For replicas on several hosts
+use Rasa's built-in ``type: redis`` lock store instead. Configured in
+endpoints.yml::
+
+    lock_store:
+      type: stores.lock_store.SQLiteLockStore
+      path: locks.sqlite3
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Optional, Text
+
+from rasa.core.lock import TicketLock
+from rasa.core.lock_store import LOCK_LIFETIME, LockStore
+
+LOCK_STORE_PATH = os.getenv("LOCK_STORE_PATH", "locks.sqlite3")
+
+
+class SQLiteLockStore(LockStore):
+    """Ticket locks in one SQLite table, over a single long-lived connection
+
+    Issuing a ticket is a read-modify-write of the lock, so it runs in an
+    IMMEDIATE transaction. That way two processes never hand out the same
+    ticket number.
+    """
+
+    def __init__(self, endpoint_config: Optional[Any] = None, path: Optional[Text] = None) -> None:
+        kwargs = getattr(endpoint_config, "kwargs", None) or {}
+        self.path = path or kwargs.get("path") or LOCK_STORE_PATH
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS locks (conversation_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._mutex = threading.Lock()
+        super().__init__()
+
+    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        with self._mutex:
+            row = self._conn.execute("SELECT data FROM locks WHERE conversation_id = ?", (conversation_id,)).fetchone()
+        return TicketLock.from_dict(json.loads(row[0])) if row else None
+
+    def delete_lock(self, conversation_id: Text) -> None:
+        with self._mutex:
+            self._conn.execute("DELETE FROM locks WHERE conversation_id = ?", (conversation_id,))
+
+    def save_lock(self, lock: TicketLock) -> None:
+        with self._mutex:
+            self._conn.execute("INSERT OR REPLACE INTO locks VALUES (?, ?)", (lock.conversation_id, lock.dumps()))
+
+    def issue_ticket(self, conversation_id: Text, lock_lifetime: float = LOCK_LIFETIME) -> int:
+        with self._mutex:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM locks WHERE conversation_id = ?", (conversation_id,)
+                ).fetchone()
+                lock = TicketLock.from_dict(json.loads(row[0])) if row else self.create_lock(conversation_id)
+                ticket = lock.issue_ticket(lock_lifetime)
+                self._conn.execute("INSERT OR REPLACE INTO locks VALUES (?, ?)", (conversation_id, lock.dumps()))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ticket
@@ -0,0 +1,135 @@
+"""Persistent Rasa tracker store on top of the compacted event log
+
+Configured in endpoints.yml::
+
+    tracker_store:
+      type: stores.tracker_store.CompactTrackerStore
+
+Optional keys, which fall back to the TRACKER_STORE_* environment variables:
+``backend`` (``sqlite`` or ``redis``), ``path``, ``url``, ``pool_size``,
+``max_events``, ``keep_events``, ``ranking_length`` and ``record_exp``.
+"""
+
+import itertools
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Text
+
+from rasa.core.brokers.broker import EventBroker
+from rasa.core.tracker_store import TrackerStore
+from rasa.shared.core.domain import Domain
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from stores.event_log import RedisEventLog, SQLiteEventLog, compact_event, trimmed_events
+
+logger = logging.getLogger(__name__)
+
+TRACKER_STORE_BACKEND = os.getenv("TRACKER_STORE_BACKEND", "sqlite")
+TRACKER_STORE_PATH = os.getenv("TRACKER_STORE_PATH", "trackers.sqlite3")
+TRACKER_STORE_URL = os.getenv("TRACKER_STORE_URL", "redis://localhost:6379/0")
+TRACKER_STORE_POOL_SIZE = int(os.getenv("TRACKER_STORE_POOL_SIZE", "4"))
+# A conversation longer than TRACKER_STORE_MAX_EVENTS is cut to its newest
+# TRACKER_STORE_KEEP_EVENTS (0 keeps everything)
+TRACKER_STORE_MAX_EVENTS = int(os.getenv("TRACKER_STORE_MAX_EVENTS", "1000"))
+TRACKER_STORE_KEEP_EVENTS = int(os.getenv("TRACKER_STORE_KEEP_EVENTS", "500"))
+# Intents kept from each stored NLU ranking
+TRACKER_STORE_RANKING_LENGTH = int(os.getenv("TRACKER_STORE_RANKING_LENGTH", "3"))
+# Redis only: seconds until an idle conversation expires (0 keeps it)
+TRACKER_STORE_RECORD_EXP = float(os.getenv("TRACKER_STORE_RECORD_EXP", "0"))
+
+# Tracker attribute holding the log generation its events were loaded at
+_GENERATION = "_event_log_generation"
+
+
+def build_event_log(backend: Text, path: Text, url: Text, pool_size: int, record_exp: float):
+    if backend.lower() == "redis":
+        return RedisEventLog(url, pool_size=pool_size, record_exp=record_exp or None)
+    return SQLiteEventLog(path, pool_size=pool_size)
+
+
+class CompactTrackerStore(TrackerStore):
+    """Stores only the events added by each turn, compacted, and trims long conversations
+
+    A save appends the tracker's new events. When a save leaves more than
+    ``max_events`` events stored, the conversation is rewritten to its newest
+    ``keep_events``, starting at a user turn after a session start that
+    restores the current slots (see stores.event_log.trimmed_events). Rasa
+    saves under its conversation lock, so no turn of the same conversation
+    runs meanwhile; loads never write. Older events are gone for good, so
+    ``retrieve_full_tracker`` returns the trimmed conversation as well.
+
+    Each rewrite bumps the log's generation. A save appends only when the
+    tracker was loaded at the current generation, so the stored events are a
+    prefix of its own; otherwise it rewrites the whole conversation.
+    """
+
+    def __init__(
+        self,
+        domain: Optional[Domain] = None,
+        host: Optional[Text] = None,
+        event_broker: Optional[EventBroker] = None,
+        backend: Text = TRACKER_STORE_BACKEND,
+        path: Text = TRACKER_STORE_PATH,
+        url: Optional[Text] = None,
+        pool_size: int = TRACKER_STORE_POOL_SIZE,
+        max_events: int = TRACKER_STORE_MAX_EVENTS,
+        keep_events: int = TRACKER_STORE_KEEP_EVENTS,
+        ranking_length: int = TRACKER_STORE_RANKING_LENGTH,
+        record_exp: float = TRACKER_STORE_RECORD_EXP,
+        **kwargs: Any,
+    ) -> None:
+        self.log = build_event_log(backend, path, url or host or TRACKER_STORE_URL, int(pool_size), record_exp)
+        self.max_events = int(max_events)
+        self.keep_events = min(int(keep_events), self.max_events) if self.max_events > 0 else 0
+        self.ranking_length = int(ranking_length)
+        super().__init__(domain, event_broker, **kwargs)
+
+    def _compact(self, events: Iterable[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+        return [compact_event(event, self.ranking_length) for event in events]
+
+    async def save(self, tracker: DialogueStateTracker) -> None:
+        if self.event_broker:
+            await self.stream_events(tracker)
+
+        stored, generation = await self.log.state(tracker.sender_id)
+        if stored and (getattr(tracker, _GENERATION, None) != generation or stored > len(tracker.events)):
+            # Loaded before a rewrite, or built elsewhere (PUT .../tracker/events):
+            # the stored events need not be a prefix of this tracker's
+            await self._rewrite(tracker)
+            return
+        new_events = [e.as_dict() for e in itertools.islice(tracker.events, stored, None)]
+        if new_events:
+            stored = await self.log.append(tracker.sender_id, self._compact(new_events))
+        if self.max_events > 0 and stored > self.max_events:
+            await self._rewrite(tracker)
+
+    async def _rewrite(self, tracker: DialogueStateTracker) -> None:
+        """Replace the stored events with the tracker's, trimmed if it is too long"""
+        events = [e.as_dict() for e in tracker.events]
+        trimmed = None
+        if self.max_events > 0 and len(events) > self.max_events:
+            trimmed = trimmed_events(events, tracker.current_slot_values(), self.keep_events)
+        generation = await self.log.replace(tracker.sender_id, self._compact(trimmed or events))
+        if trimmed is None:
+            # The store now holds exactly this tracker, so later saves may append
+            setattr(tracker, _GENERATION, generation)
+        else:
+            logger.debug(f"Trimmed tracker of {tracker.sender_id} from {len(events)} to {len(trimmed)} events")
+
+    async def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        # Generation first: a rewrite in between leaves the tracker tagged as
+        # older than its events, which costs the next save a rewrite, not data
+        _, generation = await self.log.state(sender_id)
+        events = await self.log.load(sender_id)
+        if not events:
+            return None
+        tracker = DialogueStateTracker.from_dict(sender_id, events, self.domain.slots)
+        setattr(tracker, _GENERATION, generation)
+        return tracker
+
+    async def retrieve_full_tracker(self, conversation_id: Text) -> Optional[DialogueStateTracker]:
+        events = await self.log.load(conversation_id)
+        return DialogueStateTracker.from_dict(conversation_id, events, self.domain.slots) if events else None
+
+    async def keys(self) -> Iterable[Text]:
+        return await self.log.keys()